@@ -24,11 +24,25 @@ if config.config_file_name is not None:
 # путь к проекту в PYTHONPATH
 sys.path.append(os.getcwd())
 
-from project.database import Base
+from project.database import SEARCH_SCHEMA_OBJECTS, Base, engine_options
+from project.settings import settings
 
 fileConfig(config.config_file_name)
 target_metadata = Base.metadata
 
+# URL базы берётся из настроек приложения (переменная окружения DATABASE_URL),
+# sqlalchemy.url в alembic.ini - только значение по умолчанию для локального запуска
+database_url = settings.database_url
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Объекты полнотекстового поиска создаются миграцией вручную и не описаны
+    колонками модели - autogenerate не должен предлагать их удалить.
+    """
+    return name not in SEARCH_SCHEMA_OBJECTS
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,10 +61,10 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url,
+        url=database_url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -67,8 +81,9 @@ def run_migrations_online() -> None:
 
     """
     connectable = create_async_engine(
-        config.get_main_option("sqlalchemy.url"),
+        database_url,
         poolclass=pool.NullPool,
+        **engine_options(database_url, pooled=False),
     )
 
     async def run_async_migrations():
@@ -80,7 +95,10 @@ def run_migrations_online() -> None:
 
 def do_run_migrations(connection):
     context.configure(
-        connection=connection, target_metadata=target_metadata, compare_type=True
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        compare_type=True,
     )
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,38 @@
+"""Media upload time
+
+Revision ID: 2f8b6d4e9c17
+Revises: 7c3d9e5f1a24
+Create Date: 2026-10-18 18:11:07.402583
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2f8b6d4e9c17"
+down_revision: Union[str, None] = "7c3d9e5f1a24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие записи получают время миграции: срок до удаления
+    # непривязанных медиа отсчитывается с неё
+    op.add_column(
+        "medias",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("medias", "created_at")
@@ -0,0 +1,58 @@
+"""Materialized timelines
+
+Revision ID: 3c9e7a1d52b4
+Revises: 568b6ffdf68a
+Create Date: 2026-10-18 10:12:41.508233
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e7a1d52b4"
+down_revision: Union[str, None] = "568b6ffdf68a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "timelines",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["tweet_id"], ["tweets.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    op.create_index(
+        "ix_timelines_user_id_author_id",
+        "timelines",
+        ["user_id", "author_id"],
+        unique=False,
+    )
+
+    # Наполнение лент существующими твитами: свои твиты и твиты подписок
+    op.execute(
+        """
+        INSERT INTO timelines (user_id, tweet_id, author_id)
+        SELECT tweets.user_id, tweets.id, tweets.user_id
+        FROM tweets
+        WHERE tweets.user_id IS NOT NULL
+        UNION
+        SELECT followers.following_user_id, tweets.id, tweets.user_id
+        FROM followers
+        JOIN tweets ON tweets.user_id = followers.followed_user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_timelines_user_id_author_id", table_name="timelines")
+    op.drop_table("timelines")
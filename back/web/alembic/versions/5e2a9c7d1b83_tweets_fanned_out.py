@@ -0,0 +1,70 @@
+"""Per-tweet fan-out flag
+
+Revision ID: 5e2a9c7d1b83
+Revises: 2f8b6d4e9c17
+Create Date: 2026-10-18 21:02:36.915204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e2a9c7d1b83"
+down_revision: Union[str, None] = "2f8b6d4e9c17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Колонка с постоянным значением по умолчанию добавляется без перезаписи
+    # таблицы. Существующие твиты считаются разосланными (их разослала
+    # миграция timelines), новые - нет, пока их не разошлёт fan-out
+    op.add_column(
+        "tweets",
+        sa.Column("fanned_out", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+    op.alter_column("tweets", "fanned_out", server_default=sa.false())
+
+    # Твиты, которые не попали ни в одну ленту подписчиков автора
+    # (путь pull для "знаменитостей"), подмешиваются при чтении
+    op.execute(
+        """
+        UPDATE tweets SET fanned_out = false
+        WHERE EXISTS (
+            SELECT 1 FROM followers
+            WHERE followers.followed_user_id = tweets.user_id
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM timelines
+            WHERE timelines.tweet_id = tweets.id
+              AND timelines.user_id <> tweets.user_id
+        )
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tweets_user_id_id_not_fanned_out",
+            "tweets",
+            ["user_id", "id"],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=sa.text("NOT fanned_out"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tweets_user_id_id_not_fanned_out",
+            table_name="tweets",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_column("tweets", "fanned_out")
@@ -0,0 +1,36 @@
+"""Media derivatives flag
+
+Revision ID: 7c3d9e5f1a24
+Revises: e4a1f6c8b392
+Create Date: 2026-10-18 17:02:44.915306
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3d9e5f1a24"
+down_revision: Union[str, None] = "e4a1f6c8b392"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "medias",
+        sa.Column(
+            "derivatives_ready",
+            sa.Boolean(),
+            server_default=sa.false(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("medias", "derivatives_ready")
@@ -0,0 +1,63 @@
+"""Denormalized follower/following/like counters
+
+Revision ID: 8d41f0b6e2a7
+Revises: 3c9e7a1d52b4
+Create Date: 2026-10-18 12:40:05.117392
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41f0b6e2a7"
+down_revision: Union[str, None] = "3c9e7a1d52b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("followers_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users",
+        sa.Column("following_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "tweets",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    # Заполнение счётчиков по существующим данным
+    op.execute(
+        """
+        UPDATE users SET
+            followers_count = (
+                SELECT count(*) FROM followers
+                WHERE followers.followed_user_id = users.id
+            ),
+            following_count = (
+                SELECT count(*) FROM followers
+                WHERE followers.following_user_id = users.id
+            )
+        """
+    )
+    op.execute(
+        """
+        UPDATE tweets SET likes_count = (
+            SELECT count(*) FROM likes WHERE likes.tweet_id = tweets.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tweets", "likes_count")
+    op.drop_column("users", "following_count")
+    op.drop_column("users", "followers_count")
@@ -0,0 +1,43 @@
+"""Index medias by name
+
+Revision ID: 9a4c1e7b3d56
+Revises: 5e2a9c7d1b83
+Create Date: 2026-10-18 21:40:18.226517
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4c1e7b3d56"
+down_revision: Union[str, None] = "5e2a9c7d1b83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Поиск medias по имени: отметка производных после каждой загрузки,
+    # пакеты сборки мусора и переноса раскладки
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_medias_name",
+            "medias",
+            ["name"],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_medias_name",
+            table_name="medias",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
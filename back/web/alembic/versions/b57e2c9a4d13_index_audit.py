@@ -0,0 +1,87 @@
+"""Index audit for hot query paths
+
+Revision ID: b57e2c9a4d13
+Revises: 8d41f0b6e2a7
+Create Date: 2026-10-18 14:05:17.362914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b57e2c9a4d13"
+down_revision: Union[str, None] = "8d41f0b6e2a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы, по которым нет запросов или которые дублируют первичный ключ
+# и ограничения уникальности: (имя, таблица, колонки, unique)
+DEAD_INDEXES = (
+    ("ix_users_password", "users", ["password"], False),
+    ("ix_users_id", "users", ["id"], True),
+    ("ix_tweets_content", "tweets", ["content"], False),
+    ("ix_tweets_id", "tweets", ["id"], False),
+    ("ix_likes_id", "likes", ["id"], False),
+    ("ix_likes_user_id", "likes", ["user_id"], False),
+    ("ix_likes_tweet_id", "likes", ["tweet_id"], False),
+    ("ix_medias_id", "medias", ["id"], False),
+)
+
+# Индексы горячих путей: лента, подписчики, лайки, медиа твита
+HOT_INDEXES = (
+    ("ix_tweets_user_id_id", "tweets", ["user_id", "id"]),
+    ("ix_medias_tweet_id", "medias", ["tweet_id"]),
+    (
+        "ix_followers_followed_user_id_following_user_id",
+        "followers",
+        ["followed_user_id", "following_user_id"],
+    ),
+    ("ix_likes_tweet_id_id", "likes", ["tweet_id", "id"]),
+    ("ix_timelines_tweet_id", "timelines", ["tweet_id"]),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE/DROP INDEX CONCURRENTLY не выполняются внутри транзакции
+    # и не блокируют запись в таблицы на время построения.
+    with op.get_context().autocommit_block():
+        for name, table, columns in HOT_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+        for name, table, _columns, _unique in DEAD_INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in DEAD_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+        for name, table, _columns in HOT_INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,42 @@
+"""Full-text search on tweets
+
+Revision ID: e4a1f6c8b392
+Revises: b57e2c9a4d13
+Create Date: 2026-10-18 15:31:52.804117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a1f6c8b392"
+down_revision: Union[str, None] = "b57e2c9a4d13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индекс по выражению вместо генерируемой колонки: ADD COLUMN ... STORED
+    # переписал бы таблицу tweets под ACCESS EXCLUSIVE, а индекс строится
+    # CONCURRENTLY без блокировки записи. Выражение должно совпадать
+    # с TWEET_SEARCH_VECTOR (database.py), иначе поиск не использует индекс
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tweets_search_vector "
+            "ON tweets USING gin "
+            "((to_tsvector('simple', coalesce(tweets.content, ''))))"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tweets_search_vector",
+            table_name="tweets",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
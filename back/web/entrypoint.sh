@@ -15,7 +15,7 @@ fi
 mkdir -p alembic/versions
 alembic revision --message="Init migration" --autogenerate
 alembic upgrade head
-python /usr/src/app/project/init_data.py
+python -m project.init_data
 
 uvicorn project.main:app --port=1111 --host='0.0.0.0' --reload
 
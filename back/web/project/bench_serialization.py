@@ -0,0 +1,146 @@
+"""
+bench_serialization.py
+
+Замер стоимости сборки и сериализации страницы ленты на один твит:
+- прежний путь: ORM-объекты Tweet (автор, медиа и лайки с пользователями
+  загружены) -> TweetListOutSchema.model_validate с from_attributes
+  (копирование _AssociationList вложений валидатором validate_attachments,
+  лайки - объекты Like) -> JSONResponse (стандартный json), как в прежнем
+  обработчике с response_model;
+- FastJSONResponse: строки запроса select_tweet_rows -> словари
+  tweet_to_dict -> orjson, без проверки по схеме.
+База данных не нужна: страница собирается из синтетических твитов,
+стоимость самих запросов не входит в замер.
+
+Запуск: python -m project.bench_serialization [твитов_на_странице] [повторов]
+"""
+
+import sys
+import time
+from collections import namedtuple
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+
+from .database import Like, Media, Tweet, User
+from .media.media_services import PREFIX_NAME
+from .responses import FastJSONResponse
+from .tweets.schemas import TweetListOutSchema
+from .tweets.tweets_services import tweet_to_dict
+
+# Лайкнувших на твит: столько же, сколько в выборке get_likes_preview
+LIKERS_PER_TWEET = 3
+
+# Строка select_tweet_rows: доступ к колонкам по имени, как у Row
+TweetRow = namedtuple(
+    "TweetRow", ["id", "content", "likes_count", "author_id", "author_name", "media"]
+)
+
+
+def media_name(tweet_id: int) -> str:
+    return f"{PREFIX_NAME}ab/cd/{tweet_id:064x}.jpg"
+
+
+def make_orm_page(size: int) -> List[Tweet]:
+    """
+    Страница ORM-объектов, как их загружал прежний get_tweets
+    (selectinload автора, медиа и лайков с пользователями).
+    """
+    likers = [
+        User(id=user_id, name=f"Пользователь {user_id}")
+        for user_id in range(LIKERS_PER_TWEET)
+    ]
+    return [
+        Tweet(
+            id=tweet_id,
+            content=f"Твит номер {tweet_id} " * 5,
+            likes_count=tweet_id * 7,
+            author=User(id=tweet_id % 50, name=f"Пользователь {tweet_id}"),
+            media=[
+                Media(id=tweet_id, name=media_name(tweet_id), derivatives_ready=True)
+            ],
+            likes=[Like(user_id=user.id, user=user) for user in likers],
+        )
+        for tweet_id in range(size, 0, -1)
+    ]
+
+
+def make_row_page(size: int) -> List[TweetRow]:
+    """
+    Страница строк того же вида, что возвращает select_tweet_rows.
+    """
+    return [
+        TweetRow(
+            tweet_id,
+            f"Твит номер {tweet_id} " * 5,
+            tweet_id * 7,
+            tweet_id % 50,
+            f"Пользователь {tweet_id}",
+            [{"id": tweet_id, "name": media_name(tweet_id), "ready": 1}],
+        )
+        for tweet_id in range(size, 0, -1)
+    ]
+
+
+def make_preview(tweet_id: int) -> dict:
+    """
+    Выборка лайкнувших того же вида, что возвращает get_likes_preview.
+    """
+    return {
+        "likes": [
+            {"user_id": user_id, "name": f"Пользователь {user_id}"}
+            for user_id in range(LIKERS_PER_TWEET)
+        ],
+        "liked_by_me": tweet_id % 2 == 0,
+    }
+
+
+def measure(render: Callable[[], bytes], repeat: int) -> float:
+    """
+    Лучшее из пяти время repeat вызовов render, секунд.
+    """
+    best = float("inf")
+    for _attempt in range(5):
+        started = time.perf_counter()
+        for _call in range(repeat):
+            render()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(size: int, repeat: int) -> None:
+    orm_page = make_orm_page(size)
+    row_page = make_row_page(size)
+    previews = {row.id: make_preview(row.id) for row in row_page}
+
+    def response_model_path() -> bytes:
+        page = TweetListOutSchema.model_validate(
+            {"result": True, "tweets": orm_page}, from_attributes=True
+        )
+        return JSONResponse(page.model_dump(mode="json")).body
+
+    def fast_path() -> bytes:
+        page = {
+            "result": True,
+            "tweets": [tweet_to_dict(row, previews[row.id]) for row in row_page],
+            "next_cursor": None,
+        }
+        return FastJSONResponse(page).body
+
+    for name, render in (
+        ("response_model + json", response_model_path),
+        ("FastJSONResponse", fast_path),
+    ):
+        seconds = measure(render, repeat)
+        per_tweet = seconds / repeat / size * 1_000_000
+        print(f"{name:<24} {per_tweet:8.2f} мкс/твит")
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run(size, repeat)
+
+
+if __name__ == "__main__":
+    main()
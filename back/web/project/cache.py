@@ -0,0 +1,84 @@
+"""
+cache.py
+
+Модуль in-process кэша с ограничением размера (LRU) и временем жизни записей (TTL).
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Кэш ключ-значение: записи живут ttl секунд, при переполнении
+    вытесняется давно не использованная запись.
+
+    :param maxsize: Максимальное количество записей.
+    :param ttl: Время жизни записи в секундах.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Метод получения значения по ключу (None - нет в кэше или истекло).
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Метод сохранения значения с вытеснением старых записей при переполнении.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Метод инвалидации записи.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Метод очистки кэша и статистики.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Метод получения статистики: размер, попадания, промахи и доля попаданий.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,157 @@
+"""
+compression.py
+
+Модуль сжатия ответов (ASGI middleware):
+- кодировка выбирается по Accept-Encoding с учётом q: brotli, затем gzip;
+- сжимаются только ответы текстовых типов (JSON, текст) не меньше
+  compression_minimum_size байт, отданные одним блоком; потоковые ответы
+  (медиафайлы, диапазоны) проходят без изменений;
+- тела больше compression_thread_threshold_bytes сжимаются в пуле потоков,
+  чтобы цикл событий не простаивал на сжатии.
+"""
+
+import asyncio
+import gzip
+from typing import Dict, Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import metrics
+from .settings import settings
+
+# Поддерживаемые кодировки в порядке предпочтения при равном весе q
+AVAILABLE_ENCODINGS = ("br", "gzip")
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Метод разбора Accept-Encoding.
+
+    :param header: Значение заголовка.
+    :return: Кодировка -> вес q (0 - запрещена).
+    """
+    weights = {}
+    for item in header.split(","):
+        coding, _semicolon, params = item.strip().partition(";")
+        if not coding:
+            continue
+        weight = 1.0
+        name, _equals, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """
+    Метод выбора кодировки ответа: brotli, затем gzip.
+
+    :param header: Значение Accept-Encoding.
+    :return: "br", "gzip" или None - без сжатия.
+    """
+    weights = parse_accept_encoding(header)
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -position, coding)
+        for position, coding in enumerate(AVAILABLE_ENCODINGS)
+    ]
+    weight, _position, coding = max(candidates)
+    return coding if weight > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Метод сжатия тела ответа.
+
+    :param body: Тело ответа.
+    :param encoding: "br" или "gzip".
+    :return: Сжатое тело.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware согласованного сжатия ответов gzip/brotli.
+
+    :param app: Приложение ASGI.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or settings.compression_minimum_size == 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """
+    Обёртка send одного ответа: ответы нетекстовых типов и уже сжатые
+    проходят без изменений, у остальных http.response.start откладывается
+    до первого блока тела, по которому решается, сжимать ли ответ.
+    """
+
+    def __init__(self, send: Send, encoding: str) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.started = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                self.started = True
+                await self.send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            self.start_message = message
+            return
+        if self.started:
+            await self.send(message)
+            return
+
+        # Отложенный http.response.start отправляется перед любым
+        # сообщением ответа (например, http.response.pathsend)
+        self.started = True
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        body = message.get("body", b"")
+        if (
+            message["type"] != "http.response.body"
+            or "content-encoding" in headers
+            or message.get("more_body", False)
+            or len(body) < settings.compression_minimum_size
+        ):
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        if len(body) >= settings.compression_thread_threshold_bytes:
+            compressed = await asyncio.to_thread(compress, body, self.encoding)
+        else:
+            compressed = compress(body, self.encoding)
+        metrics.inc(f"compression_{self.encoding}_total")
+        metrics.inc("compression_saved_bytes_total", len(body) - len(compressed))
+
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(self.start_message)
+        await self.send(
+            {"type": "http.response.body", "body": compressed, "more_body": False}
+        )
@@ -3,35 +3,270 @@ database.py
 
 Модуль для база данных с настройками, классами-таблицами представлениями:
  followers, users, tweets, medias, likes.
+Сессии: get_session - основная БД (запись), get_read_session - реплики
+для читающих эндпоинтов с откатом на основную.
 """
 
-from typing import Any, Dict
+import itertools
+import math
+import time
+from typing import Any, Dict, Optional
 
+from fastapi import Request, Response
 from sqlalchemy import (
+    DDL,
+    JSON,
+    Boolean,
     Column,
+    DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
     UniqueConstraint,
+    event,
+    false,
+    func,
+    literal_column,
+    select,
+    text,
+    type_coerce,
 )
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.sql import Select
+
+from .cache import TTLCache
+from .logging_config import setup_custom_logger
+from .metrics import metrics
+from .settings import settings
+
+logger = setup_custom_logger(__name__)
+
+
+def engine_options(url: str, pooled: bool = True) -> Dict[str, Any]:
+    """
+    Метод сборки параметров create_async_engine из настроек.
+    Параметры пула и asyncpg применяются только к PostgreSQL.
+
+    :param url: URL базы данных.
+    :param pooled: False - без параметров пула (для NullPool, например в Alembic).
+    :return: Словарь именованных аргументов create_async_engine.
+    """
+    options: Dict[str, Any] = {"echo": settings.db_echo}
+    if make_url(url).get_backend_name() != "postgresql":
+        return options
+
+    if pooled:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    connect_args: Dict[str, Any] = {
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+    }
+    if not settings.db_prepared_statement_cache_size:
+        # За pgbouncer в режиме transaction кэш самого asyncpg тоже отключается:
+        # подготовленный оператор остаётся на серверном соединении, которое
+        # следующая транзакция может не получить
+        connect_args["statement_cache_size"] = 0
+    if pooled and settings.db_statement_timeout_ms:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.db_statement_timeout_ms)
+        }
+    options["connect_args"] = connect_args
+    return options
+
 
-DATABASE_URL = "postgresql+asyncpg://admin:admin@db:5432/diplom_project"
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = settings.database_url
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# Реплики для чтения: перебираются по кругу
+replica_sessions = [
+    sessionmaker(
+        create_async_engine(url, **engine_options(url)),
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    for url in settings.replica_urls()
+]
+_replica_order = itertools.count()
+
+# Окно read-your-writes: после записи чтения клиента идут в основную БД,
+# пока реплики могут отставать. Окончание окна отдаётся клиенту в cookie -
+# его проверяет любой процесс и узел web, а не только обработавший запись.
+# Клиентам без cookie окно даёт кэш api-key, но только в пределах процесса
+READ_YOUR_WRITES_COOKIE = "rw_until"
+# Допустимое расхождение часов узлов web при проверке окна
+READ_YOUR_WRITES_SKEW_SECONDS = 1.0
+recent_writers = TTLCache(maxsize=100_000, ttl=settings.read_your_writes_seconds)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
 Base = declarative_base()
 
 
-async def get_session():
+async def get_session(request: Request = None, response: Response = None):
+    # Запись открывает окно чтения из основной БД
+    if request is not None and request.method not in SAFE_METHODS:
+        mark_write(request.headers.get("api-key"), response)
     async with async_session() as session:
         yield session
 
 
+def mark_write(api_key: Optional[str], response: Optional[Response] = None) -> None:
+    """
+    Метод открытия окна read-your-writes после записи.
+
+    :param api_key: API-ключ пользователя (None - анонимная запись, не отмечается).
+    :param response: Ответ, в который ставится cookie с окончанием окна.
+    """
+    if api_key:
+        recent_writers.set(api_key, True)
+    if response is not None:
+        deadline = time.time() + settings.read_your_writes_seconds
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            f"{deadline:.3f}",
+            max_age=math.ceil(settings.read_your_writes_seconds),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+def in_write_window(api_key: Optional[str], deadline: Optional[str]) -> bool:
+    """
+    Метод проверки окна read-your-writes.
+
+    :param api_key: API-ключ пользователя из запроса.
+    :param deadline: Значение cookie READ_YOUR_WRITES_COOKIE (время UNIX).
+    :return: True - чтение должно идти в основную БД.
+    """
+    if api_key and recent_writers.get(api_key):
+        return True
+    try:
+        until = float(deadline)
+    except (TypeError, ValueError):
+        return False
+    # Окно не длиннее настройки: подделанный cookie не уводит чтения
+    # клиента в основную БД надолго
+    now = time.time()
+    longest = settings.read_your_writes_seconds + READ_YOUR_WRITES_SKEW_SECONDS
+    return now < until <= now + longest
+
+
+async def open_read_session(
+    api_key: Optional[str] = None, write_deadline: Optional[str] = None
+) -> AsyncSession:
+    """
+    Метод открытия сессии для чтения.
+    Реплика выбирается по кругу; основная БД - если реплик нет, клиент
+    недавно писал или ни одна реплика не отвечает.
+
+    :param api_key: API-ключ пользователя из запроса.
+    :param write_deadline: Cookie окончания окна read-your-writes.
+    :return: Асинхронная сессия SQLAlchemy.
+    """
+    if not replica_sessions or in_write_window(api_key, write_deadline):
+        metrics.inc("read_session_primary_total")
+        return async_session()
+
+    start = next(_replica_order)
+    for offset in range(len(replica_sessions)):
+        session = replica_sessions[(start + offset) % len(replica_sessions)]()
+        try:
+            await session.connection()
+        except (OSError, SQLAlchemyError) as error:
+            await session.close()
+            metrics.inc("read_session_replica_errors_total")
+            logger.warning(f"Реплика недоступна, пробуем следующую: {error}")
+            continue
+        metrics.inc("read_session_replica_total")
+        return session
+
+    metrics.inc("read_session_primary_fallback_total")
+    return async_session()
+
+
+async def get_read_session(request: Request):
+    """
+    Зависимость: сессия для читающих эндпоинтов (реплика или основная БД).
+    """
+    session = await open_read_session(
+        request.headers.get("api-key"), request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    )
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+def get_session_factory():
+    """
+    Зависимость: фабрика сессий для фоновых задач.
+    Фоновая задача выполняется после ответа, когда сессия запроса уже закрыта,
+    поэтому открывает собственную сессию через эту фабрику.
+    """
+    return async_session
+
+
+def dialect_insert(session: AsyncSession, table):
+    """
+    Метод построения insert() для диалекта сессии с поддержкой ON CONFLICT.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :param table: Таблица или ORM-класс для вставки.
+    :return: Конструкция insert диалекта PostgreSQL или SQLite.
+    """
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+def json_array(session: AsyncSession, rows: Select, order_by: str):
+    """
+    Метод построения скалярного подзапроса - JSON-массива объектов по строкам
+    запроса rows (ключи - имена колонок): json_agg на PostgreSQL,
+    json_group_array на SQLite. Вложенные списки читаются той же строкой
+    результата, без отдельного запроса и без загрузки ORM-объектов.
+    ORDER BY подзапроса не задаёт порядок агрегата на PostgreSQL, поэтому
+    json_agg упорядочивается явно; SQLite до 3.44 не знает ORDER BY внутри
+    агрегата и собирает массив в порядке упорядоченного подзапроса.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :param rows: Запрос строк массива (связанный с внешним запросом через
+        correlate(), упорядоченный по колонке order_by).
+    :param order_by: Имя колонки rows, по возрастанию которой идут элементы.
+    :return: Выражение типа JSON (в результате - список dict).
+    """
+    rows = rows.subquery()
+    fields = []
+    for column in rows.c:
+        fields += [literal_column(f"'{column.key}'"), column]
+    if session.bind.dialect.name == "sqlite":
+        array = func.json_group_array(func.json_object(*fields))
+    else:
+        array = func.coalesce(
+            func.json_agg(
+                postgresql.aggregate_order_by(
+                    func.json_build_object(*fields), rows.c[order_by]
+                )
+            ),
+            literal_column("'[]'::json"),
+        )
+    return type_coerce(select(array).scalar_subquery(), JSON)
+
+
 followers = Table(
     "followers",
     Base.metadata,
@@ -45,6 +280,12 @@ followers = Table(
         ForeignKey("users.id", ondelete="CASCADE"),
         primary_key=True,
     ),
+    # Обратное направление к первичному ключу: подписчики пользователя, fan-out
+    Index(
+        "ix_followers_followed_user_id_following_user_id",
+        "followed_user_id",
+        "following_user_id",
+    ),
 )
 
 
@@ -53,11 +294,19 @@ class User(Base):
 
     __tablename__: str = "users"
 
-    id = Column(Integer, primary_key=True, index=True, unique=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, index=True)
     api_key = Column(String, index=True, unique=True)
-    password = Column(String, index=True)
+    password = Column(String)
 
+    # Денормализованные счётчики, поддерживаются в транзакциях подписки/отписки
+    # и сверяются заданием reconcile_counters
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Связи подписок не загружаются неявно (lazy="raise"): списки бывают
+    # огромными, поэтому загрузка только явная - selectinload() в запросе
+    # или постраничные запросы к followers.
     # Пользователи, на которых подписан этот пользователь (подписки)
     following = relationship(
         "User",
@@ -65,7 +314,7 @@ class User(Base):
         primaryjoin=id == followers.c.following_user_id,
         secondaryjoin=id == followers.c.followed_user_id,
         back_populates="followers",
-        lazy="selectin",
+        lazy="raise",
     )
 
     # Пользователи, которые подписаны на этого пользователя (подписчики)
@@ -75,7 +324,7 @@ class User(Base):
         primaryjoin=id == followers.c.followed_user_id,
         secondaryjoin=id == followers.c.following_user_id,
         back_populates="following",
-        lazy="selectin",
+        lazy="raise",
     )
 
     tweets = relationship(
@@ -105,9 +354,27 @@ class Tweet(Base):
     """Класс твитов - сообщений, таблица tweets"""
 
     __tablename__ = "tweets"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # Твиты автора от новых к старым: backfill ленты при подписке
+        Index("ix_tweets_user_id_id", "user_id", "id"),
+        # Нерассылавшиеся твиты автора: pull-часть ленты при чтении
+        Index(
+            "ix_tweets_user_id_id_not_fanned_out",
+            "user_id",
+            "id",
+            postgresql_where=text("NOT fanned_out"),
+            sqlite_where=text("NOT fanned_out"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    content = Column(String, index=True)
+    content = Column(String)
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Твит разослан в ленты подписчиков (push). Нерассылавшиеся твиты
+    # (автор - "знаменитость" на момент публикации, рассылка ещё не прошла
+    # или упала) подмешиваются в ленты подписчиков при чтении
+    fanned_out = Column(Boolean, nullable=False, default=False, server_default=false())
 
     attachments = association_proxy("media", "name")
 
@@ -135,13 +402,93 @@ class Tweet(Base):
         }
 
 
+# Полнотекстовый поиск по твитам. Объекты поиска создаются DDL-событиями
+# (и миграцией), а не колонками модели, т.к. различаются по СУБД:
+# - PostgreSQL: GIN-индекс по выражению TWEET_SEARCH_VECTOR (без колонки:
+#   её добавление переписало бы всю таблицу под эксклюзивной блокировкой);
+# - SQLite (тесты): внешняя таблица FTS5 tweets_fts, синхронизируемая триггерами.
+# Конфигурация "simple" - без стемминга, твиты бывают на разных языках.
+# Запрос должен использовать выражение дословно, иначе индекс не применяется.
+TWEET_SEARCH_CONFIG = "simple"
+TWEET_SEARCH_VECTOR = (
+    f"to_tsvector('{TWEET_SEARCH_CONFIG}', coalesce(tweets.content, ''))"
+)
+SEARCH_SCHEMA_OBJECTS = frozenset({"ix_tweets_search_vector", "tweets_fts"})
+
+event.listen(
+    Tweet.__table__,
+    "after_create",
+    DDL(
+        f"CREATE INDEX ix_tweets_search_vector ON tweets USING gin "
+        f"(({TWEET_SEARCH_VECTOR}))"
+    ).execute_if(dialect="postgresql"),
+)
+
+for statement in (
+    "CREATE VIRTUAL TABLE tweets_fts USING fts5"
+    "(content, content='tweets', content_rowid='id')",
+    "CREATE TRIGGER tweets_fts_ai AFTER INSERT ON tweets BEGIN "
+    "INSERT INTO tweets_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER tweets_fts_ad AFTER DELETE ON tweets BEGIN "
+    "INSERT INTO tweets_fts(tweets_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER tweets_fts_au AFTER UPDATE OF content ON tweets BEGIN "
+    "INSERT INTO tweets_fts(tweets_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO tweets_fts(rowid, content) VALUES (new.id, new.content); END",
+):
+    event.listen(
+        Tweet.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Tweet.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS tweets_fts").execute_if(dialect="sqlite"),
+)
+
+
+# Материализованная лента: строка на каждого читателя и каждый твит в его ленте.
+# Первичный ключ (user_id, tweet_id) - чтение страницы ленты одним range scan.
+timelines = Table(
+    "timelines",
+    Base.metadata,
+    Column(
+        "user_id",
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "tweet_id",
+        ForeignKey("tweets.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "author_id",
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    ),
+    Index("ix_timelines_user_id_author_id", "user_id", "author_id"),
+    # Отзыв твита из всех лент и каскад при удалении твита
+    Index("ix_timelines_tweet_id", "tweet_id"),
+)
+
+
 class Media(Base):
     """Класс медиа, таблица medias"""
 
     __tablename__ = "medias"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    tweet_id = Column(Integer, ForeignKey("tweets.id", ondelete="CASCADE"))
+    id = Column(Integer, primary_key=True)
+    # Поиск по имени: отметка производных, сборка мусора, перенос раскладки
+    name = Column(String, nullable=False, index=True)
+    tweet_id = Column(Integer, ForeignKey("tweets.id", ondelete="CASCADE"), index=True)
+    # Построены ли производные (миниатюра, размер ленты), см. media.derivatives
+    derivatives_ready = Column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+    # Время загрузки: непривязанные к твиту медиа старше срока удаляет media_gc
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
     tweet = relationship("Tweet", back_populates="media")
 
     def __repr__(self):
@@ -158,12 +505,15 @@ class Like(Base):
 
     __tablename__ = "likes"
     __table_args__ = (
+        # Лайк пользователя на твит; ведущий user_id покрывает поиск по user_id
         UniqueConstraint("user_id", "tweet_id", name="_unique_who_tweet_likes"),
+        # Лайкнувшие твит от новых к старым: превью и постраничный список
+        Index("ix_likes_tweet_id_id", "tweet_id", "id"),
     )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
-    tweet_id = Column(ForeignKey("tweets.id", ondelete="CASCADE"), index=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"))
+    tweet_id = Column(ForeignKey("tweets.id", ondelete="CASCADE"))
 
     user = relationship("User", back_populates="likes")
     tweet = relationship("Tweet", back_populates="likes")
@@ -0,0 +1,112 @@
+"""
+index_check.py
+
+Модуль проверки индексов базы данных:
+- индексы, объявленные в моделях, но отсутствующие в базе;
+- внешние ключи без индекса с ведущей колонкой ключа (PostgreSQL);
+- неиспользуемые индексы по pg_stat_user_indexes (PostgreSQL);
+- невалидные индексы, оставшиеся после прерванного CREATE INDEX CONCURRENTLY.
+
+Запуск: python -m project.index_check
+"""
+
+import asyncio
+from typing import Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Base, async_session
+from .logging_config import setup_custom_logger
+
+logger = setup_custom_logger(__name__)
+
+# Неуникальные индексы без единого сканирования с момента сброса статистики.
+# Индексы первичных ключей и ограничений уникальности не учитываются:
+# они нужны для целостности, а не для чтения.
+UNUSED_INDEXES_SQL = text(
+    """
+    SELECT s.relname || '.' || s.indexrelname
+    FROM pg_stat_user_indexes AS s
+    JOIN pg_index AS i ON i.indexrelid = s.indexrelid
+    WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+    ORDER BY pg_relation_size(s.indexrelid) DESC
+    """
+)
+
+# Внешние ключи, для которых нет индекса с теми же ведущими колонками
+UNINDEXED_FOREIGN_KEYS_SQL = text(
+    """
+    SELECT c.conrelid::regclass || '(' || c.conname || ')'
+    FROM pg_constraint AS c
+    WHERE c.contype = 'f'
+      AND c.connamespace = 'public'::regnamespace
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_index AS i
+          WHERE i.indrelid = c.conrelid
+            AND (i.indkey::int2[])[0:cardinality(c.conkey) - 1] = c.conkey
+      )
+    ORDER BY 1
+    """
+)
+
+INVALID_INDEXES_SQL = text(
+    """
+    SELECT i.indrelid::regclass || '.' || i.indexrelid::regclass
+    FROM pg_index AS i
+    WHERE NOT i.indisvalid
+    ORDER BY 1
+    """
+)
+
+
+def _missing_model_indexes(connection) -> List[str]:
+    """
+    Индексы из метаданных моделей, которых нет в базе.
+    """
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            missing.append(f"{table.name} (нет таблицы)")
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(
+            f"{table.name}.{index.name}"
+            for index in table.indexes
+            if index.name not in existing
+        )
+    return missing
+
+
+async def check_indexes(session: AsyncSession) -> Dict[str, List[str]]:
+    """
+    Метод проверки индексов.
+    Проверки по статистике и каталогу доступны только на PostgreSQL.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :return: Списки проблемных индексов и ключей по видам проверки.
+    """
+    connection = await session.connection()
+    report = {"missing": await connection.run_sync(_missing_model_indexes)}
+    if connection.dialect.name == "postgresql":
+        for name, query in (
+            ("unindexed_foreign_keys", UNINDEXED_FOREIGN_KEYS_SQL),
+            ("unused", UNUSED_INDEXES_SQL),
+            ("invalid", INVALID_INDEXES_SQL),
+        ):
+            report[name] = list((await session.execute(query)).scalars())
+    return report
+
+
+async def main() -> None:
+    async with async_session() as session:
+        report = await check_indexes(session)
+    for name, items in report.items():
+        if items:
+            logger.warning(f"Индексы ({name}): {', '.join(items)}")
+    logger.info(f"Проверка индексов завершена: {report}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
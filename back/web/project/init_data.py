@@ -2,15 +2,19 @@
 init_data.py
 
 Модуль заполнение Базы Данных - таблица users: тестовые пользователи
+
+Запуск: python -m project.init_data (движок настраивается из переменных окружения).
 """
 
 import asyncio
 
-from database import User, async_session, followers
-from logging_config import setup_custom_logger
-from sqlalchemy import insert
+from sqlalchemy import insert, update
 from sqlalchemy.future import select
 
+from .database import User, async_session, followers
+from .logging_config import setup_custom_logger
+from .users.user_services import forget_principal
+
 logger = setup_custom_logger(__name__)
 
 
@@ -44,6 +48,8 @@ async def init_data():
         # Вставка пользователей через bulk insert
         await session.execute(insert(User), users_data)
         await session.commit()
+        # Core-вставка не вызывает ORM-событий инвалидации кэша
+        forget_principal(*(user["api_key"] for user in users_data))
 
         # Получаем всех пользователей с именами, чтобы получить их id
         result = await session.execute(select(User))
@@ -61,6 +67,17 @@ async def init_data():
         ]
 
         await session.execute(insert(followers), followers_data)
+        # Счётчики подписок обновляются в той же транзакции, что и связи
+        await session.execute(
+            update(User)
+            .where(User.id == test_user.id)
+            .values(following_count=User.following_count + len(friends))
+        )
+        await session.execute(
+            update(User)
+            .where(User.id.in_([friend.id for friend in friends]))
+            .values(followers_count=User.followers_count + 1)
+        )
         await session.commit()
 
         logger.info("Тестовые данные успешно добавлены.")
@@ -11,27 +11,60 @@ main.py
 - Точку входа для запуска приложения через Uvicorn.
 """
 
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 import uvicorn
 from fastapi import APIRouter, FastAPI, Request
 from fastapi.responses import FileResponse
+from project.compression import CompressionMiddleware
 from project.exceptions import BackendException
 from project.logging_config import setup_custom_logger
+from project.media.derivatives import shutdown_process_pool
 from project.media.routes import router as media_router
+from project.media.serving import router as media_files_router
+from project.media_gc import run_media_gc_periodically
+from project.metrics import metrics
+from project.settings import settings
 from project.tweets.routes import router as tweets_router
 from project.users.routes import router as users_router
+from project.users.user_services import auth_cache
 from starlette.responses import JSONResponse
 
 logger = setup_custom_logger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения: периодическая сборка мусора медиафайлов
+    (если задан media_gc_interval_seconds); при остановке завершается
+    пул процессов построения производных изображений.
+    """
+    media_gc_task = None
+    if settings.media_gc_interval_seconds:
+        media_gc_task = asyncio.create_task(
+            run_media_gc_periodically(settings.media_gc_interval_seconds)
+        )
+    yield
+    if media_gc_task is not None:
+        media_gc_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await media_gc_task
+    shutdown_process_pool()
+
+
 app = FastAPI(
     title="Микросервис блогинга API",
     description="API для управления микросервисом блогинга",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Сжатие ответов gzip/brotli по Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 static_path = Path(__file__).parent.parent.parent / "dist" / "static"
 
 # Проверка пути
@@ -71,6 +104,19 @@ async def test1():
     return {"id": 1, "name": "Mary"}
 
 
+@api_router.get(
+    "/metrics",
+    summary="Метрики сервиса",
+    response_description="Значения in-process счётчиков",
+)
+async def get_metrics():
+    """
+    Возвращает значения счётчиков: пути fan-out (push/pull), пути чтения ленты
+    и статистику кэша аутентификации.
+    """
+    return {**metrics.snapshot(), "auth_cache": auth_cache.stats()}
+
+
 @app.exception_handler(BackendException)
 async def backend_exception_handler(request: Request, exc: BackendException):
     return JSONResponse(
@@ -100,6 +146,9 @@ api_router.include_router(tweets_router)
 # Подключаем основной роутер к приложению
 app.include_router(api_router, prefix="/api")
 
+# Отдача медиафайлов (без nginx или из S3-хранилища)
+app.include_router(media_files_router)
+
 
 if __name__ == "__main__":
     logger.info("Запуск осуществлен")
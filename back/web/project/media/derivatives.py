@@ -0,0 +1,155 @@
+"""
+derivatives.py
+
+Модуль производных изображений (миниатюра, размер ленты) в формате WebP.
+Производные строятся в фоне после загрузки в пуле процессов, чтобы
+декодирование и масштабирование не блокировали цикл событий, во временный
+каталог, и затем сохраняются в хранилище рядом с оригиналом.
+Имена производных выводятся из имени оригинала (хэша содержимого):
+ab/cd/<sha256>.jpg -> ab/cd/<sha256>_thumb.webp, ab/cd/<sha256>_feed.webp.
+Пока производные не построены, в ответах отдаются оригиналы.
+"""
+
+import asyncio
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
+from sqlalchemy import update
+
+from ..database import Media
+from ..logging_config import setup_custom_logger
+from ..metrics import metrics
+from ..settings import settings
+from .media_services import PREFIX_NAME
+from .storage import get_storage, tmp_dir
+
+logger = setup_custom_logger(__name__)
+
+# Вид производной -> максимальная сторона, пикселей
+DERIVATIVE_SIZES = {"thumb": 150, "feed": 600}
+DERIVATIVE_QUALITY = 80
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def derivative_name(name: str, kind: str) -> str:
+    """
+    Имя производной по имени (или URL) оригинала.
+
+    :param name: Имя или URL оригинала.
+    :param kind: Вид производной из DERIVATIVE_SIZES.
+    :return: Имя или URL производной.
+    """
+    stem, _dot, _extension = name.rpartition(".")
+    return f"{stem}_{kind}.webp"
+
+
+def media_urls(name: str, derivatives_ready: bool) -> Dict[str, str]:
+    """
+    URL оригинала и готовых производных медиафайла.
+
+    :param name: URL оригинала (Media.name).
+    :param derivatives_ready: Построены ли производные.
+    :return: {"original": ..., "thumb": ..., "feed": ...} (производные - если готовы).
+    """
+    urls = {"original": name}
+    if derivatives_ready:
+        urls.update({kind: derivative_name(name, kind) for kind in DERIVATIVE_SIZES})
+    return urls
+
+
+def render_derivatives(source: str, out_dir: str, kinds: List[str]) -> Dict[str, str]:
+    """
+    Построение производных файла (выполняется в процессе пула).
+
+    :param source: Путь локального файла оригинала.
+    :param out_dir: Каталог для файлов производных.
+    :param kinds: Виды производных из DERIVATIVE_SIZES.
+    :return: Вид производной -> путь её файла.
+    """
+    paths = {}
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for kind in kinds:
+            size = DERIVATIVE_SIZES[kind]
+            derivative = image.copy()
+            derivative.thumbnail((size, size))
+            paths[kind] = str(Path(out_dir) / f"{kind}.webp")
+            derivative.save(paths[kind], format="WEBP", quality=DERIVATIVE_QUALITY)
+    return paths
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Пул процессов построения производных (создаётся при первом обращении).
+    Процессы запускаются через spawn, а не fork: к первому обращению
+    в приложении уже работают потоки (asyncio.to_thread, aiofiles, сжатие),
+    и унаследованная при fork захваченная ими блокировка повесила бы процесс.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.media_derivative_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """
+    Метод остановки пула процессов (при остановке приложения).
+    """
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+
+
+async def generate_derivatives(session_factory, name: str) -> None:
+    """
+    Фоновая задача: построение производных и отметка Media.derivatives_ready
+    у всех записей с этим файлом. Уже существующие производные
+    не перестраиваются: одинаковые файлы хранятся один раз, и производные
+    у них общие.
+
+    :param session_factory: Фабрика асинхронных сессий
+    :param name: URL оригинала (Media.name)
+    """
+    if settings.media_derivative_workers == 0:
+        return
+
+    storage = get_storage()
+    stored_name = name.removeprefix(PREFIX_NAME)
+    try:
+        kinds = [
+            kind
+            for kind in DERIVATIVE_SIZES
+            if await storage.stat(derivative_name(stored_name, kind)) is None
+        ]
+        if kinds:
+            out_dir = tempfile.mkdtemp(dir=tmp_dir())
+            try:
+                async with storage.local_copy(stored_name) as source:
+                    paths = await asyncio.get_running_loop().run_in_executor(
+                        get_process_pool(), render_derivatives, source, out_dir, kinds
+                    )
+                for kind, path in paths.items():
+                    await storage.save(path, derivative_name(stored_name, kind))
+            finally:
+                shutil.rmtree(out_dir, ignore_errors=True)
+        async with session_factory() as session:
+            await session.execute(
+                update(Media).where(Media.name == name).values(derivatives_ready=True)
+            )
+            await session.commit()
+        metrics.inc("media_derivatives_total")
+    except Exception as error:
+        metrics.inc("media_derivatives_failed_total")
+        logger.error(f"Ошибка построения производных {name}: {error}", exc_info=True)
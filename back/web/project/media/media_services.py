@@ -1,14 +1,32 @@
 """
 media_services.py
 
-Модуль media_services - публикация изображений в твите и проверка типа файла.
+Модуль media_services - публикация изображений в твите, проверка типа файла
+и потоковое сохранение загрузки на диск.
 """
 
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import aiofiles
+from fastapi import UploadFile
 from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import Media
 from ..exceptions import BackendException
+from ..settings import settings
+from .storage import get_storage, tmp_dir
+from .validation import ImageSniffer, verify_image
+
+# URL-префикс, по которому раздаются медиафайлы
+PREFIX_NAME = "/media_files/"
+
+# Поддерживаемые типы изображений и расширения сохраняемых файлов
+MEDIA_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png"}
 
 
 async def post_image(session: AsyncSession, image_name: str) -> dict:
@@ -28,12 +46,96 @@ async def post_image(session: AsyncSession, image_name: str) -> dict:
 
 def check_file(file) -> None:
     """
-    Метод проверки типа файла.
+    Метод проверки заявленного типа файла (содержимое проверяется
+    при сохранении, см. media.validation).
 
     :param file: Загруженный файл.
     """
-    if file.content_type not in ("image/jpeg", "image/png"):
+    if file.content_type not in MEDIA_EXTENSIONS:
         raise BackendException(
             error_type="BAD FILE",
             error_message="Ошибка! Поддерживаемые типы изображений: jpeg, png.",
+            status_code=400,
         )
+
+
+def file_too_large() -> BackendException:
+    """
+    Ошибка превышения максимального размера загрузки.
+    """
+    return BackendException(
+        error_type="FILE TOO LARGE",
+        error_message=f"Размер файла превышает {settings.media_max_upload_bytes} байт",
+        status_code=413,
+    )
+
+
+def sharded_name(digest: str, extension: str) -> str:
+    """
+    Имя файла в media_root по хэшу содержимого с разбиением по каталогам
+    из первых байт хэша: ab/cd/abcd....jpg (не больше 256 записей на уровень).
+
+    :param digest: sha256 содержимого (hex).
+    :param extension: Расширение файла.
+    :return: Относительный путь файла в media_root.
+    """
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+async def store_verified(tmp_path: str, digest: str, content_type: str) -> str:
+    """
+    Метод сохранения полностью записанного файла под именем по содержимому:
+    полное декодирование в пуле потоков, затем сохранение в хранилище
+    (если такое содержимое уже хранится, временный файл удаляется).
+
+    :param tmp_path: Путь временного файла в media_root.
+    :param digest: sha256 содержимого (hex).
+    :param content_type: Тип, определённый по сигнатуре.
+    :return: Имя файла в хранилище.
+    """
+    await asyncio.to_thread(verify_image, tmp_path, content_type)
+
+    filename = sharded_name(digest, MEDIA_EXTENSIONS[content_type])
+    await get_storage().save(tmp_path, filename)
+    return filename
+
+
+async def save_upload(file: UploadFile) -> str:
+    """
+    Метод потокового сохранения загрузки в хранилище под именем по содержимому.
+    Файл пишется блоками во временный файл с подсчётом sha256 и сохраняется
+    в хранилище только целиком; в памяти - не больше одного блока.
+    Тело запроса больше лимита отклоняется ещё до разбора формы
+    (см. routes.UploadLimitRoute); здесь превышение media_max_upload_bytes
+    самим файлом прерывает копирование из разобранной формы. Тип и размеры
+    изображения проверяются по заголовку во время записи, полное декодирование -
+    в пуле потоков до переноса. Если файл с таким содержимым уже есть,
+    он переиспользуется, а временный удаляется.
+
+    :param file: Загружаемый файл.
+    :return: Имя файла в хранилище (ab/cd/<sha256>.<расширение>).
+    """
+    # Размер, известный после разбора формы, проверяется до записи
+    if file.size is not None and file.size > settings.media_max_upload_bytes:
+        raise file_too_large()
+
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir(), suffix=".part")
+    os.close(fd)
+
+    try:
+        size = 0
+        digest = hashlib.sha256()
+        sniffer = ImageSniffer()
+        async with aiofiles.open(tmp_path, mode="wb") as out:
+            while chunk := await file.read(settings.media_upload_chunk_bytes):
+                size += len(chunk)
+                if size > settings.media_max_upload_bytes:
+                    raise file_too_large()
+                sniffer.feed(chunk)
+                digest.update(chunk)
+                await out.write(chunk)
+        filename = await store_verified(tmp_path, digest.hexdigest(), sniffer.finish())
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return filename
@@ -0,0 +1,312 @@
+"""
+resumable.py
+
+Модуль возобновляемой загрузки медиафайлов частями:
+- создание сессии загрузки с объявленным размером и типом;
+- запись очередного диапазона байт (Content-Range) в конец частичного файла;
+- запрос текущего смещения, с которого продолжать после обрыва связи;
+- завершение: потоковый подсчёт sha256 частичного файла, проверка
+  изображения и сохранение под именем по содержимому.
+
+Состояние сессии хранится на диске в media_root/.uploads: <id>.part - уже
+принятые байты (смещение = размер файла), <id>.json - владелец, размер,
+тип и срок действия. Просроченные сессии удаляет сборщик мусора
+(project.media_gc). Операции с файлами сессии выполняются в пуле потоков.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Tuple
+
+import aiofiles
+
+from ..exceptions import BackendException
+from ..settings import settings
+from .media_services import MEDIA_EXTENSIONS, file_too_large, store_verified
+from .validation import ImageSniffer
+
+UPLOAD_SESSIONS_DIR = ".uploads"
+UPLOAD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{22}$")
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+def _sessions_dir() -> Path:
+    return Path(settings.media_root) / UPLOAD_SESSIONS_DIR
+
+
+def _session_paths(upload_id: str) -> Tuple[Path, Path]:
+    """
+    Пути частичного файла и метаданных сессии.
+    """
+    sessions_dir = _sessions_dir()
+    return sessions_dir / f"{upload_id}.part", sessions_dir / f"{upload_id}.json"
+
+
+def _write_meta(meta_path: Path, meta: dict) -> None:
+    """
+    Атомарная запись метаданных сессии.
+    """
+    tmp_path = meta_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+
+
+def _no_upload() -> BackendException:
+    return BackendException(
+        error_type="NO UPLOAD",
+        error_message="Сессия загрузки не найдена или истекла",
+    )
+
+
+def _load_session(upload_id: str, user_id: int) -> dict:
+    """
+    Метод чтения сессии загрузки текущего пользователя.
+    Чужие, несуществующие и просроченные сессии неотличимы (404).
+    """
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise _no_upload()
+    part_path, meta_path = _session_paths(upload_id)
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (FileNotFoundError, ValueError):
+        raise _no_upload()
+    if meta["user_id"] != user_id:
+        raise _no_upload()
+    # Просроченная сессия и сессия без частичного файла (сбой между
+    # записями файлов сессии, частичная уборка) удаляются
+    if meta["expires_at"] < time.time() or not part_path.exists():
+        _remove_session(upload_id)
+        raise _no_upload()
+    return meta
+
+
+def _remove_session(upload_id: str) -> None:
+    for path in _session_paths(upload_id):
+        path.unlink(missing_ok=True)
+
+
+def _session_out(upload_id: str, meta: dict, offset: int) -> dict:
+    return {
+        "result": True,
+        "upload_id": upload_id,
+        "offset": offset,
+        "size": meta["size"],
+        "expires_at": datetime.fromtimestamp(meta["expires_at"], tz=timezone.utc),
+    }
+
+
+def _lock(fileno: int) -> None:
+    """
+    Эксклюзивная блокировка частичного файла: параллельная запись
+    в одну сессию (в том числе из разных процессов) отклоняется.
+    """
+    try:
+        fcntl.flock(fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise BackendException(
+            error_type="UPLOAD BUSY",
+            error_message="Сессия загрузки занята другим запросом",
+            status_code=409,
+        )
+
+
+def purge_expired_uploads() -> int:
+    """
+    Метод удаления просроченных сессий загрузки.
+
+    :return: Количество удалённых сессий.
+    """
+    sessions_dir = _sessions_dir()
+    if not sessions_dir.is_dir():
+        return 0
+    now = time.time()
+    purged = 0
+    for part_path in sessions_dir.glob("*.part"):
+        meta_path = part_path.with_suffix(".json")
+        try:
+            expires_at = json.loads(meta_path.read_text())["expires_at"]
+        except (FileNotFoundError, ValueError, KeyError):
+            # Сессия без метаданных - по времени последней записи
+            expires_at = (
+                part_path.stat().st_mtime + settings.media_upload_session_ttl_seconds
+            )
+        if expires_at < now:
+            _remove_session(part_path.stem)
+            purged += 1
+    return purged
+
+
+async def create_upload(user_id: int, size: int, content_type: str) -> dict:
+    """
+    Метод создания сессии возобновляемой загрузки.
+
+    :param user_id: ID пользователя-владельца сессии.
+    :param size: Полный размер файла, байт.
+    :param content_type: Заявленный тип изображения.
+    :return: Состояние сессии (upload_id, offset=0, size, expires_at).
+    """
+    if content_type not in MEDIA_EXTENSIONS:
+        raise BackendException(
+            error_type="BAD FILE",
+            error_message="Ошибка! Поддерживаемые типы изображений: jpeg, png.",
+            status_code=400,
+        )
+    if size > settings.media_max_upload_bytes:
+        raise file_too_large()
+
+    upload_id = secrets.token_urlsafe(16)
+    meta = {
+        "user_id": user_id,
+        "size": size,
+        "content_type": content_type,
+        "expires_at": time.time() + settings.media_upload_session_ttl_seconds,
+    }
+    await asyncio.to_thread(_create_session, upload_id, meta)
+    return _session_out(upload_id, meta, offset=0)
+
+
+def _create_session(upload_id: str, meta: dict) -> None:
+    """
+    Создание пустого частичного файла и метаданных сессии.
+    """
+    _sessions_dir().mkdir(parents=True, exist_ok=True)
+    part_path, meta_path = _session_paths(upload_id)
+    part_path.touch()
+    _write_meta(meta_path, meta)
+
+
+async def get_upload(upload_id: str, user_id: int) -> dict:
+    """
+    Метод получения состояния сессии: смещение, с которого продолжать загрузку.
+
+    :param upload_id: Идентификатор сессии.
+    :param user_id: ID текущего пользователя.
+    :return: Состояние сессии.
+    """
+    meta = await asyncio.to_thread(_load_session, upload_id, user_id)
+    part_path, _meta_path = _session_paths(upload_id)
+    try:
+        part_stat = await asyncio.to_thread(part_path.stat)
+    except FileNotFoundError:
+        # Частичный файл удалён после чтения сессии
+        raise _no_upload()
+    return _session_out(upload_id, meta, offset=part_stat.st_size)
+
+
+def parse_content_range(content_range: str, size: int) -> Tuple[int, int]:
+    """
+    Метод разбора заголовка Content-Range: bytes <start>-<end>/<size>.
+
+    :return: Начало диапазона и количество байт в нём.
+    """
+    match = CONTENT_RANGE_PATTERN.match(content_range or "")
+    if not match:
+        raise BackendException(
+            error_type="BAD RANGE",
+            error_message="Ожидается заголовок Content-Range: bytes start-end/size",
+            status_code=400,
+        )
+    start, end, total = map(int, match.groups())
+    if total != size or end < start or end >= size:
+        raise BackendException(
+            error_type="BAD RANGE",
+            error_message=f"Диапазон {start}-{end}/{total} вне файла размера {size}",
+            status_code=400,
+        )
+    return start, end - start + 1
+
+
+async def put_upload_range(
+    upload_id: str,
+    user_id: int,
+    content_range: str,
+    chunks: AsyncIterator[bytes],
+) -> dict:
+    """
+    Метод записи очередного диапазона байт.
+    Диапазон должен начинаться с текущего смещения. При обрыве связи
+    принятые байты сохраняются, и клиент продолжает с нового смещения.
+
+    :param upload_id: Идентификатор сессии.
+    :param user_id: ID текущего пользователя.
+    :param content_range: Значение заголовка Content-Range.
+    :param chunks: Поток тела запроса.
+    :return: Состояние сессии после записи.
+    """
+    meta = await asyncio.to_thread(_load_session, upload_id, user_id)
+    start, length = parse_content_range(content_range, meta["size"])
+    part_path, meta_path = _session_paths(upload_id)
+
+    async with aiofiles.open(part_path, mode="r+b") as out:
+        _lock(out.fileno())
+        offset = os.fstat(out.fileno()).st_size
+        if start != offset:
+            raise BackendException(
+                error_type="BAD OFFSET",
+                error_message=f"Загрузка должна продолжаться со смещения {offset}",
+                status_code=409,
+            )
+        await out.seek(start)
+        written = 0
+        async for chunk in chunks:
+            if written + len(chunk) > length:
+                await out.truncate(start)
+                raise BackendException(
+                    error_type="BAD RANGE",
+                    error_message="Тело запроса длиннее диапазона Content-Range",
+                    status_code=400,
+                )
+            await out.write(chunk)
+            written += len(chunk)
+        offset = start + written
+
+    # Активная сессия продлевается
+    meta["expires_at"] = time.time() + settings.media_upload_session_ttl_seconds
+    await asyncio.to_thread(_write_meta, meta_path, meta)
+    return _session_out(upload_id, meta, offset=offset)
+
+
+async def finalize_upload(upload_id: str, user_id: int) -> str:
+    """
+    Метод завершения загрузки: sha256 считается потоковым чтением частичного
+    файла, изображение проверяется и сохраняется под именем по содержимому.
+    Сессия удаляется и при успехе, и при непрошедшей проверке содержимого.
+
+    :param upload_id: Идентификатор сессии.
+    :param user_id: ID текущего пользователя.
+    :return: Имя файла в хранилище.
+    """
+    meta = await asyncio.to_thread(_load_session, upload_id, user_id)
+    part_path, _meta_path = _session_paths(upload_id)
+
+    async with aiofiles.open(part_path, mode="rb") as source:
+        _lock(source.fileno())
+        offset = os.fstat(source.fileno()).st_size
+        if offset != meta["size"]:
+            raise BackendException(
+                error_type="UPLOAD INCOMPLETE",
+                error_message=f"Загружено {offset} из {meta['size']} байт",
+                status_code=409,
+            )
+        try:
+            digest = hashlib.sha256()
+            sniffer = ImageSniffer()
+            while chunk := await source.read(settings.media_upload_chunk_bytes):
+                sniffer.feed(chunk)
+                digest.update(chunk)
+            filename = await store_verified(
+                str(part_path), digest.hexdigest(), sniffer.finish()
+            )
+        except BackendException:
+            await asyncio.to_thread(_remove_session, upload_id)
+            raise
+    await asyncio.to_thread(_remove_session, upload_id)
+    return filename
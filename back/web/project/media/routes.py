@@ -4,27 +4,88 @@ routes.py
 Модуль Роут для работы с медиафайлами (картинками).
 """
 
-from pathlib import Path
-from typing import Union
+from typing import Callable, Coroutine, Union
 
-import aiofiles
-from fastapi import APIRouter, Depends, Response, Security, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    Request,
+    Response,
+    Security,
+    UploadFile,
+)
+from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException
 
-from ..database import get_session
+from ..database import get_session, get_session_factory
 from ..exceptions import BackendException
-from ..media.media_services import check_file, post_image
-from ..media.schemas import MediaOutSchema
+from ..media.derivatives import generate_derivatives
+from ..media.media_services import (
+    PREFIX_NAME,
+    check_file,
+    file_too_large,
+    post_image,
+    save_upload,
+)
+from ..media.resumable import (
+    create_upload,
+    finalize_upload,
+    get_upload,
+    put_upload_range,
+)
+from ..media.schemas import MediaOutSchema, UploadSessionIn, UploadSessionOutSchema
 from ..schemas_overal import ErrorSchema
-from ..users.user_services import api_key_header
+from ..settings import settings
+from ..users.schemas import Principal
+from ..users.user_services import api_key_header, get_current_user
+
+# Запас на границы и заголовки частей multipart/form-data сверх размера файла
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Маршрут с ограничением размера тела запроса. FastAPI разбирает форму
+    (и сохраняет файл во временный) до вызова обработчика и зависимостей,
+    поэтому тело больше media_max_upload_bytes отклоняется с 413 здесь:
+    по Content-Length - не читая тела, без него - как только принятые
+    байты превысят лимит.
+    """
 
-router = APIRouter(prefix="/medias", tags=["Medias"])
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        handler = super().get_route_handler()
 
-# Папка для сохранения файлов
-# OUT_PATH = (Path(__file__).parent / "media_files").absolute()
-# PREFIX_NAME = "/static/media_files/"
-OUT_PATH = Path("/usr/src/app/media/media_files")  # Абсолютный путь внутри контейнера
-PREFIX_NAME = "/media_files/"
+        async def limited_handler(request: Request) -> Response:
+            limit = settings.media_max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > limit:
+                raise file_too_large()
+
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = await request.receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise file_too_large()
+                return message
+
+            try:
+                return await handler(Request(request.scope, limited_receive))
+            except HTTPException as error:
+                # Ошибку чтения тела FastAPI заворачивает в 400
+                if isinstance(error.__cause__, BackendException):
+                    raise error.__cause__
+                raise
+
+        return limited_handler
+
+
+router = APIRouter(prefix="/medias", tags=["Medias"], route_class=UploadLimitRoute)
 
 
 @router.post(
@@ -37,36 +98,168 @@ PREFIX_NAME = "/media_files/"
 async def post_image_handler(
     response: Response,
     file: UploadFile,
+    background_tasks: BackgroundTasks,
     api_key: str = Security(api_key_header),
     session: AsyncSession = Depends(get_session),
+    session_factory=Depends(get_session_factory),
 ) -> Union[MediaOutSchema, ErrorSchema]:
     """
     Метод загрузки изображения для пользователя.
+    Производные (миниатюра, размер ленты) строятся в фоне после ответа.
 
     :param response: Ответ сервера.
     :param file: Загружаемый файл.
+    :param background_tasks: фоновые задачи FastAPI
     :param api_key: Ключ API.
     :param session: Асинхронная сессия.
+    :param session_factory: фабрика сессий для фоновой задачи
     :return: Результат загрузки или ошибка.
     """
     try:
         # Проверка файла на поддерживаемый формат
         check_file(file)
 
-        filename = file.filename
+        # Имя файла - хэш содержимого: одинаковые файлы хранятся один раз,
+        # а URL никогда не указывает на другое содержимое
+        filename = await save_upload(file=file)
 
-        # Проверка на наличие папки и создание при необходимости
-        OUT_PATH.mkdir(parents=True, exist_ok=True)
-        path = OUT_PATH / filename
+        return await register_media(
+            session=session,
+            background_tasks=background_tasks,
+            session_factory=session_factory,
+            filename=filename,
+        )
+    except BackendException as error:
+        response.status_code = error.status_code
+        return error
 
-        # Асинхронная запись файла
-        async with aiofiles.open(path, mode="wb") as some_file:
-            await some_file.write(await file.read())
 
-        name_for_db = f"{PREFIX_NAME}{filename}"
+async def register_media(
+    session: AsyncSession,
+    background_tasks: BackgroundTasks,
+    session_factory,
+    filename: str,
+) -> dict:
+    """
+    Метод сохранения записи Media о сохранённом файле и постановки
+    построения производных в фон.
 
-        # Сохранение информации о файле в базе данных
-        return await post_image(session=session, image_name=name_for_db)
-    except BackendException as error:
-        response.status_code = 400
-        return error
+    :param session: Асинхронная сессия.
+    :param background_tasks: фоновые задачи FastAPI
+    :param session_factory: фабрика сессий для фоновой задачи
+    :param filename: Имя файла в хранилище.
+    :return: Результат и media_id.
+    """
+    name_for_db = f"{PREFIX_NAME}{filename}"
+
+    # Сохранение информации о файле в базе данных
+    result = await post_image(session=session, image_name=name_for_db)
+    background_tasks.add_task(generate_derivatives, session_factory, name_for_db)
+    return result
+
+
+@router.post(
+    "/uploads",
+    summary="Создание сессии возобновляемой загрузки",
+    response_description="Состояние сессии загрузки",
+    response_model=Union[UploadSessionOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def create_upload_handler(
+    upload: UploadSessionIn,
+    current_user: Principal = Depends(get_current_user),
+) -> Union[UploadSessionOutSchema, ErrorSchema]:
+    """
+    Метод создания сессии загрузки большого файла частями.
+
+    :param upload: Размер и тип файла.
+    :param current_user: Пользователь по api-key.
+    :return: Состояние сессии (upload_id, offset, size, expires_at).
+    """
+    return await create_upload(
+        user_id=current_user.id, size=upload.size, content_type=upload.content_type
+    )
+
+
+@router.get(
+    "/uploads/{upload_id}",
+    summary="Состояние сессии возобновляемой загрузки",
+    response_description="Смещение, с которого продолжать загрузку",
+    response_model=Union[UploadSessionOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def get_upload_handler(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_user),
+) -> Union[UploadSessionOutSchema, ErrorSchema]:
+    """
+    Метод получения состояния сессии загрузки после обрыва связи.
+
+    :param upload_id: Идентификатор сессии.
+    :param current_user: Пользователь по api-key.
+    :return: Состояние сессии.
+    """
+    return await get_upload(upload_id=upload_id, user_id=current_user.id)
+
+
+@router.put(
+    "/uploads/{upload_id}",
+    summary="Загрузка диапазона байт",
+    response_description="Состояние сессии после записи диапазона",
+    response_model=Union[UploadSessionOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def put_upload_handler(
+    upload_id: str,
+    request: Request,
+    content_range: str = Header(..., description="bytes start-end/size"),
+    current_user: Principal = Depends(get_current_user),
+) -> Union[UploadSessionOutSchema, ErrorSchema]:
+    """
+    Метод записи диапазона байт (тело запроса) с текущего смещения.
+
+    :param upload_id: Идентификатор сессии.
+    :param request: Запрос - тело читается потоком.
+    :param content_range: Заголовок Content-Range.
+    :param current_user: Пользователь по api-key.
+    :return: Состояние сессии.
+    """
+    return await put_upload_range(
+        upload_id=upload_id,
+        user_id=current_user.id,
+        content_range=content_range,
+        chunks=request.stream(),
+    )
+
+
+@router.post(
+    "/uploads/{upload_id}/finalize",
+    summary="Завершение возобновляемой загрузки",
+    response_description="Результат загрузки изображения",
+    response_model=Union[MediaOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def finalize_upload_handler(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    session_factory=Depends(get_session_factory),
+) -> Union[MediaOutSchema, ErrorSchema]:
+    """
+    Метод завершения загрузки: проверка и сохранение файла, запись Media.
+
+    :param upload_id: Идентификатор сессии.
+    :param background_tasks: фоновые задачи FastAPI
+    :param current_user: Пользователь по api-key.
+    :param session: Асинхронная сессия.
+    :param session_factory: фабрика сессий для фоновой задачи
+    :return: Результат загрузки и media_id.
+    """
+    filename = await finalize_upload(upload_id=upload_id, user_id=current_user.id)
+    return await register_media(
+        session=session,
+        background_tasks=background_tasks,
+        session_factory=session_factory,
+        filename=filename,
+    )
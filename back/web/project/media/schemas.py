@@ -4,7 +4,9 @@ schemas.py
 Модуль Pydantic-схем валидации и передачи данных между сервисами Media - изображения.
 """
 
-from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class MediaOutSchema(BaseModel):
@@ -19,3 +21,33 @@ class MediaOutSchema(BaseModel):
     media_id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UploadSessionIn(BaseModel):
+    """
+    Схема создания сессии возобновляемой загрузки.
+
+    :param size: int - полный размер файла, байт
+    :param content_type: str - тип изображения (image/jpeg, image/png)
+    """
+
+    size: int = Field(..., gt=0, description="Полный размер файла, байт")
+    content_type: str = Field(..., description="Тип изображения")
+
+
+class UploadSessionOutSchema(BaseModel):
+    """
+    Схема состояния сессии возобновляемой загрузки.
+
+    :param result: bool - результат операции
+    :param upload_id: str - идентификатор сессии
+    :param offset: int - сколько байт уже принято (следующий диапазон начинается с него)
+    :param size: int - полный размер файла
+    :param expires_at: datetime - срок действия сессии
+    """
+
+    result: bool = True
+    upload_id: str
+    offset: int
+    size: int
+    expires_at: datetime
@@ -0,0 +1,197 @@
+"""
+serving.py
+
+Модуль отдачи медиафайлов приложением (PREFIX_NAME) - для установок
+без nginx (разработка, тесты, один узел) и для S3-хранилища:
+- сильный ETag из хэша содержимого в имени файла и ответ 304
+  на совпавший If-None-Match;
+- запросы диапазонов (Range, If-Range) для частичной загрузки;
+- долгое кэширование: содержимое по имени никогда не меняется;
+  файлы старого плоского каталога (имена не по хэшу) кэшируются ненадолго
+  и перепроверяются по ETag из размера и времени изменения;
+- локальные файлы отдаются через FileResponse, а сервером с расширением
+  ASGI http.response.pathsend - без копирования (sendfile).
+"""
+
+import asyncio
+import os
+import re
+from pathlib import PurePosixPath
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from ..exceptions import BackendException
+from .media_services import PREFIX_NAME
+from .storage import StoredObject, content_type_for, get_storage
+
+router = APIRouter(tags=["Medias"])
+
+# Содержимое по имени неизменно: имя выводится из sha256 содержимого
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Старые плоские имена не выводятся из содержимого: файл может быть заменён
+LEGACY_MEDIA_CACHE_CONTROL = "public, max-age=300"
+
+# <sha256> оригинала или <sha256>_<вид> производной
+HASHED_STEM = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?$")
+# Отдаются только файлы раскладки по хэшу (ab/cd/<stem>.<расширение>)
+# и изображения старого плоского каталога media_root
+SHARDED_NAME = re.compile(
+    r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.(jpg|png|webp)$"
+)
+LEGACY_FLAT_NAME = re.compile(r"^[^./\\][^/\\]*\.(jpe?g|png)$", re.IGNORECASE)
+SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse, отдающий файл целиком через ASGI-расширение
+    http.response.pathsend, если сервер его поддерживает.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        if (
+            "http.response.pathsend" in scope.get("extensions", {})
+            and scope["method"].upper() != "HEAD"
+            and "range" not in headers
+        ):
+            if self.stat_result is None:
+                self.set_stat_headers(await asyncio.to_thread(os.stat, self.path))
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        await super().__call__(scope, receive, send)
+
+
+def _no_media() -> BackendException:
+    return BackendException(
+        error_type="NO MEDIA",
+        error_message="Медиафайл не найден",
+    )
+
+
+def media_etag(name: str) -> Optional[str]:
+    """
+    Сильный ETag по хэшу содержимого в имени файла.
+
+    :param name: Имя файла в хранилище.
+    :return: ETag или None для имён не по хэшу (старая раскладка).
+    """
+    stem = PurePosixPath(name).stem
+    return f'"{stem}"' if HASHED_STEM.match(stem) else None
+
+
+def stored_etag(stored: StoredObject) -> str:
+    """
+    ETag файла с именем не по хэшу: из размера и времени изменения.
+    """
+    return f'"{stored.size:x}-{int(stored.modified * 1000):x}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Сравнение If-None-Match с ETag (слабое сравнение, RFC 9110).
+    """
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Метод разбора заголовка Range с одним диапазоном.
+
+    :param range_header: Значение заголовка Range.
+    :param size: Размер объекта.
+    :return: Диапазон [start, end) или None - отдать объект целиком
+        (несколько диапазонов или нераспознанный заголовок).
+        Пустой диапазон (start >= end) - неудовлетворимый запрос (416).
+    """
+    match = SINGLE_RANGE.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    else:
+        start, end = max(size - int(last), 0), size
+    return start, end
+
+
+@router.api_route(
+    PREFIX_NAME + "{name:path}", methods=["GET", "HEAD"], include_in_schema=False
+)
+async def get_media_file(name: str, request: Request) -> Response:
+    """
+    Метод отдачи медиафайла из хранилища.
+
+    :param name: Имя файла в хранилище.
+    :param request: Запрос (заголовки If-None-Match, Range, If-Range).
+    :return: Файл, его диапазон или 304.
+    """
+    # Служебные каталоги (.tmp, .uploads), абсолютные пути и выход за корень
+    # не отдаются
+    if not (SHARDED_NAME.fullmatch(name) or LEGACY_FLAT_NAME.fullmatch(name)):
+        raise _no_media()
+
+    storage = get_storage()
+    stored = await storage.stat(name)
+    if stored is None:
+        raise _no_media()
+
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL}
+    etag = media_etag(name)
+    if etag is None:
+        headers["Cache-Control"] = LEGACY_MEDIA_CACHE_CONTROL
+        etag = stored_etag(stored)
+    headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    local_path = storage.local_path(name)
+    if local_path is not None:
+        # Range, If-Range и HEAD обрабатывает FileResponse
+        return MediaFileResponse(
+            local_path, media_type=content_type_for(name), headers=headers
+        )
+
+    start, end, status_code = 0, stored.size, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header is not None and (if_range is None or if_range == etag):
+        byte_range = parse_range(range_header, stored.size)
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= end:
+                return Response(
+                    status_code=416,
+                    headers={"Content-Range": f"bytes */{stored.size}"},
+                )
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{stored.size}"
+    headers["Accept-Ranges"] = "bytes"
+    headers["Content-Length"] = str(end - start)
+
+    if request.method == "HEAD" or start == end:
+        return Response(
+            status_code=status_code,
+            headers=headers,
+            media_type=content_type_for(name),
+        )
+    return StreamingResponse(
+        storage.iter_bytes(name, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=content_type_for(name),
+    )
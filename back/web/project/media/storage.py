@@ -0,0 +1,343 @@
+"""
+storage.py
+
+Модуль хранилищ медиафайлов. Имена объектов - пути относительно корня
+хранилища (ab/cd/<sha256>.<расширение>), URL в Media.name - PREFIX_NAME + имя.
+- LocalStorage: каталог media_root на диске (общий том web и nginx);
+- S3Storage: S3-совместимое хранилище (AWS S3, MinIO), загрузка составными
+  частями (multipart) потоком из временного файла.
+Загрузки и производные до сохранения пишутся во временные файлы
+в media_root/.tmp на локальном диске узла, поэтому при S3Storage узлы web
+не хранят медиафайлов и масштабируются горизонтально.
+"""
+
+import abc
+import asyncio
+import mimetypes
+import os
+import stat
+import tempfile
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+import aiofiles
+
+from ..settings import settings
+
+# Каталог временных файлов внутри media_root: та же файловая система,
+# поэтому перенос готового файла в LocalStorage - атомарный rename
+UPLOAD_TMP_DIR = ".tmp"
+
+# Размер блока чтения объекта при отдаче
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class StoredObject(NamedTuple):
+    """Объект хранилища: имя, размер в байтах, время изменения (UNIX)."""
+
+    name: str
+    size: int
+    modified: float
+
+
+def tmp_dir() -> Path:
+    """
+    Каталог временных файлов загрузок и производных (создаётся при обращении).
+    """
+    path = Path(settings.media_root) / UPLOAD_TMP_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def content_type_for(name: str) -> str:
+    """
+    MIME-тип объекта по расширению имени.
+    """
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class MediaStorage(abc.ABC):
+    """
+    Интерфейс хранилища медиафайлов. Методы асинхронные: блокирующие
+    операции выполняются в пуле потоков.
+    """
+
+    @abc.abstractmethod
+    async def save(self, tmp_path: str, name: str) -> None:
+        """
+        Метод сохранения временного файла под именем name.
+        Временный файл удаляется. Если объект уже есть, он остаётся
+        (имена выводятся из содержимого), а его время изменения обновляется,
+        чтобы сборщик мусора не удалил переиспользованный файл.
+
+        :param tmp_path: Путь полностью записанного временного файла.
+        :param name: Имя объекта.
+        """
+
+    @abc.abstractmethod
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        """
+        Метод получения размера и времени изменения объекта.
+
+        :return: Объект или None, если его нет.
+        """
+
+    @abc.abstractmethod
+    async def delete(self, name: str) -> Optional[int]:
+        """
+        Метод удаления объекта.
+
+        :return: Освобождено байт (None, если объекта не было).
+        """
+
+    @abc.abstractmethod
+    async def list(self, prefix: str) -> List[StoredObject]:
+        """
+        Метод получения объектов, имена которых начинаются с prefix
+        (обычно каталог разбиения по хэшу "ab/").
+        """
+
+    @abc.abstractmethod
+    def local_copy(self, name: str):
+        """
+        Асинхронный контекстный менеджер с путём локального файла объекта
+        (для обработки, например построения производных).
+        """
+
+    def local_path(self, name: str) -> Optional[str]:
+        """
+        Путь файла объекта на локальном диске, если хранилище локальное
+        (для отдачи файла без копирования через sendfile), иначе None.
+        """
+        return None
+
+    @abc.abstractmethod
+    def iter_bytes(self, name: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        Метод потокового чтения диапазона байт объекта [start, end).
+        """
+
+
+class LocalStorage(MediaStorage):
+    """Хранилище в каталоге локальной файловой системы."""
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def _path(self, name: str) -> Path:
+        """
+        Путь объекта на диске. Имя, выводящее за корень хранилища
+        (абсолютное, с "..", через символическую ссылку), отклоняется.
+
+        :raises ValueError: Путь вне корня хранилища.
+        """
+        root = self.root.resolve()
+        path = (root / name).resolve()
+        if not path.is_relative_to(root) or path == root:
+            raise ValueError(f"Имя вне хранилища: {name!r}")
+        return path
+
+    async def save(self, tmp_path: str, name: str) -> None:
+        await asyncio.to_thread(self._save, tmp_path, name)
+
+    def _save(self, tmp_path: str, name: str) -> None:
+        path = self._path(name)
+        if path.exists():
+            Path(tmp_path).unlink()
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        return await asyncio.to_thread(self._stat, name)
+
+    def _stat(self, name: str) -> Optional[StoredObject]:
+        # Объект - только обычный файл внутри корня хранилища
+        try:
+            result = os.stat(self._path(name))
+        except (ValueError, FileNotFoundError, NotADirectoryError):
+            return None
+        if not stat.S_ISREG(result.st_mode):
+            return None
+        return StoredObject(name, result.st_size, result.st_mtime)
+
+    async def delete(self, name: str) -> Optional[int]:
+        return await asyncio.to_thread(self._delete, name)
+
+    def _delete(self, name: str) -> Optional[int]:
+        path = self._path(name)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return None
+        return size
+
+    async def list(self, prefix: str) -> List[StoredObject]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def _list(self, prefix: str) -> List[StoredObject]:
+        directory = self.root / prefix
+        if not directory.is_dir():
+            return []
+        objects = []
+        for path in sorted(directory.rglob("*")):
+            if path.is_file():
+                result = path.stat()
+                name = path.relative_to(self.root).as_posix()
+                objects.append(StoredObject(name, result.st_size, result.st_mtime))
+        return objects
+
+    @asynccontextmanager
+    async def local_copy(self, name: str) -> AsyncIterator[str]:
+        yield str(self._path(name))
+
+    def local_path(self, name: str) -> Optional[str]:
+        return str(self._path(name))
+
+    async def iter_bytes(self, name: str, start: int, end: int) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self._path(name), mode="rb") as source:
+            await source.seek(start)
+            while start < end:
+                chunk = await source.read(min(READ_CHUNK_BYTES, end - start))
+                if not chunk:
+                    break
+                start += len(chunk)
+                yield chunk
+
+
+class S3Storage(MediaStorage):
+    """
+    Хранилище в бакете S3-совместимого сервиса. Учётные данные - из
+    стандартной цепочки boto3 (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, ...).
+    boto3 импортируется при создании хранилища: установкам с локальным
+    хранилищем он не нужен.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        multipart_chunk_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url or None, region_name=region or None
+        )
+        # Файлы больше одной части загружаются составными частями
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunk_bytes,
+            multipart_chunksize=multipart_chunk_bytes,
+        )
+
+    async def save(self, tmp_path: str, name: str) -> None:
+        await asyncio.to_thread(self._save, tmp_path, name)
+
+    def _save(self, tmp_path: str, name: str) -> None:
+        try:
+            if self._stat(name) is None:
+                self.client.upload_file(
+                    tmp_path,
+                    self.bucket,
+                    name,
+                    ExtraArgs={"ContentType": content_type_for(name)},
+                    Config=self.transfer_config,
+                )
+            else:
+                # Копирование объекта в себя обновляет LastModified
+                self.client.copy_object(
+                    Bucket=self.bucket,
+                    Key=name,
+                    CopySource={"Bucket": self.bucket, "Key": name},
+                    ContentType=content_type_for(name),
+                    MetadataDirective="REPLACE",
+                )
+        finally:
+            Path(tmp_path).unlink(missing_ok=True)
+
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        return await asyncio.to_thread(self._stat, name)
+
+    def _stat(self, name: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=name)
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return StoredObject(
+            name, head["ContentLength"], head["LastModified"].timestamp()
+        )
+
+    async def delete(self, name: str) -> Optional[int]:
+        stored = await self.stat(name)
+        if stored is None:
+            return None
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=name)
+        return stored.size
+
+    async def list(self, prefix: str) -> List[StoredObject]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def _list(self, prefix: str) -> List[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        return [
+            StoredObject(item["Key"], item["Size"], item["LastModified"].timestamp())
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix)
+            for item in page.get("Contents", [])
+        ]
+
+    @asynccontextmanager
+    async def local_copy(self, name: str) -> AsyncIterator[str]:
+        fd, path = tempfile.mkstemp(dir=tmp_dir(), suffix=Path(name).suffix)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(self.client.download_file, self.bucket, name, path)
+            yield path
+        finally:
+            Path(path).unlink(missing_ok=True)
+
+    async def iter_bytes(self, name: str, start: int, end: int) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(
+            self.client.get_object,
+            Bucket=self.bucket,
+            Key=name,
+            Range=f"bytes={start}-{end - 1}",
+        )
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, READ_CHUNK_BYTES):
+                yield chunk
+        finally:
+            body.close()
+
+
+@lru_cache(maxsize=None)
+def _s3_storage(
+    bucket: str, endpoint_url: str, region: str, multipart_chunk_bytes: int
+) -> S3Storage:
+    # Клиент boto3 потокобезопасен и создаётся один раз на набор настроек
+    return S3Storage(bucket, endpoint_url, region, multipart_chunk_bytes)
+
+
+def get_storage() -> MediaStorage:
+    """
+    Хранилище медиафайлов по настройке media_storage ("local" или "s3").
+    """
+    if settings.media_storage == "s3":
+        return _s3_storage(
+            settings.media_s3_bucket,
+            settings.media_s3_endpoint_url,
+            settings.media_s3_region,
+            settings.media_s3_multipart_chunk_bytes,
+        )
+    return LocalStorage(settings.media_root)
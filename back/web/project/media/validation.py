@@ -0,0 +1,185 @@
+"""
+validation.py
+
+Модуль проверки загружаемых изображений по содержимому, а не по
+заявленному клиентом content_type:
+- тип определяется по сигнатуре (magic bytes) первых байт потока;
+- размеры читаются из заголовка PNG/JPEG, пока файл ещё загружается,
+  и "бомбы декомпрессии" отклоняются до записи остального потока;
+- полное декодирование (Pillow) выполняется в пуле потоков после записи
+  во временный файл и до его сохранения.
+"""
+
+import struct
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from ..exceptions import BackendException
+from ..settings import settings
+
+# Сигнатуры поддерживаемых форматов: content_type -> первые байты файла
+SIGNATURES = {
+    "image/png": b"\x89PNG\r\n\x1a\n",
+    "image/jpeg": b"\xff\xd8\xff",
+}
+PIL_FORMATS = {"image/png": "PNG", "image/jpeg": "JPEG"}
+
+# Сколько первых байт потока просматривается в поисках размеров изображения
+HEADER_SNIFF_BYTES = 64 * 1024
+
+# Маркеры JPEG начала кадра (SOFn), в которых записаны размеры
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Маркеры JPEG без поля длины
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD9)) | {0x01}
+
+
+def bad_image(message: str) -> BackendException:
+    """
+    Ошибка содержимого загружаемого изображения.
+    """
+    return BackendException(
+        error_type="BAD IMAGE", error_message=message, status_code=400
+    )
+
+
+def not_an_image() -> BackendException:
+    """
+    Ошибка загрузки, содержимое которой не является изображением jpeg или png.
+    """
+    return BackendException(
+        error_type="BAD FILE",
+        error_message="Содержимое файла не является изображением jpeg или png",
+        status_code=400,
+    )
+
+
+def sniff_type(header: bytes) -> Optional[str]:
+    """
+    Метод определения типа изображения по сигнатуре.
+
+    :param header: Первые байты файла.
+    :return: content_type или None, если сигнатура не распознана.
+    """
+    for content_type, signature in SIGNATURES.items():
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def _jpeg_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Размеры JPEG из маркера SOFn (None - маркер дальше просмотренных байт).
+    """
+    position = 2
+    while position + 4 <= len(header):
+        if header[position] != 0xFF:
+            raise bad_image("Повреждённый заголовок JPEG")
+        marker = header[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if position + 9 > len(header):
+                return None
+            height, width = struct.unpack(">HH", header[position + 5 : position + 9])
+            return width, height
+        (length,) = struct.unpack(">H", header[position + 2 : position + 4])
+        position += 2 + length
+    return None
+
+
+def image_dimensions(header: bytes, content_type: str) -> Optional[Tuple[int, int]]:
+    """
+    Метод чтения размеров изображения из заголовка без декодирования.
+
+    :param header: Первые байты файла.
+    :param content_type: Тип, определённый по сигнатуре.
+    :return: (ширина, высота) или None, если заголовок ещё не прочитан целиком.
+    """
+    if content_type == "image/png":
+        if len(header) < 24:
+            return None
+        if header[12:16] != b"IHDR":
+            raise bad_image("Повреждённый заголовок PNG")
+        return struct.unpack(">II", header[16:24])
+    return _jpeg_dimensions(header)
+
+
+def check_dimensions(width: int, height: int) -> None:
+    """
+    Метод проверки размеров: пустые изображения и "бомбы декомпрессии"
+    (больше settings.media_max_image_pixels пикселей) отклоняются.
+    """
+    if width <= 0 or height <= 0:
+        raise bad_image("Изображение без размеров")
+    if width * height > settings.media_max_image_pixels:
+        raise bad_image(
+            f"Изображение {width}x{height} больше "
+            f"{settings.media_max_image_pixels} пикселей"
+        )
+
+
+class ImageSniffer:
+    """
+    Проверка изображения по мере поступления потока загрузки.
+    Хранит не больше HEADER_SNIFF_BYTES первых байт.
+    """
+
+    def __init__(self) -> None:
+        self.header = b""
+        self.content_type: Optional[str] = None
+        self.dimensions: Optional[Tuple[int, int]] = None
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Метод обработки очередного блока потока.
+
+        :param chunk: Блок загружаемого файла.
+        """
+        if self.dimensions is not None or len(self.header) >= HEADER_SNIFF_BYTES:
+            return
+        self.header += chunk[: HEADER_SNIFF_BYTES - len(self.header)]
+
+        if self.content_type is None:
+            if len(self.header) < max(map(len, SIGNATURES.values())):
+                return
+            self.content_type = sniff_type(self.header)
+            if self.content_type is None:
+                raise not_an_image()
+
+        self.dimensions = image_dimensions(self.header, self.content_type)
+        if self.dimensions is not None:
+            check_dimensions(*self.dimensions)
+
+    def finish(self) -> str:
+        """
+        Метод завершения проверки потока.
+
+        :return: content_type, определённый по содержимому.
+        """
+        if self.content_type is None:
+            self.content_type = sniff_type(self.header)
+            if self.content_type is None:
+                raise not_an_image()
+        return self.content_type
+
+
+def verify_image(path: str, content_type: str) -> None:
+    """
+    Метод полного декодирования изображения (выполняется в пуле потоков).
+
+    :param path: Путь временного файла загрузки.
+    :param content_type: Тип, определённый по сигнатуре.
+    """
+    try:
+        with Image.open(path) as image:
+            if image.format != PIL_FORMATS[content_type]:
+                raise bad_image("Формат изображения не совпадает с сигнатурой")
+            check_dimensions(*image.size)
+            image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise bad_image("Изображение повреждено или не декодируется")
@@ -0,0 +1,329 @@
+"""
+media_gc.py
+
+Модуль сборки мусора медиафайлов:
+- записи medias, так и не привязанные к твиту за media_gc_grace_seconds,
+  удаляются вместе с файлом (если на файл больше не ссылается ни одна запись);
+- файлы хранилища без записи в medias (записи удалены каскадом вместе
+  с твитом) удаляются вместе с производными;
+- производные без оригинала, брошенные временные файлы загрузок
+  и просроченные сессии возобновляемой загрузки удаляются.
+Работа идёт пакетами по media_gc_batch_size с паузой
+media_gc_batch_pause_seconds между ними. Файл, изменённый позже начала
+срока (в том числе переиспользованный новой загрузкой), не удаляется.
+
+Запуск: python -m project.media_gc (или периодически в приложении,
+см. media_gc_interval_seconds). Одновременно идёт один проход: на PostgreSQL
+его держит advisory-блокировка, поэтому воркеры uvicorn и запуск по cron
+не удаляют одни и те же файлы параллельно - занятый проход пропускается.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .database import Media, async_session, engine
+from .logging_config import setup_custom_logger
+from .media.derivatives import DERIVATIVE_SIZES, derivative_name
+from .media.media_services import MEDIA_EXTENSIONS, PREFIX_NAME
+from .media.resumable import purge_expired_uploads
+from .media.storage import UPLOAD_TMP_DIR, MediaStorage, get_storage
+from .metrics import metrics
+from .settings import settings
+
+logger = setup_custom_logger(__name__)
+
+ORIGINAL_SUFFIXES = tuple(f".{extension}" for extension in MEDIA_EXTENSIONS.values())
+DERIVATIVE_SUFFIXES = tuple(f"_{kind}.webp" for kind in DERIVATIVE_SIZES)
+# Недописанная производная прежних версий (запись рядом с оригиналом)
+PARTIAL_SUFFIX = ".part"
+# Каталоги первого уровня разбиения по хэшу: 00/ ... ff/
+SHARD_PREFIXES = [f"{shard:02x}/" for shard in range(256)]
+# Ключ advisory-блокировки прохода сборки мусора (PostgreSQL)
+MEDIA_GC_LOCK_KEY = 0x6D656469
+
+
+def _remove_file(path: Path) -> Optional[int]:
+    """
+    Удаление локального файла.
+
+    :return: Освобождено байт (None, если файла уже нет).
+    """
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except FileNotFoundError:
+        return None
+    return size
+
+
+def _remove_files(paths: Iterable[Path]) -> List[int]:
+    """
+    Удаление локальных файлов.
+
+    :return: Размеры удалённых файлов.
+    """
+    return [size for size in map(_remove_file, paths) if size is not None]
+
+
+async def _remove_objects(storage: MediaStorage, names: Iterable[str]) -> List[int]:
+    """
+    Удаление объектов хранилища.
+
+    :return: Размеры удалённых объектов.
+    """
+    sizes = [await storage.delete(name) for name in names]
+    return [size for size in sizes if size is not None]
+
+
+async def _remove_media(
+    storage: MediaStorage, name: str, cutoff_ts: float
+) -> List[int]:
+    """
+    Удаление оригинала и его производных. Оригинал, изменённый после
+    cutoff_ts, оставляется: его только что переиспользовала загрузка.
+
+    :param storage: Хранилище медиафайлов.
+    :param name: Имя оригинала в хранилище.
+    :param cutoff_ts: Граница срока (время UNIX).
+    :return: Размеры удалённых объектов.
+    """
+    original = await storage.stat(name)
+    if original is not None and original.modified >= cutoff_ts:
+        return []
+    return await _remove_objects(
+        storage, [name] + [derivative_name(name, kind) for kind in DERIVATIVE_SIZES]
+    )
+
+
+def _account(stats: Dict[str, int], sizes: List[int]) -> None:
+    stats["deleted_files"] += len(sizes)
+    stats["reclaimed_bytes"] += sum(sizes)
+
+
+async def _collect_unattached(
+    session: AsyncSession, stats: Dict[str, int], cutoff: datetime, cutoff_ts: float
+) -> None:
+    """
+    Удаление записей medias, не привязанных к твиту дольше срока,
+    и файлов, на которые больше не ссылается ни одна запись.
+    """
+    storage = get_storage()
+    last_id = 0
+    while True:
+        query_result = await session.execute(
+            select(Media.id)
+            .where(
+                Media.id > last_id,
+                Media.tweet_id.is_(None),
+                Media.created_at < cutoff,
+            )
+            .order_by(Media.id)
+            .limit(settings.media_gc_batch_size)
+        )
+        ids = query_result.scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        # Повторное условие tweet_id IS NULL: медиа могли привязать к твиту
+        # между выборкой и удалением
+        delete_result = await session.execute(
+            delete(Media)
+            .where(Media.id.in_(ids), Media.tweet_id.is_(None))
+            .returning(Media.name)
+        )
+        names = set(delete_result.scalars().all())
+        await session.commit()
+        stats["deleted_rows"] += len(names)
+
+        query_result = await session.execute(
+            select(Media.name).where(Media.name.in_(list(names))).distinct()
+        )
+        still_used = set(query_result.scalars().all())
+        for name in names - still_used:
+            if name.startswith(PREFIX_NAME):
+                sizes = await _remove_media(
+                    storage, name[len(PREFIX_NAME) :], cutoff_ts
+                )
+                _account(stats, sizes)
+        await asyncio.sleep(settings.media_gc_batch_pause_seconds)
+
+
+async def _collect_unreferenced(
+    session: AsyncSession, stats: Dict[str, int], cutoff_ts: float
+) -> None:
+    """
+    Удаление файлов без записей в medias, производных без оригинала
+    и недописанных производных. Хранилище обходится по каталогам
+    разбиения по хэшу.
+    """
+    storage = get_storage()
+    batch_size = settings.media_gc_batch_size
+    for prefix in SHARD_PREFIXES:
+        objects = await storage.list(prefix)
+        stale = [stored.name for stored in objects if stored.modified < cutoff_ts]
+
+        originals = [name for name in stale if name.endswith(ORIGINAL_SUFFIXES)]
+        removed = set()
+        for start in range(0, len(originals), batch_size):
+            batch = originals[start : start + batch_size]
+            query_result = await session.execute(
+                select(Media.name)
+                .where(Media.name.in_([PREFIX_NAME + name for name in batch]))
+                .distinct()
+            )
+            referenced = set(query_result.scalars().all())
+            for name in batch:
+                if PREFIX_NAME + name not in referenced:
+                    sizes = await _remove_media(storage, name, cutoff_ts)
+                    if sizes:
+                        removed.add(name)
+                    _account(stats, sizes)
+            await asyncio.sleep(settings.media_gc_batch_pause_seconds)
+
+        # Производные, оригинал которых удалён, и недописанные производные
+        originals_left = {
+            stored.name.rpartition(".")[0]
+            for stored in objects
+            if stored.name.endswith(ORIGINAL_SUFFIXES) and stored.name not in removed
+        }
+        leftovers = [
+            name
+            for name in stale
+            if name.endswith(PARTIAL_SUFFIX)
+            or (
+                name.endswith(DERIVATIVE_SUFFIXES)
+                and name.rpartition("_")[0] not in originals_left
+            )
+        ]
+        _account(stats, await _remove_objects(storage, leftovers))
+
+
+def _collect_upload_leftovers(cutoff_ts: float) -> List[int]:
+    """
+    Удаление временных файлов прерванных загрузок старше срока.
+    """
+    tmp_dir = Path(settings.media_root) / UPLOAD_TMP_DIR
+    if not tmp_dir.is_dir():
+        return []
+    return _remove_files(
+        path
+        for path in sorted(tmp_dir.rglob("*"))
+        if path.is_file() and path.stat().st_mtime < cutoff_ts
+    )
+
+
+async def collect_media_garbage(session: AsyncSession) -> Dict[str, int]:
+    """
+    Метод сборки мусора медиафайлов.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :return: Количество удалённых записей medias и файлов,
+        освобождено байт, удалено просроченных сессий загрузки.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.media_gc_grace_seconds
+    )
+    cutoff_ts = cutoff.timestamp()
+    stats = {
+        "deleted_rows": 0,
+        "deleted_files": 0,
+        "reclaimed_bytes": 0,
+        "expired_uploads": 0,
+    }
+
+    await _collect_unattached(session, stats, cutoff, cutoff_ts)
+    await _collect_unreferenced(session, stats, cutoff_ts)
+    _account(stats, await asyncio.to_thread(_collect_upload_leftovers, cutoff_ts))
+    stats["expired_uploads"] = await asyncio.to_thread(purge_expired_uploads)
+
+    metrics.inc("media_gc_runs_total")
+    metrics.inc("media_gc_deleted_rows_total", stats["deleted_rows"])
+    metrics.inc("media_gc_deleted_files_total", stats["deleted_files"])
+    metrics.inc("media_gc_reclaimed_bytes_total", stats["reclaimed_bytes"])
+    return stats
+
+
+@asynccontextmanager
+async def media_gc_lock(bind: AsyncEngine = engine) -> AsyncIterator[bool]:
+    """
+    Блокировка прохода сборки мусора между процессами: pg_try_advisory_lock
+    на отдельном соединении, которое держит её до конца прохода (сессия
+    сборщика коммитит пакеты и может сменить соединение). На SQLite
+    (тесты, один процесс) блокировки нет.
+
+    :param bind: Движок базы данных.
+    :return: True - блокировка получена, проход можно выполнять.
+    """
+    if bind.dialect.name != "postgresql":
+        yield True
+        return
+    async with bind.connect() as connection:
+        query_result = await connection.execute(
+            select(func.pg_try_advisory_lock(MEDIA_GC_LOCK_KEY))
+        )
+        acquired = bool(query_result.scalar())
+        # Блокировка уровня сессии переживает транзакцию
+        await connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await connection.execute(
+                    select(func.pg_advisory_unlock(MEDIA_GC_LOCK_KEY))
+                )
+                await connection.commit()
+
+
+async def run_media_gc() -> Optional[Dict[str, int]]:
+    """
+    Метод одного прохода сборки мусора под блокировкой media_gc_lock.
+
+    :return: Статистика прохода или None, если проход уже идёт
+        в другом процессе.
+    """
+    async with media_gc_lock() as acquired:
+        if not acquired:
+            logger.info("Сборка мусора медиа уже идёт в другом процессе, пропуск")
+            return None
+        async with async_session() as session:
+            return await collect_media_garbage(session)
+
+
+async def run_media_gc_periodically(interval: float) -> None:
+    """
+    Фоновая задача приложения: сборка мусора раз в interval секунд.
+    Ошибка одного прохода записывается в лог и не останавливает задачу.
+
+    :param interval: Период запуска, секунд.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        started = time.monotonic()
+        try:
+            stats = await run_media_gc()
+            if stats is None:
+                continue
+            logger.info(
+                f"Сборка мусора медиа за {time.monotonic() - started:.1f} с: {stats}"
+            )
+        except Exception as error:
+            metrics.inc("media_gc_failed_total")
+            logger.error(f"Ошибка сборки мусора медиа: {error}", exc_info=True)
+
+
+async def main() -> None:
+    stats = await run_media_gc()
+    if stats is not None:
+        logger.info(f"Сборка мусора медиа завершена: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
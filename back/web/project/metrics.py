@@ -0,0 +1,37 @@
+"""
+metrics.py
+
+Модуль простых in-process метрик: именованные счётчики и их снимок для /api/metrics.
+"""
+
+from collections import defaultdict
+from threading import Lock
+from typing import Dict
+
+
+class Metrics:
+    """Потокобезопасный реестр счётчиков."""
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._lock = Lock()
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """
+        Метод увеличения счётчика.
+
+        :param name: Имя счётчика.
+        :param value: Величина приращения.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Метод получения текущих значений всех счётчиков.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+
+metrics = Metrics()
@@ -0,0 +1,180 @@
+"""
+migrate_media_layout.py
+
+Модуль переноса медиафайлов из плоского каталога media_root в разбиение
+по хэшу содержимого (ab/cd/<sha256>.<расширение>) без остановки приложения:
+1. файл связывается жёсткой ссылкой (или копируется) по новому пути -
+   старый URL продолжает работать;
+2. Media.name пакета переписывается одной транзакцией;
+3. старый файл удаляется, когда на него не осталось ссылок в medias.
+Расширение нового имени определяется по сигнатуре содержимого (jpg, png):
+файлы других форматов отдача по новым именам не принимает, поэтому они
+и их записи остаются на месте и попадают в отчёт.
+Повторный запуск безопасен: перенесённые записи пропускаются, а уже
+существующие файлы по новому пути переиспользуются.
+
+Запуск: python -m project.migrate_media_layout
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Media, async_session
+from .logging_config import setup_custom_logger
+from .media.media_services import MEDIA_EXTENSIONS, PREFIX_NAME, sharded_name
+from .media.validation import sniff_type
+from .settings import settings
+
+logger = setup_custom_logger(__name__)
+
+MIGRATE_BATCH_SIZE = 500
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Имя, уже сохранённое по хэшу содержимого в плоском каталоге
+FLAT_HASHED_NAME = re.compile(r"^([0-9a-f]{64})\.\w+$")
+
+# Байт в начале файла, достаточных для сигнатуры формата
+SIGNATURE_BYTES = 16
+
+
+def _file_digest(path: Path) -> str:
+    """
+    sha256 файла, читаемого блоками.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while block := source.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _place_sharded(media_root: Path, flat_name: str) -> Optional[str]:
+    """
+    Размещение файла плоского каталога по новому пути без удаления старого.
+
+    :return: Новый относительный путь или None, если исходного файла нет.
+    :raises ValueError: Содержимое - не jpeg и не png.
+    """
+    source = media_root / flat_name
+    if not source.is_file():
+        return None
+
+    with open(source, "rb") as file:
+        content_type = sniff_type(file.read(SIGNATURE_BYTES))
+    if content_type is None:
+        raise ValueError(f"Неподдерживаемый формат медиафайла: {flat_name!r}")
+
+    hashed = FLAT_HASHED_NAME.match(flat_name)
+    digest = hashed.group(1) if hashed else _file_digest(source)
+    new_name = sharded_name(digest, MEDIA_EXTENSIONS[content_type])
+    target = media_root / new_name
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            # Файловая система без жёстких ссылок - копия через временный файл
+            tmp_target = target.with_suffix(target.suffix + ".part")
+            shutil.copyfile(source, tmp_target)
+            os.replace(tmp_target, target)
+    return new_name
+
+
+def _is_flat(name: str) -> bool:
+    """
+    Запись ссылается на файл плоского каталога (старая раскладка).
+    """
+    return name.startswith(PREFIX_NAME) and "/" not in name[len(PREFIX_NAME) :]
+
+
+async def migrate_media_layout(
+    session: AsyncSession, batch_size: int = MIGRATE_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Метод переноса медиафайлов в раскладку по хэшу.
+    Каждый пакет записей medias по id - отдельная короткая транзакция.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :param batch_size: Количество записей medias в одном пакете.
+    :return: Количество перенесённых записей, удалённых старых файлов,
+        записей без файла на диске и файлов неподдерживаемого формата.
+    """
+    media_root = Path(settings.media_root)
+    stats = {
+        "migrated": 0,
+        "removed_files": 0,
+        "missing_files": 0,
+        "unsupported_files": 0,
+    }
+    last_id = 0
+    while True:
+        query_result = await session.execute(
+            select(Media.id, Media.name)
+            .where(Media.id > last_id)
+            .order_by(Media.id)
+            .limit(batch_size)
+        )
+        rows = query_result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        flat_names = {
+            row.name[len(PREFIX_NAME) :] for row in rows if _is_flat(row.name)
+        }
+        new_names = {}
+        for flat_name in flat_names:
+            try:
+                new_name = await asyncio.to_thread(
+                    _place_sharded, media_root, flat_name
+                )
+            except ValueError as error:
+                logger.warning(f"{error}, файл и запись оставлены")
+                stats["unsupported_files"] += 1
+                continue
+            if new_name is None:
+                logger.warning(f"Нет файла медиа {flat_name}, запись оставлена")
+                stats["missing_files"] += 1
+            else:
+                new_names[PREFIX_NAME + flat_name] = PREFIX_NAME + new_name
+        if not new_names:
+            continue
+
+        update_result = await session.execute(
+            update(Media)
+            .where(
+                Media.id.in_([row.id for row in rows]),
+                Media.name.in_(list(new_names)),
+            )
+            .values(name=case(new_names, value=Media.name))
+        )
+        await session.commit()
+        stats["migrated"] += update_result.rowcount
+
+        # Старый файл удаляется, только если на него больше нет записей
+        query_result = await session.execute(
+            select(Media.name).where(Media.name.in_(list(new_names))).distinct()
+        )
+        still_used = set(query_result.scalars().all())
+        for old_name in set(new_names) - still_used:
+            (media_root / old_name[len(PREFIX_NAME) :]).unlink(missing_ok=True)
+            stats["removed_files"] += 1
+    return stats
+
+
+async def main() -> None:
+    async with async_session() as session:
+        stats = await migrate_media_layout(session)
+    logger.info(f"Перенос медиафайлов завершён: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+pagination.py
+
+Модуль keyset-пагинации: кодирование и разбор непрозрачных курсоров.
+Курсор - base64 от JSON-списка значений ключа сортировки последней записи страницы.
+"""
+
+import base64
+import binascii
+import json
+import math
+from typing import Any, Optional, Tuple, Type
+
+from .exceptions import BackendException
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+# Границы BIGINT: значения вне них база данных отвергает с ошибкой
+MAX_CURSOR_INT = 2**63 - 1
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Метод кодирования значений ключа сортировки в непрозрачный курсор.
+
+    :param values: Значения ключа сортировки последней записи страницы.
+    :return: Строка курсора.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _valid_value(value: Any, kind: Type) -> bool:
+    """
+    Проверка значения курсора: kind int - целое в границах BIGINT,
+    kind float - конечное число (целое тоже подходит).
+    """
+    if isinstance(value, bool):
+        return False
+    if kind is int:
+        return isinstance(value, int) and abs(value) <= MAX_CURSOR_INT
+    return isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def decode_cursor(
+    cursor: Optional[str], types: Tuple[Type, ...]
+) -> Optional[Tuple[Any, ...]]:
+    """
+    Метод разбора курсора, полученного от клиента.
+
+    :param cursor: Строка курсора или None для первой страницы.
+    :param types: Ожидаемые типы значений курсора (int или float).
+    :return: Кортеж значений ключа сортировки или None.
+    """
+    if not cursor:
+        return None
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, ValueError):
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(map(_valid_value, values, types))
+    ):
+        raise BackendException(
+            error_type="BAD CURSOR",
+            error_message="Некорректный курсор пагинации",
+            status_code=400,
+        )
+    return tuple(values)
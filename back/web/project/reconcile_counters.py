@@ -0,0 +1,101 @@
+"""
+reconcile_counters.py
+
+Модуль задания сверки денормализованных счётчиков:
+users.followers_count, users.following_count и tweets.likes_count
+пересчитываются по followers и likes пакетами по диапазонам id,
+исправляются только разошедшиеся строки.
+
+Запуск: python -m project.reconcile_counters
+"""
+
+import asyncio
+from typing import Dict
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Like, Tweet, User, async_session, followers
+from .logging_config import setup_custom_logger
+
+logger = setup_custom_logger(__name__)
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _counter_sources():
+    """
+    Счётчики и их эталонные значения: (имя, модель, колонка, подзапрос подсчёта).
+    """
+    return (
+        (
+            "users.followers_count",
+            User,
+            User.followers_count,
+            select(func.count())
+            .select_from(followers)
+            .where(followers.c.followed_user_id == User.id)
+            .scalar_subquery(),
+        ),
+        (
+            "users.following_count",
+            User,
+            User.following_count,
+            select(func.count())
+            .select_from(followers)
+            .where(followers.c.following_user_id == User.id)
+            .scalar_subquery(),
+        ),
+        (
+            "tweets.likes_count",
+            Tweet,
+            Tweet.likes_count,
+            select(func.count())
+            .select_from(Like)
+            .where(Like.tweet_id == Tweet.id)
+            .scalar_subquery(),
+        ),
+    )
+
+
+async def reconcile_counters(
+    session: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Метод сверки и исправления счётчиков.
+    Каждый пакет id - отдельная короткая транзакция.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :param batch_size: Размер диапазона id в одном пакете.
+    :return: Количество исправленных строк по каждому счётчику.
+    """
+    repaired = {}
+    for name, model, column, actual in _counter_sources():
+        repaired[name] = 0
+        max_id = (await session.execute(select(func.max(model.id)))).scalar() or 0
+        for start in range(0, max_id + 1, batch_size):
+            result = await session.execute(
+                update(model)
+                .where(
+                    model.id >= start,
+                    model.id < start + batch_size,
+                    column != actual,
+                )
+                .values({column.key: actual})
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            repaired[name] += result.rowcount
+        if repaired[name]:
+            logger.warning(f"Исправлено расхождений {name}: {repaired[name]}")
+    return repaired
+
+
+async def main() -> None:
+    async with async_session() as session:
+        repaired = await reconcile_counters(session)
+    logger.info(f"Сверка счётчиков завершена: {repaired}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+"""
+responses.py
+
+Модуль быстрых JSON-ответов.
+FastJSONResponse кодирует ответ через orjson (в несколько раз быстрее
+стандартного json). Обработчики чтения (твиты, профили) возвращают его
+напрямую со словарями, собранными из строк запроса: FastAPI не проверяет
+такой ответ по response_model и не прогоняет его через jsonable_encoder,
+схема ответа остаётся только для документации.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, кодируемый orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
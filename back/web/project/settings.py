@@ -0,0 +1,135 @@
+"""
+settings.py
+
+Модуль настроек приложения.
+Каждое поле Settings можно переопределить переменной окружения
+с тем же именем в верхнем регистре (например, FANOUT_CELEBRITY_THRESHOLD).
+"""
+
+import os
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+
+class Settings(BaseModel):
+    """
+    Настройки приложения.
+
+    :param fanout_celebrity_threshold: Порог числа подписчиков, выше которого
+        твиты автора не рассылаются по лентам, а подмешиваются при чтении.
+    :param auth_cache_size: Максимум записей в кэше аутентификации по api-key.
+    :param auth_cache_ttl_seconds: Время жизни записи кэша аутентификации.
+    :param likers_sample_size: Сколько последних лайкнувших отдаётся в твите.
+    :param database_url: URL основной базы данных.
+    :param db_echo: Логировать ли SQL-запросы (только для отладки).
+    :param db_pool_size: Постоянный размер пула соединений.
+    :param db_max_overflow: Сколько соединений сверх пула допускается при пиках.
+    :param db_pool_timeout: Ожидание свободного соединения из пула, секунды.
+    :param db_pool_recycle: Пересоздание соединений старше N секунд.
+    :param db_pool_pre_ping: Проверять соединение перед выдачей из пула.
+    :param db_statement_timeout_ms: statement_timeout PostgreSQL, мс
+        (0 - без ограничения).
+    :param db_prepared_statement_cache_size: Размер кэша prepared statements
+        SQLAlchemy (0 - отключить вместе с кэшем asyncpg statement_cache_size,
+        нужно за pgbouncer в режиме transaction).
+    :param database_replica_urls: URL реплик для чтения через запятую
+        (пусто - нет реплик).
+    :param read_your_writes_seconds: Сколько секунд после записи чтения этого
+        клиента (cookie rw_until; без cookie - api-key в пределах процесса)
+        идут в основную БД.
+    :param media_root: Каталог хранения загруженных медиафайлов.
+    :param media_max_upload_bytes: Максимальный размер загружаемого файла.
+    :param media_upload_chunk_bytes: Размер блока потоковой записи загрузки.
+    :param media_upload_session_ttl_seconds: Срок жизни сессии возобновляемой
+        загрузки без активности.
+    :param media_max_image_pixels: Максимум пикселей загружаемого изображения
+        (защита от "бомб декомпрессии").
+    :param media_derivative_workers: Процессов построения производных изображений
+        (0 - производные не строятся).
+    :param media_gc_grace_seconds: Сколько медиа может оставаться не привязанным
+        к твиту (и файл - без записи в medias) до удаления сборщиком.
+    :param media_gc_batch_size: Записей или файлов в одном пакете сборщика.
+    :param media_gc_batch_pause_seconds: Пауза между пакетами сборщика
+        (ограничение нагрузки на БД и диск).
+    :param media_gc_interval_seconds: Период фонового запуска сборщика
+        в приложении (0 - не запускается, только python -m project.media_gc).
+    :param media_storage: Хранилище медиафайлов: "local" (каталог media_root)
+        или "s3" (S3-совместимое, нужен boto3).
+    :param media_s3_bucket: Бакет S3 для медиафайлов.
+    :param media_s3_endpoint_url: URL S3-совместимого сервиса (MinIO);
+        пусто - AWS S3.
+    :param media_s3_region: Регион S3 (пусто - из окружения boto3).
+    :param media_s3_multipart_chunk_bytes: Размер части составной загрузки
+        в S3 (не меньше 5 МиБ - минимум S3).
+    :param compression_minimum_size: Ответы меньше стольких байт не сжимаются
+        (0 - сжатие ответов выключено).
+    :param compression_gzip_level: Уровень сжатия gzip (1-9).
+    :param compression_brotli_quality: Качество сжатия brotli (0-11).
+    :param compression_thread_threshold_bytes: Тела ответов от этого размера
+        сжимаются в пуле потоков, а не в цикле событий.
+    """
+
+    fanout_celebrity_threshold: int = Field(default=10_000, ge=0)
+    auth_cache_size: int = Field(default=10_000, ge=0)
+    auth_cache_ttl_seconds: float = Field(default=60.0, gt=0)
+    likers_sample_size: int = Field(default=3, ge=0)
+
+    database_url: str = "postgresql+asyncpg://admin:admin@db:5432/diplom_project"
+    db_echo: bool = False
+    db_pool_size: int = Field(default=10, ge=1)
+    db_max_overflow: int = Field(default=20, ge=0)
+    db_pool_timeout: float = Field(default=30.0, gt=0)
+    db_pool_recycle: int = Field(default=1800, ge=-1)
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = Field(default=15_000, ge=0)
+    db_prepared_statement_cache_size: int = Field(default=100, ge=0)
+
+    database_replica_urls: str = ""
+    read_your_writes_seconds: float = Field(default=5.0, gt=0)
+
+    media_root: str = "/usr/src/app/media/media_files"
+    media_max_upload_bytes: int = Field(default=10 * 1024 * 1024, gt=0)
+    media_upload_chunk_bytes: int = Field(default=64 * 1024, gt=0)
+    media_upload_session_ttl_seconds: int = Field(default=24 * 3600, gt=0)
+    media_max_image_pixels: int = Field(default=25_000_000, gt=0)
+    media_derivative_workers: int = Field(default=2, ge=0)
+    media_gc_grace_seconds: int = Field(default=24 * 3600, ge=0)
+    media_gc_batch_size: int = Field(default=500, gt=0)
+    media_gc_batch_pause_seconds: float = Field(default=0.1, ge=0)
+    media_gc_interval_seconds: int = Field(default=0, ge=0)
+    media_storage: Literal["local", "s3"] = "local"
+    media_s3_bucket: str = ""
+    media_s3_endpoint_url: str = ""
+    media_s3_region: str = ""
+    media_s3_multipart_chunk_bytes: int = Field(
+        default=8 * 1024 * 1024, ge=5 * 1024 * 1024
+    )
+
+    compression_minimum_size: int = Field(default=1024, ge=0)
+    compression_gzip_level: int = Field(default=6, ge=1, le=9)
+    compression_brotli_quality: int = Field(default=4, ge=0, le=11)
+    compression_thread_threshold_bytes: int = Field(default=256 * 1024, ge=0)
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Метод создания настроек из переменных окружения.
+        """
+        values = {
+            name: os.environ[name.upper()]
+            for name in cls.model_fields
+            if name.upper() in os.environ
+        }
+        return cls(**values)
+
+    def replica_urls(self) -> List[str]:
+        """
+        Метод получения списка URL реплик для чтения.
+        """
+        return [
+            url.strip() for url in self.database_replica_urls.split(",") if url.strip()
+        ]
+
+
+settings = Settings.from_env()
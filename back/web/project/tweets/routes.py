@@ -4,33 +4,76 @@ routes.py
 Модуль Роуты/эндпоинты для работы с твитами.
 """
 
-from typing import Union
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, Response, Security
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Response, Security
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..database import get_read_session, get_session, get_session_factory
+from ..pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from ..responses import FastJSONResponse
 from ..schemas_overal import ErrorSchema, OnlyResult
 from ..tweets.schemas import (
     BaseAnsTweet,
+    LikeListOutSchema,
     TweetIn,
     TweetListOutSchema,
     TweetSchema,
 )
+from ..tweets.search_services import search_tweets
 from ..tweets.tweets_services import (
     delete_like,
     delete_tweet,
     get_tweet,
+    get_tweet_likes,
     get_tweets,
-    insert_media,
     post_like,
     post_tweet,
 )
-from ..users.user_services import api_key_header
+from ..users.schemas import Principal
+from ..users.user_services import (
+    api_key_header,
+    get_current_reader,
+    get_optional_user,
+)
+from .timeline_services import run_fan_out
 
 router = APIRouter(prefix="/tweets", tags=["Tweets"])
 
 
+# Объявлен до "/{id}", иначе "search" разбирался бы как id твита
+@router.get(
+    "/search",
+    summary="Полнотекстовый поиск твитов",
+    response_description="Страница найденных твитов",
+    response_model=Union[TweetListOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def search_tweets_handler(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=256, description="Поисковый запрос"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    viewer: Optional[Principal] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
+    """
+    Метод поиска твитов по словам, от более релевантных к менее.
+    :param response: Объект ответа FastAPI
+    :param q: str - поисковый запрос (все слова должны встречаться в твите)
+    :param cursor: str - курсор следующей страницы из предыдущего ответа
+    :param limit: int - размер страницы
+    :param viewer: Principal, optional - пользователь по api-key (для liked_by_me)
+    :param session: асинхронная сессия SQLAlchemy (реплика для чтения)
+    :return: Страница найденных твитов и курсор следующей страницы.
+    """
+    viewer_id = viewer.id if viewer else None
+    page = await search_tweets(
+        session=session, text=q, cursor=cursor, limit=limit, viewer_id=viewer_id
+    )
+    return FastJSONResponse(page)
+
+
 @router.get(
     "/{id}",
     summary="Получение твита по id",
@@ -41,41 +84,80 @@ router = APIRouter(prefix="/tweets", tags=["Tweets"])
 async def get_tweet_handler(
     response: Response,
     id: int,
-    session: AsyncSession = Depends(get_session),
-) -> Union[TweetSchema, ErrorSchema]:
+    viewer: Optional[Principal] = Depends(get_optional_user),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
     """
     Метод получения твита по id.
     :param  response: Объект ответа FastAPI
     :param id: int - идентификатор твита в БД
-    :param  session: асинхронная сессия SQLAlchemy
+    :param viewer: Principal, optional - пользователь по api-key (для liked_by_me)
+    :param  session: асинхронная сессия SQLAlchemy (реплика для чтения)
     :return: твит или ошибка.
     """
-    result = await get_tweet(session=session, tweet_id=id)
-    return result
+    viewer_id = viewer.id if viewer else None
+    result = await get_tweet(session=session, tweet_id=id, viewer_id=viewer_id)
+    return FastJSONResponse(result)
+
+
+@router.get(
+    "/{id}/likes",
+    summary="Список лайкнувших твит",
+    response_description="Страница пользователей, поставивших лайк",
+    response_model=Union[LikeListOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def get_tweet_likes_handler(
+    response: Response,
+    id: int,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
+    """
+    Метод получения полного списка лайкнувших твит, от новых к старым.
+    :param response: Объект ответа FastAPI
+    :param id: int - идентификатор твита
+    :param cursor: str - курсор следующей страницы из предыдущего ответа
+    :param limit: int - размер страницы
+    :param session: асинхронная сессия SQLAlchemy (реплика для чтения)
+    :return: Страница лайкнувших или ошибка.
+    """
+    page = await get_tweet_likes(
+        session=session, tweet_id=id, cursor=cursor, limit=limit
+    )
+    return FastJSONResponse(page)
 
 
 @router.get(
     "/",
-    summary="Получение твитов пользователя по api-key",
-    response_description="Список твитов",
+    summary="Получение ленты пользователя по api-key",
+    response_description="Страница ленты твитов",
     response_model=Union[TweetListOutSchema, ErrorSchema],
     status_code=200,
 )
 async def get_tweets_handler(
     response: Response,
-    api_key: str = Security(api_key_header),
-    session: AsyncSession = Depends(get_session),
-) -> Union[TweetListOutSchema, ErrorSchema]:
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: Principal = Depends(get_current_reader),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
     """
-    Метод получения твитов пользователя по api-key.
+    Метод получения ленты пользователя по api-key: его твиты и твиты
+    пользователей, на которых он подписан, от новых к старым.
     :param response: Объект ответа FastAPI
-    :param api_key: str - API-ключ пользователя
-    :param session: асинхронная сессия SQLAlchemy
+    :param cursor: str - курсор следующей страницы из предыдущего ответа
+    :param limit: int - размер страницы
+    :param current_user: Principal - пользователь по api-key
+    :param session: асинхронная сессия SQLAlchemy (реплика для чтения)
 
-    :return: Список твитов.
+    :return: Страница ленты и курсор следующей страницы.
     """
-    result = await get_tweets(api_key=api_key, session=session)
-    return result
+    result = await get_tweets(
+        session=session, user_id=current_user.id, cursor=cursor, limit=limit
+    )
+    return FastJSONResponse(result)
 
 
 @router.post(
@@ -88,16 +170,21 @@ async def get_tweets_handler(
 async def post_tweets_handler(
     response: Response,
     tweet: TweetIn,
+    background_tasks: BackgroundTasks,
     api_key: str = Security(api_key_header),
     session: AsyncSession = Depends(get_session),
+    session_factory=Depends(get_session_factory),
 ) -> Union[BaseAnsTweet, ErrorSchema]:
     """
     Метод публикации твита пользователя по api-key.
+    Рассылка твита в ленты подписчиков выполняется в фоне после ответа.
 
     :param response: Объект ответа FastAPI
     :param tweet: TweetIn - данные твита (текст, медиа)
+    :param background_tasks: фоновые задачи FastAPI
     :param api_key: str - API-ключ пользователя
     :param session: асинхронная сессия SQLAlchemy
+    :param session_factory: фабрика сессий для фоновой рассылки
 
     :return: Результат публикации твита.
     """
@@ -105,13 +192,9 @@ async def post_tweets_handler(
         api_key=api_key,
         session=session,
         tweet_data=tweet.tweet_data,
+        media_ids=tweet.tweet_media_ids,
     )
-    if tweet.tweet_media_ids:
-        await insert_media(
-            session=session,
-            tweet_id=new_tweet_id,
-            tweet_medias=tweet.tweet_media_ids,
-        )
+    background_tasks.add_task(run_fan_out, session_factory, new_tweet_id)
     return {"result": True, "tweet_id": new_tweet_id}
 
 
@@ -40,15 +40,34 @@ class BaseAnsTweet(BaseModel):
     tweet_id: int = Field(..., description="Идентификатор твита в СУБД")
 
 
+class AttachmentSchema(BaseModel):
+    """
+    Схема URL вложения: оригинал и производные (когда построены).
+
+    :param original: str - URL оригинала.
+    :param thumb: str, optional - URL миниатюры.
+    :param feed: str, optional - URL изображения размера ленты.
+    """
+
+    original: str = Field(..., description="URL оригинала")
+    thumb: Optional[str] = Field(default=None, description="URL миниатюры")
+    feed: Optional[str] = Field(default=None, description="URL размера ленты")
+
+
 class TweetSchema(BaseModel):
     """
     Схема базового твита.
 
     :param id: int - идентификатор твита.
     :param content: str - текст твита.
-    :param attachments: List[str], optional - список вложений.
+    :param attachments: List[str], optional - список вложений (изображение
+        размера ленты, пока оно не построено - оригинал).
+    :param attachment_urls: List[AttachmentSchema] - оригиналы и производные вложений.
     :param author: AuthorBaseSchema - автор твита.
-    :param likes: List[AuthorLikeSchema], optional - пользователи, поставившие лайк.
+    :param likes: List[AuthorLikeSchema], optional - последние лайкнувшие
+        (не больше settings.likers_sample_size, полный список - /tweets/{id}/likes).
+    :param likes_count: int - количество лайков.
+    :param liked_by_me: bool - лайкнул ли твит текущий пользователь.
     """
 
     id: int = Field(..., description="Идентификатор твита")
@@ -56,11 +75,19 @@ class TweetSchema(BaseModel):
         ..., json_schema_extra={"example": "супер твит"}, description="Содержание твита"
     )
     attachments: Optional[Sequence[str]] = Field(
-        default=None, description="Список вложений"
+        default=None,
+        description="Список вложений (WebP размера ленты, пока его нет - оригинал)",
+    )
+    attachment_urls: List[AttachmentSchema] = Field(
+        default_factory=list, description="Оригиналы и производные вложений"
     )
     author: AuthorBaseSchema = Field(..., description="Автор твита")
     likes: Optional[List[AuthorLikeSchema]] = Field(
-        default=None, description="Пользователи, поставившие лайк"
+        default=None, description="Последние пользователи, поставившие лайк"
+    )
+    likes_count: int = Field(default=0, description="Количество лайков")
+    liked_by_me: bool = Field(
+        default=False, description="Лайк текущего пользователя на твите"
     )
 
     @validator("attachments", pre=True)
@@ -81,9 +108,29 @@ class TweetListOutSchema(BaseModel):
 
     :param result: bool.
     :param tweets: List[TweetSchema], optional - список твитов.
+    :param next_cursor: str, optional - курсор следующей страницы.
     """
 
     result: bool = Field(True, description="Флаг успешного выполнения")
     tweets: Optional[List[TweetSchema]] = Field(
         default=None, description="Список твитов"
     )
+    next_cursor: Optional[str] = Field(
+        default=None, description="Курсор следующей страницы (нет - конец ленты)"
+    )
+
+
+class LikeListOutSchema(BaseModel):
+    """
+    Схема страницы списка лайкнувших твит.
+
+    :param result: bool.
+    :param likes: List[AuthorLikeSchema] - пользователи, поставившие лайк.
+    :param next_cursor: str, optional - курсор следующей страницы.
+    """
+
+    result: bool = Field(True, description="Флаг успешного выполнения")
+    likes: List[AuthorLikeSchema] = Field(..., description="Поставившие лайк")
+    next_cursor: Optional[str] = Field(
+        default=None, description="Курсор следующей страницы (нет - конец списка)"
+    )
@@ -0,0 +1,114 @@
+"""
+search_services.py
+
+Модуль полнотекстового поиска по твитам:
+- PostgreSQL: GIN-индекс по выражению tsvector, ранжирование ts_rank_cd;
+- SQLite: таблица FTS5 tweets_fts, ранжирование bm25.
+Результаты от более релевантных к менее, пагинация keyset по (rank, id).
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import and_, func, literal_column, or_, select, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import TWEET_SEARCH_CONFIG, TWEET_SEARCH_VECTOR, Tweet
+from ..exceptions import BackendException
+from ..pagination import DEFAULT_PAGE_LIMIT, decode_cursor, encode_cursor
+from .tweets_services import get_likes_preview, select_tweet_rows, tweet_to_dict
+
+tweets_fts = table("tweets_fts")
+
+
+def _ranked_matches(terms: List[str], dialect_name: str):
+    """
+    Запрос найденных твитов: tweet_id и rank (больше - релевантнее).
+    Все слова запроса должны встречаться в твите.
+    """
+    if dialect_name == "postgresql":
+        search_vector = literal_column(TWEET_SEARCH_VECTOR, TSVECTOR)
+        query = func.plainto_tsquery(TWEET_SEARCH_CONFIG, " ".join(terms))
+        return select(
+            Tweet.id.label("tweet_id"),
+            func.ts_rank_cd(search_vector, query).label("rank"),
+        ).where(search_vector.op("@@")(query))
+
+    # Каждое слово - фраза в кавычках, чтобы символы синтаксиса FTS5
+    # в пользовательском вводе не разбирались как операторы
+    match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    fts = literal_column("tweets_fts")
+    return (
+        select(
+            literal_column("tweets_fts.rowid").label("tweet_id"),
+            # bm25 тем меньше, чем релевантнее - меняем знак
+            (-func.bm25(fts)).label("rank"),
+        )
+        .select_from(tweets_fts)
+        .where(fts.op("MATCH")(match))
+    )
+
+
+async def search_tweets(
+    session: AsyncSession,
+    text: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    viewer_id: Optional[int] = None,
+) -> dict:
+    """
+    Метод полнотекстового поиска твитов.
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param text: str - поисковый запрос
+    :param cursor: str - курсор следующей страницы (None - первая страница)
+    :param limit: int - максимальное количество твитов на странице
+    :param viewer_id: int - идентификатор текущего пользователя (None - аноним)
+    :return: dict с флагом result, списком твитов и курсором следующей страницы
+    """
+    terms = text.split()
+    if not terms:
+        raise BackendException(
+            error_type="BAD QUERY",
+            error_message="Пустой поисковый запрос",
+            status_code=400,
+        )
+
+    matches = _ranked_matches(terms, session.bind.dialect.name).subquery()
+    page = select(matches.c.tweet_id, matches.c.rank)
+    position = decode_cursor(cursor, (float, int))
+    if position:
+        rank, tweet_id = position
+        page = page.where(
+            or_(
+                matches.c.rank < rank,
+                and_(matches.c.rank == rank, matches.c.tweet_id < tweet_id),
+            )
+        )
+    page = page.order_by(matches.c.rank.desc(), matches.c.tweet_id.desc()).limit(
+        limit + 1
+    )
+    rows = (await session.execute(page)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].tweet_id)
+
+    tweet_ids = [row.tweet_id for row in rows]
+    query_result = await session.execute(
+        select_tweet_rows(session).where(Tweet.id.in_(tweet_ids))
+    )
+    tweets = {tweet.id: tweet for tweet in query_result.all()}
+    preview = await get_likes_preview(
+        session=session, tweet_ids=tweet_ids, viewer_id=viewer_id
+    )
+    return {
+        "result": True,
+        "tweets": [
+            tweet_to_dict(tweets[tweet_id], preview[tweet_id])
+            for tweet_id in tweet_ids
+            if tweet_id in tweets
+        ],
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,190 @@
+"""
+timeline_services.py
+
+Модуль материализованных лент (гибридный fan-out):
+- публикация твита в ленту автора и фоновая рассылка в ленты подписчиков;
+- твиты "знаменитостей" (подписчиков больше settings.fanout_celebrity_threshold
+  на момент публикации) не рассылаются и остаются с Tweet.fanned_out = false;
+  такие твиты подмешиваются в ленту при чтении, даже если автор с тех пор
+  опустился ниже порога;
+- отзыв записей при удалении твита и отписке;
+- наполнение ленты недавними твитами при подписке.
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import Tweet, User, dialect_insert, followers, timelines
+from ..logging_config import setup_custom_logger
+from ..metrics import metrics
+from ..settings import settings
+
+logger = setup_custom_logger(__name__)
+
+# Сколько последних твитов автора попадает в ленту при подписке на него
+TIMELINE_BACKFILL_LIMIT = 50
+
+
+async def add_to_own_timeline(
+    session: AsyncSession, tweet_id: int, author_id: int
+) -> None:
+    """
+    Метод добавления твита в ленту автора (в транзакции публикации твита).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_id: int - идентификатор твита
+    :param author_id: int - идентификатор автора
+    """
+    await session.execute(
+        dialect_insert(session, timelines)
+        .values(user_id=author_id, tweet_id=tweet_id, author_id=author_id)
+        .on_conflict_do_nothing()
+    )
+
+
+async def count_followers(session: AsyncSession, user_id: int) -> int:
+    """
+    Метод получения числа подписчиков пользователя (из счётчика users).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param user_id: int - идентификатор пользователя
+    :return: int - число подписчиков
+    """
+    query_result = await session.execute(
+        select(User.followers_count).where(User.id == user_id)
+    )
+    return query_result.scalar_one_or_none() or 0
+
+
+async def get_pulled_tweet_ids(
+    session: AsyncSession,
+    user_id: int,
+    limit: int,
+    before: Optional[int] = None,
+) -> List[int]:
+    """
+    Метод получения нерассылавшихся твитов подписок пользователя
+    (Tweet.fanned_out = false), от новых к старым.
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param user_id: int - идентификатор владельца ленты
+    :param limit: int - максимальное количество твитов
+    :param before: int - только твиты с id меньше before (None - с начала)
+    :return: List[int] - идентификаторы твитов
+    """
+    query = (
+        select(Tweet.id)
+        .join(followers, followers.c.followed_user_id == Tweet.user_id)
+        .where(followers.c.following_user_id == user_id, Tweet.fanned_out.is_(False))
+    )
+    if before is not None:
+        query = query.where(Tweet.id < before)
+    query_result = await session.execute(query.order_by(Tweet.id.desc()).limit(limit))
+    return list(query_result.scalars().all())
+
+
+async def fan_out_tweet(session: AsyncSession, tweet_id: int) -> None:
+    """
+    Метод рассылки твита в ленты подписчиков автора одним INSERT ... SELECT
+    с отметкой Tweet.fanned_out в той же транзакции. Если твит уже удалён,
+    ничего не вставляется. Твиты авторов с числом подписчиков выше порога
+    не рассылаются и не отмечаются (путь pull).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_id: int - идентификатор твита
+    """
+    query_result = await session.execute(
+        select(Tweet.user_id).where(Tweet.id == tweet_id)
+    )
+    author_id = query_result.scalars().one_or_none()
+    if author_id is None:
+        return
+    if (
+        await count_followers(session=session, user_id=author_id)
+        > settings.fanout_celebrity_threshold
+    ):
+        metrics.inc("fanout_pull_total")
+        return
+
+    metrics.inc("fanout_push_total")
+    subscribers = (
+        select(followers.c.following_user_id, Tweet.id, Tweet.user_id)
+        .join(Tweet, Tweet.user_id == followers.c.followed_user_id)
+        .where(Tweet.id == tweet_id)
+    )
+    await session.execute(
+        dialect_insert(session, timelines)
+        .from_select(["user_id", "tweet_id", "author_id"], subscribers)
+        .on_conflict_do_nothing()
+    )
+    await session.execute(
+        update(Tweet).where(Tweet.id == tweet_id).values(fanned_out=True)
+    )
+    await session.commit()
+
+
+async def run_fan_out(session_factory, tweet_id: int) -> None:
+    """
+    Фоновая стадия fan-out: выполняется после ответа клиенту в своей сессии.
+
+    :param session_factory: Фабрика асинхронных сессий
+    :param tweet_id: int - идентификатор твита
+    """
+    try:
+        async with session_factory() as session:
+            await fan_out_tweet(session=session, tweet_id=tweet_id)
+    except Exception as error:
+        logger.error(f"Ошибка fan-out твита {tweet_id}: {error}", exc_info=True)
+
+
+async def retract_tweet(session: AsyncSession, tweet_id: int) -> None:
+    """
+    Метод удаления твита из всех лент (в транзакции удаления твита).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_id: int - идентификатор твита
+    """
+    await session.execute(delete(timelines).where(timelines.c.tweet_id == tweet_id))
+
+
+async def retract_author(session: AsyncSession, user_id: int, author_id: int) -> None:
+    """
+    Метод удаления твитов автора из ленты пользователя (при отписке).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param user_id: int - идентификатор владельца ленты
+    :param author_id: int - идентификатор автора
+    """
+    await session.execute(
+        delete(timelines).where(
+            timelines.c.user_id == user_id, timelines.c.author_id == author_id
+        )
+    )
+
+
+async def backfill_author(session: AsyncSession, user_id: int, author_id: int) -> None:
+    """
+    Метод добавления последних твитов автора в ленту пользователя (при подписке).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param user_id: int - идентификатор владельца ленты
+    :param author_id: int - идентификатор автора
+    """
+    recent_tweets = (
+        select(Tweet.id)
+        .where(Tweet.user_id == author_id)
+        .order_by(Tweet.id.desc())
+        .limit(TIMELINE_BACKFILL_LIMIT)
+    )
+    await session.execute(
+        dialect_insert(session, timelines)
+        .from_select(
+            ["user_id", "tweet_id", "author_id"],
+            select(literal(user_id), Tweet.id, Tweet.user_id).where(
+                Tweet.id.in_(recent_tweets)
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
@@ -4,67 +4,339 @@ tweets_services.py
 Модуль Асинхронные сервисные функции для работы с твитами и лайками.
 """
 
-from sqlalchemy import delete, insert, select, update
-from sqlalchemy.exc import IntegrityError
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    delete,
+    false,
+    func,
+    insert,
+    literal,
+    select,
+    true,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
 
-from ..database import Like, Media, Tweet, User
+from ..database import (
+    Like,
+    Media,
+    Tweet,
+    User,
+    dialect_insert,
+    json_array,
+    timelines,
+)
 from ..exceptions import BackendException
+from ..media.derivatives import media_urls
+from ..metrics import metrics
+from ..pagination import DEFAULT_PAGE_LIMIT, decode_cursor, encode_cursor
+from ..settings import settings
 from ..users.user_services import get_current_user
+from .timeline_services import (
+    add_to_own_timeline,
+    get_pulled_tweet_ids,
+    retract_tweet,
+)
 
 
-async def get_tweet(session: AsyncSession, tweet_id: int):
+def _likers_sample(tweet_ids: List[int], dialect_name: str, size: int):
+    """
+    Запрос выборки последних лайкнувших для страницы твитов.
+    На PostgreSQL - LATERAL с LIMIT на каждый твит (читается не больше size
+    строк индекса даже у вирусного твита), на SQLite - row_number() по окну.
+    """
+    if dialect_name == "postgresql":
+        page = select(Tweet.id).where(Tweet.id.in_(tweet_ids)).subquery()
+        last_likes = (
+            select(Like.id, Like.user_id)
+            .where(Like.tweet_id == page.c.id)
+            .order_by(Like.id.desc())
+            .limit(size)
+            .lateral()
+        )
+        return (
+            select(
+                page.c.id.label("tweet_id"),
+                last_likes.c.user_id,
+                User.name,
+                true().label("in_sample"),
+            )
+            .select_from(page)
+            .join(last_likes, true())
+            .join(User, User.id == last_likes.c.user_id)
+        )
+
+    ranked = (
+        select(
+            Like.tweet_id,
+            Like.user_id,
+            func.row_number()
+            .over(partition_by=Like.tweet_id, order_by=Like.id.desc())
+            .label("position"),
+        )
+        .where(Like.tweet_id.in_(tweet_ids))
+        .subquery()
+    )
+    return (
+        select(
+            ranked.c.tweet_id,
+            ranked.c.user_id,
+            User.name,
+            true().label("in_sample"),
+        )
+        .join(User, User.id == ranked.c.user_id)
+        .where(ranked.c.position <= size)
+    )
+
+
+async def get_likes_preview(
+    session: AsyncSession, tweet_ids: Iterable[int], viewer_id: Optional[int] = None
+) -> Dict[int, dict]:
+    """
+    Метод получения выборки лайкнувших и флага "лайкнул я" для страницы твитов
+    одним пакетным запросом (UNION ALL выборки и лайков зрителя).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_ids: идентификаторы твитов страницы
+    :param viewer_id: int - идентификатор текущего пользователя (None - аноним)
+    :return: dict tweet_id -> {"likes": [...], "liked_by_me": bool}
+    """
+    tweet_ids = list(tweet_ids)
+    preview = {tweet_id: {"likes": [], "liked_by_me": False} for tweet_id in tweet_ids}
+    if not tweet_ids:
+        return preview
+
+    query = _likers_sample(
+        tweet_ids, session.bind.dialect.name, settings.likers_sample_size
+    )
+    if viewer_id is not None:
+        query = union_all(
+            query,
+            select(
+                Like.tweet_id,
+                Like.user_id,
+                User.name,
+                false().label("in_sample"),
+            )
+            .join(User, User.id == Like.user_id)
+            .where(Like.user_id == viewer_id, Like.tweet_id.in_(tweet_ids)),
+        )
+
+    query_result = await session.execute(query)
+    for row in query_result.all():
+        if row.in_sample:
+            preview[row.tweet_id]["likes"].append(
+                {"user_id": row.user_id, "name": row.name}
+            )
+        if row.user_id == viewer_id:
+            preview[row.tweet_id]["liked_by_me"] = True
+    return preview
+
+
+def select_tweet_rows(session: AsyncSession) -> Select:
+    """
+    Запрос строк ответа по твиту: колонки твита, автор и вложения
+    (JSON-массив) одной строкой, без загрузки ORM-объектов.
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :return: select, к которому добавляются условия и порядок
+    """
+    media = json_array(
+        session,
+        select(Media.id, Media.name, Media.derivatives_ready.label("ready"))
+        .where(Media.tweet_id == Tweet.id)
+        .order_by(Media.id)
+        .correlate(Tweet),
+        order_by="id",
+    )
+    return select(
+        Tweet.id,
+        Tweet.content,
+        Tweet.likes_count,
+        User.id.label("author_id"),
+        User.name.label("author_name"),
+        media.label("media"),
+    ).join(User, User.id == Tweet.user_id)
+
+
+def tweet_to_dict(tweet: Row, preview: dict) -> dict:
+    """
+    Метод сборки ответа по твиту: данные твита, счётчик и выборка лайков.
+
+    :param tweet: Row - строка запроса select_tweet_rows
+    :param preview: dict - выборка лайкнувших и флаг liked_by_me
+    :return: dict для TweetSchema
+    """
+    attachment_urls = [
+        media_urls(media["name"], bool(media["ready"])) for media in tweet.media
+    ]
+    return {
+        "id": tweet.id,
+        "content": tweet.content,
+        "attachments": [urls.get("feed", urls["original"]) for urls in attachment_urls],
+        "attachment_urls": attachment_urls,
+        "author": {"id": tweet.author_id, "name": tweet.author_name},
+        "likes": preview["likes"],
+        "likes_count": tweet.likes_count,
+        "liked_by_me": preview["liked_by_me"],
+    }
+
+
+async def get_tweet(
+    session: AsyncSession, tweet_id: int, viewer_id: Optional[int] = None
+) -> dict:
     """
     Метод получения твита по id.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param tweet_id: int - идентификатор твита
-    :return: Tweet объект
+    :param viewer_id: int - идентификатор текущего пользователя (None - аноним)
+    :return: dict с данными твита
     """
     query_result = await session.execute(
-        select(Tweet)
-        .options(selectinload(Tweet.author))
-        .options(selectinload(Tweet.likes).options(selectinload(Like.user)))
-        .options(selectinload(Tweet.media))
-        .where(Tweet.id == tweet_id)
+        select_tweet_rows(session).where(Tweet.id == tweet_id)
     )
-    tweet = query_result.scalars().one_or_none()
+    tweet = query_result.one_or_none()
     if not tweet:
         raise BackendException(
             error_type="NO TWEET", error_message="Не найдены твиты с таким id"
         )
-    return tweet
+    preview = await get_likes_preview(
+        session=session, tweet_ids=[tweet.id], viewer_id=viewer_id
+    )
+    return tweet_to_dict(tweet, preview[tweet.id])
 
 
-async def get_tweets(session: AsyncSession, api_key: str):
+async def get_tweet_likes(
+    session: AsyncSession,
+    tweet_id: int,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+) -> dict:
     """
-    Метод получения всех твитов пользователя по api_key.
+    Метод получения полного списка лайкнувших твит, от новых к старым.
+    Пагинация keyset по Like.id.
 
     :param session: Асинхронная сессия SQLAlchemy
-    :param api_key: str - API-ключ пользователя
-    :return: dict с флагом result и списком твитов
+    :param tweet_id: int - идентификатор твита
+    :param cursor: str - курсор следующей страницы (None - первая страница)
+    :param limit: int - размер страницы
+    :return: dict с флагом result, лайкнувшими и курсором следующей страницы
     """
-    await get_current_user(api_key=api_key, session=session)
+    query = (
+        select(Like.id, Like.user_id, User.name)
+        .join(User, User.id == Like.user_id)
+        .where(Like.tweet_id == tweet_id)
+        .order_by(Like.id.desc())
+        .limit(limit + 1)
+    )
+    position = decode_cursor(cursor, (int,))
+    if position:
+        query = query.where(Like.id < position[0])
+    query_result = await session.execute(query)
+    rows = query_result.all()
 
-    query_result = await session.execute(
-        select(Tweet)
-        .options(selectinload(Tweet.author))
-        .options(selectinload(Tweet.likes).options(selectinload(Like.user)))
-        .options(selectinload(Tweet.media))
-        .where(Tweet.author.has(User.api_key == api_key))
+    if not rows and not await session.get(Tweet, tweet_id):
+        raise BackendException(
+            error_type="NO TWEET", error_message="Не найдены твиты с таким id"
+        )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    likes = [{"user_id": row.user_id, "name": row.name} for row in rows]
+    return {"result": True, "likes": likes, "next_cursor": next_cursor}
+
+
+async def get_tweets(
+    session: AsyncSession,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+):
+    """
+    Метод получения домашней ленты пользователя.
+
+    Лента - твиты пользователей, на которых подписан пользователь, и его
+    собственные твиты, от новых к старым. Читается из материализованной
+    ленты timelines одним range scan по (user_id, tweet_id); нерассылавшиеся
+    твиты подписок (авторы-"знаменитости" на момент публикации) подмешиваются
+    по частичному индексу tweets (user_id, id) WHERE NOT fanned_out.
+    Пагинация keyset по Tweet.id: следующая страница запрашивается
+    по курсору последнего твита.
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param user_id: int - идентификатор владельца ленты
+    :param cursor: str - курсор следующей страницы (None - первая страница)
+    :param limit: int - максимальное количество твитов на странице
+    :return: dict с флагом result, списком твитов и курсором следующей страницы
+    """
+    position = decode_cursor(cursor, (int,))
+
+    pushed = select(timelines.c.tweet_id).where(timelines.c.user_id == user_id)
+    if position:
+        pushed = pushed.where(timelines.c.tweet_id < position[0])
+    pushed = pushed.order_by(timelines.c.tweet_id.desc()).limit(limit + 1)
+
+    pulled_ids = await get_pulled_tweet_ids(
+        session=session,
+        user_id=user_id,
+        limit=limit + 1,
+        before=position[0] if position else None,
+    )
+    if pulled_ids:
+        metrics.inc("timeline_read_merged_total")
+        pulled = select(Tweet.id.label("tweet_id")).where(Tweet.id.in_(pulled_ids))
+        page = union(select(pushed.subquery()), pulled).subquery()
+    else:
+        metrics.inc("timeline_read_materialized_total")
+        page = pushed.subquery()
+
+    query = (
+        select_tweet_rows(session)
+        .join(page, page.c.tweet_id == Tweet.id)
+        .order_by(Tweet.id.desc())
+        .limit(limit + 1)
+    )
+    query_result = await session.execute(query)
+    tweets = query_result.all()
+
+    # Лишний твит сверх limit означает, что есть следующая страница
+    next_cursor = None
+    if len(tweets) > limit:
+        tweets = tweets[:limit]
+        next_cursor = encode_cursor(tweets[-1].id)
+
+    preview = await get_likes_preview(
+        session=session, tweet_ids=[tweet.id for tweet in tweets], viewer_id=user_id
     )
-    tweets = query_result.scalars().all()
-    return {"result": True, "tweets": tweets}
+    return {
+        "result": True,
+        "tweets": [tweet_to_dict(tweet, preview[tweet.id]) for tweet in tweets],
+        "next_cursor": next_cursor,
+    }
 
 
-async def post_tweet(session: AsyncSession, api_key: str, tweet_data: str) -> int:
+async def post_tweet(
+    session: AsyncSession,
+    api_key: str,
+    tweet_data: str,
+    media_ids: Optional[List[int]] = None,
+) -> int:
     """
     Метод создания нового твита от пользователя.
+    Твит, запись в ленте автора и привязка медиа - одна транзакция;
+    рассылка подписчикам - фоновая стадия run_fan_out после ответа.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param api_key: str - API-ключ пользователя
     :param tweet_data: str - текст твита
+    :param media_ids: list[int] - идентификаторы загруженных медиафайлов
     :return: int - идентификатор нового твита
     """
     user = await get_current_user(api_key=api_key, session=session)
@@ -76,55 +348,102 @@ async def post_tweet(session: AsyncSession, api_key: str, tweet_data: str) -> in
         )
     )
     new_tweet_id = insert_tweet_query.inserted_primary_key[0]
+    if media_ids:
+        await attach_media(session=session, tweet_id=new_tweet_id, media_ids=media_ids)
+    await add_to_own_timeline(session=session, tweet_id=new_tweet_id, author_id=user.id)
     await session.commit()
     return new_tweet_id
 
 
-async def insert_media(session: AsyncSession, tweet_id: int, tweet_medias: list):
+async def attach_media(session: AsyncSession, tweet_id: int, media_ids: List[int]):
     """
-    Метод привязки медиафайлов к твиту.
+    Метод привязки медиафайлов к твиту одним UPDATE (в транзакции публикации).
+    Привязываются только существующие и ещё не прикреплённые медиа; если
+    обновлено меньше строк, чем запрошено, транзакция откатывается.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param tweet_id: int - идентификатор твита
-    :param tweet_medias: list[int] - список идентификаторов медиафайлов
+    :param media_ids: list[int] - список идентификаторов медиафайлов
     """
-    for media_id in tweet_medias:
-        await session.execute(
-            update(Media).where(Media.id == media_id).values(tweet_id=tweet_id)
+    media_ids = set(media_ids)
+    update_result = await session.execute(
+        update(Media)
+        .where(Media.id.in_(media_ids), Media.tweet_id.is_(None))
+        .values(tweet_id=tweet_id)
+    )
+    if update_result.rowcount != len(media_ids):
+        await session.rollback()
+        raise BackendException(
+            error_type="BAD MEDIA",
+            error_message="Медиа не найдены или уже прикреплены к другому твиту",
+            status_code=400,
         )
-        await session.commit()
 
 
 async def delete_tweet(session: AsyncSession, api_key: str, tweet_id: int):
     """
     Метод удаления твита пользователя.
+    Удаление - один DELETE ... RETURNING с условием на автора; причина
+    отказа (нет твита или чужой твит) выясняется только при промахе.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param api_key: str - API-ключ пользователя
     :param tweet_id: int - идентификатор твита
     """
     user = await get_current_user(api_key=api_key, session=session)
-    await get_tweet(session=session, tweet_id=tweet_id)
 
-    query_result = await session.execute(
-        select(Tweet.user_id).where(Tweet.id == tweet_id)
+    delete_result = await session.execute(
+        delete(Tweet)
+        .where(Tweet.id == tweet_id, Tweet.user_id == user.id)
+        .returning(Tweet.id)
     )
-    author_id = query_result.scalars().one_or_none()
-    if author_id != user.id:
+    if delete_result.scalar_one_or_none() is None:
+        await session.rollback()
+        await raise_tweet_not_found(session=session, tweet_id=tweet_id)
         raise BackendException(
             error_type="NO ACCESS",
             error_message="Твит принадлежит другому пользователю",
         )
 
+    await retract_tweet(session=session, tweet_id=tweet_id)
+    await session.commit()
+
+
+async def raise_tweet_not_found(session: AsyncSession, tweet_id: int):
+    """
+    Метод проверки существования твита на пути ошибки записи.
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_id: int - идентификатор твита
+    :raises BackendException: NO TWEET, если твита нет
+    """
+    query_result = await session.execute(select(Tweet.id).where(Tweet.id == tweet_id))
+    if query_result.scalar_one_or_none() is None:
+        raise BackendException(
+            error_type="NO TWEET", error_message="Не найдены твиты с таким id"
+        )
+
+
+async def shift_likes_count(session: AsyncSession, tweet_id: int, delta: int):
+    """
+    Метод изменения счётчика лайков твита (в транзакции лайка/снятия лайка).
+
+    :param session: Асинхронная сессия SQLAlchemy
+    :param tweet_id: int - идентификатор твита
+    :param delta: int - приращение счётчика (+1 или -1)
+    """
     await session.execute(
-        delete(Tweet).where(Tweet.id == tweet_id, Tweet.user_id == user.id)
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(likes_count=Tweet.likes_count + delta)
     )
-    await session.commit()
 
 
 async def post_like(session: AsyncSession, api_key: str, tweet_id: int) -> int:
     """
     Поставить лайк твиту.
+    Лайк вставляется одним INSERT ... SELECT ... ON CONFLICT DO NOTHING
+    RETURNING: строки нет, если твита нет или лайк уже поставлен.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param api_key: str - API-ключ пользователя
@@ -132,45 +451,49 @@ async def post_like(session: AsyncSession, api_key: str, tweet_id: int) -> int:
     :return: int - идентификатор нового лайка
     """
     user = await get_current_user(api_key=api_key, session=session)
-    await get_tweet(session=session, tweet_id=tweet_id)
 
-    try:
-        insert_like_query = await session.execute(
-            insert(Like).values(
-                tweet_id=tweet_id,
-                user_id=user.id,
-            )
+    insert_result = await session.execute(
+        dialect_insert(session, Like.__table__)
+        .from_select(
+            ["tweet_id", "user_id"],
+            select(Tweet.id, literal(user.id)).where(Tweet.id == tweet_id),
         )
-        new_like_id = insert_like_query.inserted_primary_key[0]
-        await session.commit()
-    except IntegrityError:
+        .on_conflict_do_nothing()
+        .returning(Like.id)
+    )
+    new_like_id = insert_result.scalar_one_or_none()
+    if new_like_id is None:
+        await session.rollback()
+        await raise_tweet_not_found(session=session, tweet_id=tweet_id)
         raise BackendException(
             error_type="BAD LIKE", error_message="Лайк уже поставлен"
         )
 
+    await shift_likes_count(session=session, tweet_id=tweet_id, delta=1)
+    await session.commit()
     return new_like_id
 
 
 async def delete_like(session: AsyncSession, api_key: str, tweet_id: int):
     """
-    Метод удаления лайка пользователя с твита.
+    Метод удаления лайка пользователя с твита (один DELETE ... RETURNING).
 
     :param session: Асинхронная сессия SQLAlchemy
     :param api_key: str - API-ключ пользователя
     :param tweet_id: int - идентификатор твита
     """
     user = await get_current_user(api_key=api_key, session=session)
-    query_result = await session.execute(
-        select(Like).where(Like.user_id == user.id).where(Like.tweet_id == tweet_id)
+    delete_result = await session.execute(
+        delete(Like)
+        .where(Like.tweet_id == tweet_id, Like.user_id == user.id)
+        .returning(Like.id)
     )
-    like = query_result.scalars().one_or_none()
-    if not like:
+    if delete_result.scalar_one_or_none() is None:
+        await session.rollback()
         raise BackendException(
             error_type="BAD LIKE DELETE",
             error_message="Нет лайка на данном твите",
         )
 
-    await session.execute(
-        delete(Like).where(Like.tweet_id == tweet_id, Like.user_id == user.id)
-    )
+    await shift_likes_count(session=session, tweet_id=tweet_id, delta=-1)
     await session.commit()
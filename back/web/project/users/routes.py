@@ -4,24 +4,30 @@ routes.py
 Модуль Роуты/эндпоинты для работы с пользователями и подписками.
 """
 
-from typing import Union
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Response, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import User, get_session
+from ..database import User, get_read_session, get_session
 from ..logging_config import setup_custom_logger
+from ..pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from ..responses import FastJSONResponse
 from ..schemas_overal import ErrorSchema, OnlyResult
 from ..users.schemas import (
+    Principal,
     UserIn,
+    UserListOutSchema,
     UserOut,
     UserResultOutSchema,
 )
 from ..users.user_services import (
     api_key_header,
     delete_follow_to_user,
+    get_current_reader,
     get_current_user,
+    get_follow_list,
     get_user,
     get_user_me,
     post_follow_to_user,
@@ -112,13 +118,69 @@ async def check_user(
     status_code=200,
 )
 async def get_user_me_handler(
-    current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> Union[UserResultOutSchema, ErrorSchema]:
+    current_user: Principal = Depends(get_current_reader),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
     """
     Метод получения информации о текущем пользователе по api_key.
     """
-    return await get_user_me(session, current_user.api_key)
+    return FastJSONResponse(await get_user_me(session, current_user.id))
+
+
+@router.get(
+    "/{id}/followers",
+    summary="Подписчики пользователя",
+    response_description="Страница подписчиков",
+    response_model=Union[UserListOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def get_followers_handler(
+    id: int,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
+    """
+    Метод получения страницы подписчиков пользователя.
+
+    :param id: ID пользователя.
+    :param cursor: Курсор следующей страницы из предыдущего ответа.
+    :param limit: Размер страницы.
+    :param session: Асинхронная сессия SQLAlchemy (реплика для чтения).
+    :return: Страница подписчиков или ошибка.
+    """
+    page = await get_follow_list(
+        session=session, user_id=id, direction="followers", cursor=cursor, limit=limit
+    )
+    return FastJSONResponse(page)
+
+
+@router.get(
+    "/{id}/following",
+    summary="Подписки пользователя",
+    response_description="Страница подписок",
+    response_model=Union[UserListOutSchema, ErrorSchema],
+    status_code=200,
+)
+async def get_following_handler(
+    id: int,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    session: AsyncSession = Depends(get_read_session),
+) -> FastJSONResponse:
+    """
+    Метод получения страницы пользователей, на которых подписан пользователь.
+
+    :param id: ID пользователя.
+    :param cursor: Курсор следующей страницы из предыдущего ответа.
+    :param limit: Размер страницы.
+    :param session: Асинхронная сессия SQLAlchemy (реплика для чтения).
+    :return: Страница подписок или ошибка.
+    """
+    page = await get_follow_list(
+        session=session, user_id=id, direction="following", cursor=cursor, limit=limit
+    )
+    return FastJSONResponse(page)
 
 
 @router.get(
@@ -129,17 +191,17 @@ async def get_user_me_handler(
     status_code=200,
 )
 async def get_user_by_id_handler(
-    response: Response, id: int, session: AsyncSession = Depends(get_session)
-) -> Union[UserResultOutSchema, ErrorSchema]:
+    response: Response, id: int, session: AsyncSession = Depends(get_read_session)
+) -> FastJSONResponse:
     """
     Метод возвращения информации о пользователе по его id.
 
     :param response: Объект ответа FastAPI.
     :param id: ID пользователя.
-    :param session: Асинхронная сессия SQLAlchemy.
+    :param session: Асинхронная сессия SQLAlchemy (реплика для чтения).
     :return: Данные пользователя или ошибка.
     """
-    return await get_user(session=session, user_id=id)
+    return FastJSONResponse(await get_user(session=session, user_id=id))
 
 
 @router.post(
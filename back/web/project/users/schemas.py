@@ -58,6 +58,18 @@ class AuthorBaseSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class Principal(BaseModel):
+    """
+    Схема аутентифицированного пользователя (результат проверки api-key).
+
+    :param id: Идентификатор пользователя.
+    :param name: Имя пользователя.
+    """
+
+    id: int
+    name: str
+
+
 class AuthorLikeSchema(BaseModel):
     """
     Схема автора для лайков.
@@ -75,17 +87,27 @@ class AuthorLikeSchema(BaseModel):
 class UserOutSchema(BaseModel):
     """
     Схема пользователя для с подписчиками и подписками.
+    Списки содержат только первую страницу, остальное - через
+    /users/{id}/followers и /users/{id}/following по курсору.
 
     :param id: Идентификатор пользователя.
     :param name: Имя пользователя.
-    :param followers: Список подписчиков.
-    :param following: Список пользователей, на которых подписан пользователь.
+    :param followers_count: Количество подписчиков.
+    :param following_count: Количество подписок.
+    :param followers: Первая страница подписчиков.
+    :param following: Первая страница пользователей, на которых подписан пользователь.
+    :param followers_next_cursor: Курсор второй страницы подписчиков.
+    :param following_next_cursor: Курсор второй страницы подписок.
     """
 
     id: int
     name: str
+    followers_count: int = 0
+    following_count: int = 0
     followers: Optional[List[AuthorBaseSchema]]
     following: Optional[List[AuthorBaseSchema]]
+    followers_next_cursor: Optional[str] = None
+    following_next_cursor: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -102,3 +124,17 @@ class UserResultOutSchema(BaseModel):
     user: UserOutSchema
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UserListOutSchema(BaseModel):
+    """
+    Схема страницы списка пользователей (подписчики или подписки).
+
+    :param result: Флаг успешности.
+    :param users: Пользователи страницы.
+    :param next_cursor: Курсор следующей страницы (None - конец списка).
+    """
+
+    result: bool = True
+    users: List[AuthorBaseSchema]
+    next_cursor: Optional[str] = None
@@ -4,52 +4,182 @@ user_services.py
 Модуль Асинхронные сервисные функции работы с пользователями и подписками (users и followers).
 Для пользователя: Метод получения пользователя по API-ключу,
                     создание, получение, оформление и удаление подписки,
-                    получение информации о себе.
+                    получение информации о себе,
+                    постраничные списки подписчиков и подписок.
+
+Кэш аутентификации (auth_cache) - в памяти процесса. Изменение или удаление
+пользователя сбрасывает запись только в своём процессе (ORM-события и явный
+вызов forget_principal для Core-запросов update/delete(User)); другие
+процессы (воркеры uvicorn) отдают прежнего пользователя по его api-key
+не дольше settings.auth_cache_ttl_seconds.
 """
 
+from typing import List, Optional, Tuple
+
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import APIKeyHeader
-from sqlalchemy import delete, insert, select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, delete, event, inspect, literal, select, update
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased
 
-from ..database import User, followers, get_session
+from ..cache import TTLCache
+from ..database import (
+    User,
+    async_session,
+    dialect_insert,
+    followers,
+    get_read_session,
+    get_session,
+    json_array,
+    replica_sessions,
+)
 from ..exceptions import BackendException
 from ..logging_config import setup_custom_logger
-from .schemas import UserIn, UserOutSchema, UserResultOutSchema
+from ..pagination import DEFAULT_PAGE_LIMIT, decode_cursor, encode_cursor
+from ..settings import settings
+from ..tweets.timeline_services import backfill_author, retract_author
+from .schemas import Principal, UserIn
 
 logger = setup_custom_logger(__name__)
 
 api_key_header = APIKeyHeader(name="api-key", auto_error=True)
+# Для публичных эндпоинтов, где api-key необязателен (персонализация ответа)
+optional_api_key_header = APIKeyHeader(name="api-key", auto_error=False)
+
+# Кэш аутентификации: api_key -> Principal (id, name).
+# Отсутствующие ключи не кэшируются, поэтому новый пользователь виден сразу.
+auth_cache = TTLCache(
+    maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds
+)
+
+
+def forget_principal(*api_keys: str) -> None:
+    """
+    Метод сброса записей кэша аутентификации в текущем процессе.
+    ORM-события не видят Core-запросов update(User)/delete(User), поэтому
+    код, меняющий или удаляющий пользователей такими запросами, вызывает
+    этот метод сам.
+
+    :param api_keys: API-ключи изменённых пользователей.
+    """
+    for api_key in api_keys:
+        auth_cache.pop(api_key)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_auth_cache(mapper, connection, target: User) -> None:
+    """
+    Метод инвалидации кэша аутентификации при создании, изменении
+    и удалении пользователя через ORM (в том числе по прежнему api-key).
+    """
+    forget_principal(target.api_key, *inspect(target).attrs.api_key.history.deleted)
 
 
 async def get_current_user(
     api_key: str = Security(api_key_header),
     session: AsyncSession = Depends(get_session),
-) -> User:
+) -> Principal:
     """
     Метод получения пользователя по API-ключу.
-    Зависимость аутентификации.
+    Зависимость аутентификации. Результат кэшируется в auth_cache;
+    при промахе выбираются только id и name, без загрузки связей.
 
     :param session: Асинхронная сессия SQLAlchemy.
     :param api_key: API-ключ пользователя.
-    :return: Объект пользователя (User).
+    :return: Аутентифицированный пользователь (Principal).
     """
+    principal = auth_cache.get(api_key)
+    if principal is not None:
+        return principal
 
     logger.info(f"Метод get_current_user API key: {api_key}")
 
     # Запрос к БД для поиска пользователя по api_key
-    result = await session.execute(select(User).where(User.api_key == api_key))
-
-    user = result.scalars().first()
+    result = await session.execute(
+        select(User.id, User.name).where(User.api_key == api_key)
+    )
+    row = result.first()
 
     # Если пользователь не найден - выбрасываем исключение
-    if not user:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Не валидный API Key"
         )
-    return user
+    principal = Principal(id=row.id, name=row.name)
+    auth_cache.set(api_key, principal)
+    return principal
+
+
+async def get_current_reader(
+    api_key: str = Security(api_key_header),
+    session: AsyncSession = Depends(get_read_session),
+) -> Principal:
+    """
+    Зависимость аутентификации для читающих эндпоинтов: при промахе кэша
+    пользователь ищется через сессию чтения (реплику) - ту же, что получает
+    обработчик. Реплика может ещё не получить только что созданного
+    пользователя, поэтому ключ, не найденный на реплике, проверяется
+    в основной БД.
+
+    :param api_key: API-ключ пользователя.
+    :param session: Сессия чтения SQLAlchemy.
+    :return: Аутентифицированный пользователь (Principal).
+    """
+    try:
+        return await get_current_user(api_key=api_key, session=session)
+    except HTTPException:
+        if not replica_sessions:
+            raise
+    async with async_session() as primary_session:
+        return await get_current_user(api_key=api_key, session=primary_session)
+
+
+async def get_optional_user(
+    api_key: Optional[str] = Security(optional_api_key_header),
+    session: AsyncSession = Depends(get_read_session),
+) -> Optional[Principal]:
+    """
+    Зависимость необязательной аутентификации для публичных эндпоинтов
+    (читающих: пользователь ищется через сессию чтения).
+
+    :param api_key: API-ключ пользователя или None.
+    :param session: Сессия чтения SQLAlchemy.
+    :return: Аутентифицированный пользователь или None без api-key.
+    """
+    if not api_key:
+        return None
+    return await get_current_reader(api_key=api_key, session=session)
+
+
+async def shift_follow_counters(
+    session: AsyncSession, follower_id: int, user_id: int, delta: int
+):
+    """
+    Метод изменения счётчиков подписки одним UPDATE (в транзакции подписки/отписки):
+    following_count подписчика и followers_count того, на кого подписываются.
+
+    :param session: асинхронная сессия SQLAlchemy.
+    :param follower_id: ID пользователя, который подписывается/отписывается.
+    :param user_id: ID пользователя, на которого подписываются/от которого отписываются.
+    :param delta: приращение счётчиков (+1 или -1).
+    """
+    await session.execute(
+        update(User)
+        .where(User.id.in_([follower_id, user_id]))
+        .values(
+            followers_count=case(
+                (User.id == user_id, User.followers_count + delta),
+                else_=User.followers_count,
+            ),
+            following_count=case(
+                (User.id == follower_id, User.following_count + delta),
+                else_=User.following_count,
+            ),
+        )
+    )
 
 
 async def post_follow_to_user(session: AsyncSession, follower_id: int, user_id: int):
@@ -67,104 +197,239 @@ async def post_follow_to_user(session: AsyncSession, follower_id: int, user_id:
             status_code=400,
         )
 
-    query_result = await session.execute(select(User).where(User.id == user_id))
-    user_followed = query_result.scalars().one_or_none()
-    if not user_followed:
-        raise BackendException(
-            error_type="NO USER",
-            error_message="Нет пользователя с user_id для подписки",
+    # Один INSERT ... SELECT: строки нет, если пользователя нет или подписка есть
+    insert_result = await session.execute(
+        dialect_insert(session, followers)
+        .from_select(
+            ["following_user_id", "followed_user_id"],
+            select(literal(follower_id), User.id).where(User.id == user_id),
         )
-    try:
-        await session.execute(
-            insert(followers).values(
-                following_user_id=follower_id,
-                followed_user_id=user_id,
+        .on_conflict_do_nothing()
+        .returning(followers.c.followed_user_id)
+    )
+    if insert_result.scalar_one_or_none() is None:
+        await session.rollback()
+        query_result = await session.execute(select(User.id).where(User.id == user_id))
+        if query_result.scalar_one_or_none() is None:
+            raise BackendException(
+                error_type="NO USER",
+                error_message="Нет пользователя с user_id для подписки",
             )
-        )
-    except IntegrityError:
         raise BackendException(
             error_type="BAD FOLLOW",
             error_message="Такая подписка уже существует",
             status_code=400,
         )
+    await shift_follow_counters(
+        session=session, follower_id=follower_id, user_id=user_id, delta=1
+    )
+    await backfill_author(session=session, user_id=follower_id, author_id=user_id)
     await session.commit()
 
 
 async def delete_follow_to_user(session: AsyncSession, follower_id: int, user_id: int):
     """
-    Метод отмены подписки на пользователя
+    Метод отмены подписки на пользователя (один DELETE ... RETURNING)
     :param session: асинхронная сессия SQLAlchemy.
     :param follower_id: ID пользователя, который отписывается.
     :param user_id: ID пользователя, от которого отписываются.
     :return: None
     """
-
-    # Проверка существует ли такая подписка
-    query_result = await session.execute(
-        select(followers).where(
-            followers.columns.following_user_id == follower_id,
-            followers.columns.followed_user_id == user_id,
+    delete_result = await session.execute(
+        delete(followers)
+        .where(
+            followers.c.following_user_id == follower_id,
+            followers.c.followed_user_id == user_id,
         )
+        .returning(followers.c.followed_user_id)
     )
-    follower = query_result.scalars().one_or_none()
-    if not follower:
+    if delete_result.scalar_one_or_none() is None:
+        await session.rollback()
         raise BackendException(
             error_type="BAD FOLLOW DELETE", error_message="Нет такого фолловера"
         )
 
-    # Удаление записи о подписке
-    await session.execute(
-        delete(followers).where(
-            followers.columns.following_user_id == follower_id,
-            followers.columns.followed_user_id == user_id,
-        )
+    await shift_follow_counters(
+        session=session, follower_id=follower_id, user_id=user_id, delta=-1
     )
+    await retract_author(session=session, user_id=follower_id, author_id=user_id)
     await session.commit()
 
 
-async def get_user_me(session: AsyncSession, api_key: str) -> UserResultOutSchema:
+# Направления списков связей: (колонка followers с id в списке, колонка с id владельца)
+FOLLOW_DIRECTIONS = {
+    "followers": (followers.c.following_user_id, followers.c.followed_user_id),
+    "following": (followers.c.followed_user_id, followers.c.following_user_id),
+}
+
+
+def select_follow_page(direction: str, owner_id, limit: int = DEFAULT_PAGE_LIMIT):
     """
-    Метод получения информации о текущем пользователе по api-key
-    :param session: асинхронная сессия SQLAlchemy.
-    :param api_key: API-ключ текущего пользователя.
-    :return: Объект пользователя
-    """
-    query_result = await session.execute(
-        select(User)
-        .options(selectinload(User.followers))
-        .options(selectinload(User.following))
-        .where(User.api_key == api_key)
+    Запрос страницы подписчиков или подписок: limit + 1 строк (id, name),
+    лишняя строка означает, что есть следующая страница.
+
+    :param direction: "followers" - подписчики, "following" - подписки.
+    :param owner_id: ID пользователя или колонка внешнего запроса.
+    :param limit: размер страницы.
+    :return: select по возрастанию id.
+    """
+    member_column, owner_column = FOLLOW_DIRECTIONS[direction]
+    return (
+        select(User.id, User.name)
+        .join(followers, member_column == User.id)
+        .where(owner_column == owner_id)
+        .order_by(User.id)
+        .limit(limit + 1)
     )
-    user = query_result.scalars().one_or_none()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    # Преобразование ORM-модель в Pydantic-схему с вложенными подписчиками и подписками
-    user_schema = UserOutSchema.from_orm(user)
-    return UserResultOutSchema(result=True, user=user_schema)
 
+async def get_follow_page(
+    session: AsyncSession,
+    user_id: int,
+    direction: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Метод получения страницы подписчиков или подписок пользователя.
+    Пагинация keyset по id пользователя в списке.
 
-async def get_user(session: AsyncSession, user_id: int):
+    :param session: асинхронная сессия SQLAlchemy.
+    :param user_id: ID пользователя, чей список запрашивается.
+    :param direction: "followers" - подписчики, "following" - подписки.
+    :param cursor: курсор следующей страницы (None - первая страница).
+    :param limit: максимальное количество пользователей на странице.
+    :return: список пользователей страницы (dict для AuthorBaseSchema)
+        и курсор следующей страницы.
     """
-    Метод получения пользователя по id
+    query = select_follow_page(direction=direction, owner_id=user_id, limit=limit)
+    position = decode_cursor(cursor, (int,))
+    if position:
+        query = query.where(User.id > position[0])
+
+    query_result = await session.execute(query)
+    rows = query_result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    users = [{"id": row.id, "name": row.name} for row in rows]
+    return users, next_cursor
+
+
+async def get_follow_list(
+    session: AsyncSession,
+    user_id: int,
+    direction: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+) -> dict:
+    """
+    Метод получения страницы подписчиков или подписок существующего пользователя.
+
     :param session: асинхронная сессия SQLAlchemy.
     :param user_id: ID пользователя.
-    :return: Объект пользователя.
+    :param direction: "followers" или "following".
+    :param cursor: курсор следующей страницы.
+    :param limit: размер страницы.
+    :return: Страница пользователей и курсор следующей страницы.
     """
-    query_result = await session.execute(
-        select(User)
-        .options(selectinload(User.following))
-        .options(selectinload(User.followers))
-        .where(User.id == user_id)
+    users, next_cursor = await get_follow_page(
+        session=session,
+        user_id=user_id,
+        direction=direction,
+        cursor=cursor,
+        limit=limit,
     )
+    # Пустая страница - проверяем, что пользователь вообще существует
+    if not users and not await session.get(User, user_id):
+        raise BackendException(
+            error_type="NO USER", error_message="Нет пользователя с таким id"
+        )
+    return {"result": True, "users": users, "next_cursor": next_cursor}
+
+
+def select_profile(session: AsyncSession, user_id: int):
+    """
+    Запрос профиля одной строкой: счётчики из users (без подсчёта строк
+    followers) и первые страницы подписчиков и подписок JSON-массивами.
 
-    user = query_result.scalars().one_or_none()
-    if not user:
+    :param session: асинхронная сессия SQLAlchemy.
+    :param user_id: ID пользователя.
+    :return: select строки профиля.
+    """
+    profile = aliased(User, name="profile")
+    pages = [
+        json_array(
+            session,
+            select_follow_page(direction, profile.id).correlate(profile),
+            order_by="id",
+        ).label(direction)
+        for direction in FOLLOW_DIRECTIONS
+    ]
+    return select(
+        profile.id,
+        profile.name,
+        profile.followers_count,
+        profile.following_count,
+        *pages,
+    ).where(profile.id == user_id)
+
+
+def profile_to_dict(user: Row) -> dict:
+    """
+    Метод сборки профиля из строки select_profile: лишний пользователь
+    сверх страницы означает, что у списка есть следующая страница.
+
+    :param user: строка профиля.
+    :return: dict для UserOutSchema.
+    """
+    profile = {
+        "id": user.id,
+        "name": user.name,
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+    }
+    for direction in FOLLOW_DIRECTIONS:
+        users = user._mapping[direction]
+        next_cursor = None
+        if len(users) > DEFAULT_PAGE_LIMIT:
+            users = users[:DEFAULT_PAGE_LIMIT]
+            next_cursor = encode_cursor(users[-1]["id"])
+        profile[direction] = users
+        profile[f"{direction}_next_cursor"] = next_cursor
+    return profile
+
+
+async def get_user_me(session: AsyncSession, user_id: int) -> dict:
+    """
+    Метод получения информации о текущем пользователе
+    :param session: асинхронная сессия SQLAlchemy.
+    :param user_id: ID текущего пользователя (из зависимости аутентификации).
+    :return: dict для UserResultOutSchema
+    """
+    query_result = await session.execute(select_profile(session, user_id))
+    user = query_result.one_or_none()
+    if user is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return {"result": True, "user": profile_to_dict(user)}
+
+
+async def get_user(session: AsyncSession, user_id: int) -> dict:
+    """
+    Метод получения пользователя по id
+    :param session: асинхронная сессия SQLAlchemy.
+    :param user_id: ID пользователя.
+    :return: dict для UserResultOutSchema.
+    """
+    query_result = await session.execute(select_profile(session, user_id))
+    user = query_result.one_or_none()
+    if user is None:
         raise BackendException(
             error_type="NO USER", error_message="Нет пользователя с таким id"
         )
-    user_schema = UserOutSchema.from_orm(user)
-    return UserResultOutSchema(result=True, user=user_schema)
+    return {"result": True, "user": profile_to_dict(user)}
 
 
 async def post_user(session: AsyncSession, user: UserIn) -> User:
@@ -178,4 +443,5 @@ async def post_user(session: AsyncSession, user: UserIn) -> User:
     async with session.begin():
         session.add(new_user)
         await session.commit()
+    forget_principal(new_user.api_key)
     return new_user
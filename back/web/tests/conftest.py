@@ -5,18 +5,24 @@
 -Создаёт и очищает таблицы перед и после тестов.
 -Предоставляет фикстуру session - асинхронную сессию для каждого теста, которая автоматически откатывается после теста.
 -Переопределение зависимости FastAPI get_session для использования тестовой сессии
--Фикстура client создаёт тестовый HTTP-клиент FastAPI (TestClient), переопределяет зависимость get_session,
-чтобы все запросы в тестах использовали тестовую сессию.
+-Фикстура client создаёт тестовый HTTP-клиент FastAPI (TestClient), переопределяет зависимости get_session
+, get_read_session и get_session_factory, чтобы все запросы и фоновые задачи в тестах
+использовали тестовую сессию.
 -Настройка асинхронного event loop для pytest-asyncio - запускает все асинхронные тесты в одном event loop
 -Фикстура test_user создаёт и возвращает тестового пользователя, чтобы переиспользовать её в разных тестах.
+-Фикстура make_png собирает корректное PNG-изображение заданного размера без Pillow.
 """
 
 import asyncio
+import struct
+import zlib
+from contextlib import asynccontextmanager
 
 import pytest
 from fastapi.testclient import TestClient
-from project.database import Base, get_session
+from project.database import Base, get_read_session, get_session, get_session_factory
 from project.main import app
+from project.users.user_services import auth_cache
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -57,11 +63,12 @@ async def prepare_database():
 
 @pytest.fixture(autouse=True)
 async def cleanup_tables(session):
-    """Метод удаление данных из всех таблиц после каждого теста"""
+    """Метод удаление данных из всех таблиц и кэша аутентификации после каждого теста"""
     yield
     for table in reversed(Base.metadata.sorted_tables):
         await session.execute(table.delete())
     await session.commit()
+    auth_cache.clear()
 
 
 @pytest.fixture()
@@ -79,7 +86,13 @@ def client(session: AsyncSession):
     async def override_get_session():
         yield session
 
+    @asynccontextmanager
+    async def override_session_factory():
+        yield session
+
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
+    app.dependency_overrides[get_session_factory] = lambda: override_session_factory
     with TestClient(app) as connect:
         yield connect
     app.dependency_overrides.clear()
@@ -91,3 +104,23 @@ async def test_user(session: AsyncSession):
     user_data = UserIn(name="Test User", api_key="testkey", password="testpass")
     user = await post_user(session, user_data)
     return user
+
+
+@pytest.fixture()
+def make_png():
+    """Фикстура-фабрика PNG (RGB) размером width x height, заливка цветом color"""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    def build(width: int, height: int, color: bytes = b"\xff\x00\x00") -> bytes:
+        rows = (b"\x00" + color * width) * height
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b"")
+        )
+
+    return build
@@ -0,0 +1,69 @@
+"""
+test_auth_cache.py
+
+Тест - кэш аутентификации по api-key.
+"""
+
+import time
+
+import pytest
+from project.cache import TTLCache
+from project.database import User
+from project.users.user_services import auth_cache, forget_principal
+from sqlalchemy import update
+
+
+@pytest.mark.asyncio
+async def test_auth_cache(client, test_user):
+    """Тест: повторная аутентификация берётся из кэша, статистика доступна"""
+    client.get("/api/users/me", headers={"api-key": "testkey"})
+    response = client.get("/api/users/me", headers={"api-key": "testkey"})
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == test_user.id
+
+    stats = auth_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert client.get("/api/metrics").json()["auth_cache"]["size"] == 1
+
+    response = client.get("/api/users/me", headers={"api-key": "wrong"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_auth_cache_invalidation(client, session, test_user):
+    """Тест: изменение пользователя через ORM сбрасывает запись кэша, Core - явно"""
+    headers = {"api-key": "testkey"}
+    client.get("/api/users/me", headers=headers)
+    assert auth_cache.get("testkey").name == "Test User"
+
+    user = await session.get(User, test_user.id)
+    user.name = "Renamed"
+    await session.commit()
+    assert auth_cache.get("testkey") is None
+
+    client.get("/api/users/me", headers=headers)
+    await session.execute(
+        update(User).where(User.id == test_user.id).values(name="Core renamed")
+    )
+    await session.commit()
+    # Core-запрос не виден ORM-событиям: запись живёт до явного сброса
+    assert auth_cache.get("testkey").name == "Renamed"
+    forget_principal("testkey")
+    assert auth_cache.get("testkey") is None
+
+
+def test_ttl_cache_eviction(monkeypatch):
+    """Тест вытеснения по размеру (LRU) и по времени жизни (TTL)"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
@@ -0,0 +1,77 @@
+"""
+test_compression.py
+
+Тест согласованного сжатия ответов gzip/brotli с порогом размера.
+"""
+
+import pytest
+from project.compression import CompressionMiddleware, choose_encoding
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_compression(client, test_user, monkeypatch):
+    """Тест - большие JSON-ответы сжимаются выбранной кодировкой, малые - нет"""
+    for number in range(20):
+        client.post(
+            "/api/tweets/",
+            json={"tweet_data": f"повторяющийся текст твита {number} " * 5},
+            headers={"api-key": "testkey"},
+        )
+
+    headers = {"api-key": "testkey", "Accept-Encoding": "gzip"}
+    response = client.get("/api/tweets/", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.json()["tweets"]) == 20
+    assert int(response.headers["content-length"]) < len(response.content)
+
+    # Сжатие большого тела в пуле потоков даёт тот же результат
+    monkeypatch.setattr(settings, "compression_thread_threshold_bytes", 0)
+    assert client.get("/api/tweets/", headers=headers).json() == response.json()
+
+    small = client.get("/api/tweets/1", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    identity = client.get("/api/tweets/", headers={**headers, "Accept-Encoding": ""})
+    assert "content-encoding" not in identity.headers
+
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0.5, gzip") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+@pytest.mark.asyncio
+async def test_compression_pathsend():
+    """Тест - ответ через http.response.pathsend проходит со стартовым сообщением"""
+
+    def file_app(content_type):
+        async def app(scope, receive, send):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", content_type)],
+                }
+            )
+            await send({"type": "http.response.pathsend", "path": "/tmp/file"})
+
+        return app
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "extensions": {"http.response.pathsend": {}},
+    }
+    for content_type in (b"image/png", b"application/json"):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await CompressionMiddleware(file_app(content_type))(scope, None, send)
+        assert [message["type"] for message in sent] == [
+            "http.response.start",
+            "http.response.pathsend",
+        ]
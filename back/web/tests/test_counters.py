@@ -0,0 +1,73 @@
+"""
+test_counters.py
+
+Тест - денормализованные счётчики подписок и лайков и их сверка.
+"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+from project import init_data
+from project.database import Tweet, User
+from project.reconcile_counters import reconcile_counters
+from sqlalchemy import select, update
+
+
+@pytest.mark.asyncio
+async def test_counters(client, session, test_user):
+    """Тест поддержки счётчиков при подписке и лайке и исправления расхождений"""
+    user2 = client.post(
+        "/api/users/",
+        json={"name": "User2", "password": "pass", "api_key": "user2-key"},
+    ).json()
+    client.post(f"/api/users/{user2['id']}/follow", headers={"api-key": "testkey"})
+    tweet = client.post(
+        "/api/tweets/", json={"tweet_data": "liked"}, headers={"api-key": "user2-key"}
+    ).json()
+    client.post(
+        f"/api/tweets/{tweet['tweet_id']}/likes", headers={"api-key": "testkey"}
+    )
+
+    profile = client.get(f"/api/users/{user2['id']}").json()["user"]
+    assert profile["followers_count"] == 1
+    me = client.get("/api/users/me", headers={"api-key": "testkey"}).json()["user"]
+    assert me["following_count"] == 1
+    assert client.get(f"/api/tweets/{tweet['tweet_id']}").json()["likes_count"] == 1
+
+    client.delete(
+        f"/api/tweets/{tweet['tweet_id']}/likes", headers={"api-key": "testkey"}
+    )
+    assert client.get(f"/api/tweets/{tweet['tweet_id']}").json()["likes_count"] == 0
+
+    # Искусственное расхождение исправляется заданием сверки
+    await session.execute(update(User).values(followers_count=7))
+    await session.execute(update(Tweet).values(likes_count=3))
+    await session.commit()
+    repaired = await reconcile_counters(session, batch_size=1)
+    assert repaired == {
+        "users.followers_count": 2,
+        "users.following_count": 0,
+        "tweets.likes_count": 1,
+    }
+    counts = await session.execute(select(User.followers_count).order_by(User.id))
+    assert counts.scalars().all() == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_init_data_counters(session, monkeypatch):
+    """Тест - начальные данные заполняют счётчики подписок"""
+
+    @asynccontextmanager
+    async def test_session():
+        yield session
+
+    monkeypatch.setattr(init_data, "async_session", test_session)
+    await init_data.init_data()
+
+    query_result = await session.execute(select(User.api_key, User.following_count))
+    assert dict(query_result.all())["test"] == 4
+    assert await reconcile_counters(session) == {
+        "users.followers_count": 0,
+        "users.following_count": 0,
+        "tweets.likes_count": 0,
+    }
@@ -0,0 +1,37 @@
+"""
+test_delete_tweet.py
+
+Тест удаления твита и отказов записи по несуществующему или чужому твиту.
+"""
+
+import pytest
+from project.database import User
+
+
+@pytest.mark.asyncio
+async def test_delete_tweet(client, session, test_user):
+    """Тест - удалить можно только свой существующий твит"""
+    session.add(User(name="Other", api_key="other-key"))
+    await session.commit()
+
+    tweet_id = client.post(
+        "/api/tweets/",
+        json={"tweet_data": "to delete"},
+        headers={"api-key": "testkey"},
+    ).json()["tweet_id"]
+
+    response = client.delete(
+        f"/api/tweets/{tweet_id}", headers={"api-key": "other-key"}
+    )
+    assert response.json()["error_type"] == "NO ACCESS"
+
+    response = client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "testkey"})
+    assert response.status_code == 200
+
+    # Повторное удаление и лайк удалённого твита - NO TWEET
+    for response in (
+        client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "testkey"}),
+        client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "testkey"}),
+    ):
+        assert response.status_code == 404
+        assert response.json()["error_type"] == "NO TWEET"
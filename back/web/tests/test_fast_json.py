@@ -0,0 +1,51 @@
+"""
+test_fast_json.py
+
+Тест быстрых JSON-ответов обработчиков чтения.
+"""
+
+import json
+
+import pytest
+from project.responses import FastJSONResponse
+from project.tweets.schemas import TweetListOutSchema
+
+
+@pytest.mark.asyncio
+async def test_fast_json(client, test_user):
+    """Тест - ответ совпадает с ответом по схеме и возвращается обработчиками"""
+    page = {
+        "result": True,
+        "tweets": [
+            {
+                "id": 1,
+                "content": "привет",
+                "attachments": ["/media_files/ab/cd/1.jpg"],
+                "attachment_urls": [
+                    {
+                        "original": "/media_files/ab/cd/1.jpg",
+                        "thumb": None,
+                        "feed": None,
+                    }
+                ],
+                "author": {"id": 2, "name": "Автор"},
+                "likes": [{"user_id": 3, "name": "Читатель"}],
+                "likes_count": 1,
+                "liked_by_me": False,
+            }
+        ],
+        "next_cursor": None,
+    }
+    response = FastJSONResponse(page)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == page
+    assert TweetListOutSchema.model_validate(page).model_dump() == page
+
+    client.post(
+        "/api/tweets/",
+        json={"tweet_data": "привет"},
+        headers={"api-key": "testkey"},
+    )
+    response = client.get("/api/tweets/", headers={"api-key": "testkey"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["tweets"][0]["content"] == "привет"
@@ -0,0 +1,43 @@
+"""
+test_get_followers.py
+
+Тест - постраничные списки подписчиков и подписок, счётчики в профиле.
+"""
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_get_followers(client, test_user):
+    """Тест списков подписчиков и подписок с keyset-пагинацией"""
+    for index in range(3):
+        client.post(
+            "/api/users/",
+            json={"name": f"Fan{index}", "password": "pass", "api_key": f"fan{index}"},
+        )
+        client.post(
+            f"/api/users/{test_user.id}/follow", headers={"api-key": f"fan{index}"}
+        )
+
+    response = client.get(f"/api/users/{test_user.id}/followers?limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert [user["name"] for user in page["users"]] == ["Fan0", "Fan1"]
+
+    page = client.get(
+        f"/api/users/{test_user.id}/followers?limit=2&cursor={page['next_cursor']}"
+    ).json()
+    assert [user["name"] for user in page["users"]] == ["Fan2"]
+    assert page["next_cursor"] is None
+
+    fan_id = page["users"][0]["id"]
+    following = client.get(f"/api/users/{fan_id}/following").json()
+    assert following["users"] == [{"id": test_user.id, "name": "Test User"}]
+
+    profile = client.get(f"/api/users/{test_user.id}").json()["user"]
+    assert profile["followers_count"] == 3
+    assert profile["following_count"] == 0
+    assert len(profile["followers"]) == 3
+
+    response = client.get("/api/users/999/followers")
+    assert response.status_code == 404
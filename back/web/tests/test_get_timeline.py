@@ -0,0 +1,59 @@
+"""
+test_get_timeline.py
+
+Тест - домашняя лента с keyset-пагинацией.
+"""
+
+import pytest
+from project.pagination import encode_cursor
+
+
+@pytest.mark.asyncio
+async def test_get_timeline(client, test_user):
+    """Тест ленты: свои твиты и твиты подписок, от новых к старым, по страницам"""
+    user2 = client.post(
+        "/api/users/",
+        json={"name": "Followed", "password": "pass", "api_key": "followed-key"},
+    ).json()
+    client.post(
+        "/api/users/",
+        json={"name": "Stranger", "password": "pass", "api_key": "stranger-key"},
+    )
+    client.post(f"/api/users/{user2['id']}/follow", headers={"api-key": "testkey"})
+
+    for api_key, text in (
+        ("followed-key", "first"),
+        ("stranger-key", "hidden"),
+        ("testkey", "mine"),
+        ("followed-key", "last"),
+    ):
+        client.post(
+            "/api/tweets/", json={"tweet_data": text}, headers={"api-key": api_key}
+        )
+
+    response = client.get("/api/tweets/?limit=2", headers={"api-key": "testkey"})
+    assert response.status_code == 200
+    page = response.json()
+    assert [tweet["content"] for tweet in page["tweets"]] == ["last", "mine"]
+    assert page["next_cursor"]
+
+    response = client.get(
+        f"/api/tweets/?limit=2&cursor={page['next_cursor']}",
+        headers={"api-key": "testkey"},
+    )
+    page = response.json()
+    assert [tweet["content"] for tweet in page["tweets"]] == ["first"]
+    assert page["next_cursor"] is None
+
+    # Нечитаемый курсор и курсоры со значениями не того типа
+    for cursor in (
+        "broken",
+        encode_cursor(None),
+        encode_cursor("x"),
+        encode_cursor(True),
+    ):
+        response = client.get(
+            f"/api/tweets/?cursor={cursor}", headers={"api-key": "testkey"}
+        )
+        assert response.status_code == 400
+        assert response.json()["error_type"] == "BAD CURSOR"
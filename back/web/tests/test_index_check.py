@@ -0,0 +1,15 @@
+"""
+test_index_check.py
+
+Тест проверки индексов: все индексы моделей созданы в базе.
+"""
+
+import pytest
+from project.index_check import check_indexes
+
+
+@pytest.mark.asyncio
+async def test_index_check(session):
+    """Тест - в тестовой базе нет отсутствующих индексов"""
+    report = await check_indexes(session)
+    assert report == {"missing": []}
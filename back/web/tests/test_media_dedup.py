@@ -0,0 +1,36 @@
+"""
+test_media_dedup.py
+
+Тест хранения медиа по хэшу содержимого без дубликатов.
+"""
+
+import hashlib
+
+import pytest
+from project.database import Media
+from project.settings import settings
+from sqlalchemy import select
+
+
+@pytest.mark.asyncio
+async def test_media_dedup(client, session, test_user, tmp_path, monkeypatch, make_png):
+    """Тест - одинаковое содержимое хранится одним файлом, записи Media разные"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    content = make_png(8, 8)
+    media_ids = [
+        client.post(
+            "/api/medias",
+            headers={"api-key": "testkey"},
+            files={"file": (name, content, "image/png")},
+        ).json()["media_id"]
+        for name in ("photo.png", "copy.png")
+    ]
+    assert media_ids[0] != media_ids[1]
+
+    query_result = await session.execute(
+        select(Media.name).where(Media.id.in_(media_ids))
+    )
+    digest = hashlib.sha256(content).hexdigest()
+    expected = f"/media_files/{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert query_result.scalars().all() == [expected, expected]
+    assert [path.name for path in tmp_path.rglob("*.png")] == [f"{digest}.png"]
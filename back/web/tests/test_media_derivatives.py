@@ -0,0 +1,43 @@
+"""
+test_media_derivatives.py
+
+Тест построения производных изображений после загрузки.
+"""
+
+import io
+
+import pytest
+from PIL import Image
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_media_derivatives(client, test_user, tmp_path, monkeypatch):
+    """Тест - после загрузки строятся WebP-производные и отдаются в твите"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), "red").save(buffer, format="PNG")
+
+    media_id = client.post(
+        "/api/medias",
+        headers={"api-key": "testkey"},
+        files={"file": ("red.png", buffer.getvalue(), "image/png")},
+    ).json()["media_id"]
+    tweet_id = client.post(
+        "/api/tweets/",
+        json={"tweet_data": "picture", "tweet_media_ids": [media_id]},
+        headers={"api-key": "testkey"},
+    ).json()["tweet_id"]
+
+    tweet = client.get(f"/api/tweets/{tweet_id}").json()
+    urls = tweet["attachment_urls"][0]
+    assert urls["feed"] == urls["original"].replace(".png", "_feed.webp")
+    # attachments отдаёт изображение размера ленты вместо оригинала
+    # (изменение API: до производных клиенты получали оригиналы)
+    assert tweet["attachments"] == [urls["feed"]]
+    assert tweet["attachments"] != [urls["original"]]
+
+    for kind, size in (("thumb", (150, 100)), ("feed", (600, 400))):
+        path = tmp_path / urls[kind].removeprefix("/media_files/")
+        with Image.open(path) as derivative:
+            assert (derivative.format, derivative.size) == ("WEBP", size)
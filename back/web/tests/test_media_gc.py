@@ -0,0 +1,96 @@
+"""
+test_media_gc.py
+
+Тест сборки мусора медиафайлов: непривязанные записи и файлы без записей.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from project import media_gc
+from project.database import Media, Tweet
+from project.media_gc import collect_media_garbage
+from project.settings import settings
+from sqlalchemy import select
+
+
+@pytest.mark.asyncio
+async def test_media_gc(session, test_user, tmp_path, monkeypatch):
+    """Тест - удаляются только старые непривязанные медиа и файлы без записей"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_gc_grace_seconds", 3600)
+    monkeypatch.setattr(settings, "media_gc_batch_size", 1)
+    monkeypatch.setattr(settings, "media_gc_batch_pause_seconds", 0)
+    old = datetime.now(timezone.utc) - timedelta(days=2)
+
+    def media_file(name: str, content: bytes, aged: bool = True) -> str:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        if aged:
+            os.utime(path, (old.timestamp(), old.timestamp()))
+        return f"/media_files/{name}"
+
+    tweet = Tweet(content="with media", user_id=test_user.id)
+    session.add(tweet)
+    await session.flush()
+    session.add_all(
+        [
+            # Старая непривязанная - удаляется вместе с производной
+            Media(name=media_file("aa/aa/orphan.png", b"12345"), created_at=old),
+            # Свежая непривязанная и привязанная к твиту - остаются
+            Media(name=media_file("bb/bb/fresh.png", b"fresh", aged=False)),
+            Media(
+                name=media_file("cc/cc/used.png", b"used"),
+                tweet_id=tweet.id,
+                created_at=old,
+            ),
+        ]
+    )
+    await session.commit()
+    media_file("aa/aa/orphan_thumb.webp", b"thumb")
+    # Файл без записи (твит удалён каскадом) и брошенная загрузка
+    media_file("dd/dd/deleted.jpg", b"1234567")
+    media_file("dd/dd/deleted_feed.webp", b"feed")
+    media_file(".tmp/upload.part", b"partial")
+    # Недавний файл без записи: загрузка, запись о которой ещё не сохранена
+    media_file("ee/ee/uploading.png", b"new", aged=False)
+
+    stats = await collect_media_garbage(session)
+    assert stats == {
+        "deleted_rows": 1,
+        "deleted_files": 5,
+        "reclaimed_bytes": 5 + 5 + 7 + 4 + 7,
+        "expired_uploads": 0,
+    }
+
+    query_result = await session.execute(select(Media.name).order_by(Media.name))
+    assert query_result.scalars().all() == [
+        "/media_files/bb/bb/fresh.png",
+        "/media_files/cc/cc/used.png",
+    ]
+    remaining = sorted(
+        path.relative_to(tmp_path).as_posix()
+        for path in tmp_path.rglob("*")
+        if path.is_file()
+    )
+    assert remaining == ["bb/bb/fresh.png", "cc/cc/used.png", "ee/ee/uploading.png"]
+
+    # Повторный проход ничего не находит
+    assert (await collect_media_garbage(session))["deleted_files"] == 0
+
+
+@pytest.mark.asyncio
+async def test_media_gc_lock(session, monkeypatch):
+    """Тест - проход пропускается, пока блокировку держит другой процесс"""
+    async with media_gc.media_gc_lock(session.bind) as acquired:
+        assert acquired  # SQLite: без межпроцессной блокировки
+
+    @asynccontextmanager
+    async def held_elsewhere():
+        yield False
+
+    monkeypatch.setattr(media_gc, "media_gc_lock", held_elsewhere)
+    assert await media_gc.run_media_gc() is None
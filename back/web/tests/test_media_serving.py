@@ -0,0 +1,68 @@
+"""
+test_media_serving.py
+
+Тест отдачи медиафайлов приложением: ETag, 304, диапазоны, кэширование.
+"""
+
+import hashlib
+
+import pytest
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_media_serving(client, test_user, tmp_path, monkeypatch, make_png):
+    """Тест - файл отдаётся с сильным ETag, по If-None-Match - 304, по Range - 206"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_derivative_workers", 0)
+    image = make_png(20, 20)
+    digest = hashlib.sha256(image).hexdigest()
+    client.post(
+        "/api/medias",
+        headers={"api-key": "testkey"},
+        files={"file": ("red.png", image, "image/png")},
+    )
+    url = f"/media_files/{digest[:2]}/{digest[2:4]}/{digest}.png"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == image
+    assert response.headers["etag"] == f'"{digest}"'
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(url, headers={"If-None-Match": f'W/"{digest}"'})
+    assert (response.status_code, response.content) == (304, b"")
+
+    response = client.get(url, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == image[:10]
+    assert response.headers["content-range"] == f"bytes 0-9/{len(image)}"
+
+    # Файл старого плоского каталога кэшируется ненадолго и перепроверяется
+    (tmp_path / "legacy.jpg").write_bytes(b"legacy")
+    response = client.get("/media_files/legacy.jpg")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=300"
+    etag = response.headers["etag"]
+    response = client.get("/media_files/legacy.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    (tmp_path / "legacy.jpg").write_bytes(b"replaced legacy")
+    response = client.get("/media_files/legacy.jpg", headers={"If-None-Match": etag})
+    assert (response.status_code, response.content) == (200, b"replaced legacy")
+
+    # Служебные каталоги и несуществующие файлы не отдаются
+    (tmp_path / ".tmp").mkdir(exist_ok=True)
+    (tmp_path / ".tmp" / "upload.part").write_bytes(b"partial")
+    for missing in ("/media_files/.tmp/upload.part", "/media_files/no/such.png"):
+        assert client.get(missing).status_code == 404
+
+    # Абсолютные пути, выход за корень и каталоги не отдаются
+    for outside in (
+        "/media_files//etc/passwd",
+        "/media_files/%2Fetc%2Fpasswd",
+        "/media_files//proc/self/environ",
+        "/media_files/../../etc/passwd.png",
+        f"/media_files/{digest[:2]}/{digest[2:4]}",
+    ):
+        assert client.get(outside).status_code == 404
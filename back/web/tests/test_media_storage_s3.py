@@ -0,0 +1,99 @@
+"""
+test_media_storage_s3.py
+
+Тест S3-хранилища медиафайлов и отдачи из него на имитации S3 (moto).
+"""
+
+import hashlib
+
+import boto3
+import moto
+import pytest
+from project.media import storage as media_storage
+from project.media.storage import S3Storage
+from project.settings import settings
+
+
+@pytest.fixture()
+def s3_bucket(monkeypatch):
+    """Фикстура бакета в имитации S3"""
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="media")
+        yield boto3.client("s3")
+    media_storage._s3_storage.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_s3_upload(client, test_user, s3_bucket, tmp_path, monkeypatch, make_png):
+    """Тест - загрузка сохраняется в бакет, повторная - переиспользует объект"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_storage", "s3")
+    monkeypatch.setattr(settings, "media_s3_bucket", "media")
+    monkeypatch.setattr(settings, "media_derivative_workers", 0)
+    image = make_png(16, 16)
+    digest = hashlib.sha256(image).hexdigest()
+
+    for _ in range(2):
+        response = client.post(
+            "/api/medias",
+            headers={"api-key": "testkey"},
+            files={"file": ("red.png", image, "image/png")},
+        )
+        assert response.status_code == 200
+
+    objects = s3_bucket.list_objects_v2(Bucket="media")["Contents"]
+    assert [item["Key"] for item in objects] == [
+        f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+    ]
+    head = s3_bucket.head_object(Bucket="media", Key=objects[0]["Key"])
+    assert (head["ContentType"], head["ContentLength"]) == ("image/png", len(image))
+    # На диске узла web медиафайлов не остаётся
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+@pytest.mark.asyncio
+async def test_s3_multipart(s3_bucket, tmp_path):
+    """Тест - большой файл загружается составными частями, удаление отдаёт размер"""
+    chunk = 5 * 1024 * 1024
+    storage = S3Storage("media", multipart_chunk_bytes=chunk)
+    source = tmp_path / "big.part"
+    source.write_bytes(b"x" * (chunk + 1))
+
+    await storage.save(str(source), "ab/cd/big.jpg")
+    assert not source.exists()
+    head = s3_bucket.head_object(Bucket="media", Key="ab/cd/big.jpg")
+    assert head["ETag"].strip('"').endswith("-2")
+
+    assert [stored.name for stored in await storage.list("ab/")] == ["ab/cd/big.jpg"]
+    assert await storage.delete("ab/cd/big.jpg") == chunk + 1
+    assert await storage.stat("ab/cd/big.jpg") is None
+
+
+@pytest.mark.asyncio
+async def test_s3_serving(client, s3_bucket, monkeypatch):
+    """Тест - отдача из S3 с ETag, 304 и диапазоном"""
+    monkeypatch.setattr(settings, "media_storage", "s3")
+    monkeypatch.setattr(settings, "media_s3_bucket", "media")
+    digest = "a" * 64
+    name = f"aa/aa/{digest}_thumb.webp"
+    s3_bucket.put_object(Bucket="media", Key=name, Body=b"0123456789")
+
+    response = client.get(f"/media_files/{name}")
+    assert (response.status_code, response.content) == (200, b"0123456789")
+    assert response.headers["etag"] == f'"{digest}_thumb"'
+    assert response.headers["content-type"] == "image/webp"
+
+    response = client.get(
+        f"/media_files/{name}", headers={"If-None-Match": f'"{digest}_thumb"'}
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"/media_files/{name}", headers={"Range": "bytes=-3"})
+    assert (response.status_code, response.content) == (206, b"789")
+    assert response.headers["content-range"] == "bytes 7-9/10"
+
+    response = client.get(f"/media_files/{name}", headers={"Range": "bytes=10-"})
+    assert response.status_code == 416
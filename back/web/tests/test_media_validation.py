@@ -0,0 +1,45 @@
+"""
+test_media_validation.py
+
+Тест проверки загружаемых изображений по содержимому.
+"""
+
+import struct
+
+import pytest
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_media_validation(client, test_user, tmp_path, monkeypatch, make_png):
+    """Тест - не изображения, бомбы декомпрессии и битые файлы не сохраняются"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_max_image_pixels", 10_000)
+    monkeypatch.setattr(settings, "media_upload_chunk_bytes", 16)
+
+    def upload(content: bytes, content_type: str = "image/png"):
+        return client.post(
+            "/api/medias",
+            headers={"api-key": "testkey"},
+            files={"file": ("upload", content, content_type)},
+        )
+
+    # Текст, выданный за PNG
+    response = upload(b"plain text, not an image" * 10)
+    assert (response.status_code, response.json()["error_type"]) == (400, "BAD FILE")
+
+    # Заголовок PNG с огромными размерами - отклоняется по заголовку
+    bomb = make_png(1, 1)
+    bomb = bomb[:16] + struct.pack(">II", 50_000, 50_000) + bomb[24:]
+    response = upload(bomb)
+    assert (response.status_code, response.json()["error_type"]) == (400, "BAD IMAGE")
+
+    # Обрезанное изображение - отклоняется при декодировании
+    response = upload(make_png(50, 50)[:-30])
+    assert (response.status_code, response.json()["error_type"]) == (400, "BAD IMAGE")
+
+    # PNG, заявленный как JPEG, сохраняется с расширением по содержимому
+    response = upload(make_png(50, 50), content_type="image/jpeg")
+    assert response.status_code == 200
+    assert len(list(tmp_path.rglob("*.png"))) == 1
+    assert list(tmp_path.rglob("*.jpg")) == []
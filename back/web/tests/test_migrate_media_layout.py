@@ -0,0 +1,74 @@
+"""
+test_migrate_media_layout.py
+
+Тест переноса медиафайлов из плоского каталога в раскладку по хэшу.
+"""
+
+import hashlib
+
+import pytest
+from project.database import Media
+from project.migrate_media_layout import migrate_media_layout
+from project.settings import settings
+from sqlalchemy import select
+
+
+@pytest.mark.asyncio
+async def test_migrate_media_layout(session, tmp_path, monkeypatch):
+    """Тест - файлы переносятся по хэшу, записи переписываются, повтор безопасен"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    photo, hashed = b"\xff\xd8\xff legacy photo", b"\x89PNG\r\n\x1a\n hashed"
+    scan = b"\x89PNG\r\n\x1a\n scan named .jpg"
+    photo_digest = hashlib.sha256(photo).hexdigest()
+    hashed_digest = hashlib.sha256(hashed).hexdigest()
+    scan_digest = hashlib.sha256(scan).hexdigest()
+    (tmp_path / "photo.JPEG").write_bytes(photo)
+    (tmp_path / f"{hashed_digest}.png").write_bytes(hashed)
+    (tmp_path / "scan.jpg").write_bytes(scan)
+    (tmp_path / "anim.gif").write_bytes(b"GIF89a animation")
+
+    names = [
+        "/media_files/photo.JPEG",
+        "/media_files/missing.jpg",
+        f"/media_files/{hashed_digest}.png",
+        "/media_files/photo.JPEG",
+        "/media_files/scan.jpg",
+        "/media_files/anim.gif",
+    ]
+    session.add_all([Media(name=name) for name in names])
+    await session.commit()
+
+    stats = await migrate_media_layout(session, batch_size=2)
+    assert stats == {
+        "migrated": 4,
+        "removed_files": 3,
+        "missing_files": 1,
+        "unsupported_files": 1,
+    }
+
+    # Расширение нового имени - по сигнатуре содержимого, не по старому имени
+    query_result = await session.execute(select(Media.name).order_by(Media.id))
+    photo_name = f"{photo_digest[:2]}/{photo_digest[2:4]}/{photo_digest}.jpg"
+    hashed_name = f"{hashed_digest[:2]}/{hashed_digest[2:4]}/{hashed_digest}.png"
+    scan_name = f"{scan_digest[:2]}/{scan_digest[2:4]}/{scan_digest}.png"
+    assert query_result.scalars().all() == [
+        f"/media_files/{photo_name}",
+        "/media_files/missing.jpg",
+        f"/media_files/{hashed_name}",
+        f"/media_files/{photo_name}",
+        f"/media_files/{scan_name}",
+        "/media_files/anim.gif",
+    ]
+    assert (tmp_path / photo_name).read_bytes() == photo
+    assert (tmp_path / hashed_name).read_bytes() == hashed
+    assert (tmp_path / scan_name).read_bytes() == scan
+    files = sorted(path.name for path in tmp_path.iterdir() if path.is_file())
+    assert files == ["anim.gif"]
+
+    stats = await migrate_media_layout(session, batch_size=2)
+    assert stats == {
+        "migrated": 0,
+        "removed_files": 0,
+        "missing_files": 1,
+        "unsupported_files": 1,
+    }
@@ -0,0 +1,39 @@
+"""
+test_post_tweet_media.py
+
+Тест - публикация твита с медиа одной транзакцией.
+"""
+
+import pytest
+from project.media.media_services import post_image
+
+
+@pytest.mark.asyncio
+async def test_post_tweet_media(client, session, test_user):
+    """Тест привязки медиа к твиту и отказа для чужих и несуществующих медиа"""
+    first = await post_image(session=session, image_name="/media_files/1.jpg")
+    second = await post_image(session=session, image_name="/media_files/2.jpg")
+    media_ids = [first["media_id"], second["media_id"]]
+
+    response = client.post(
+        "/api/tweets/",
+        json={"tweet_data": "with media", "tweet_media_ids": media_ids},
+        headers={"api-key": "testkey"},
+    )
+    assert response.status_code == 200
+    tweet_id = response.json()["tweet_id"]
+    tweet = client.get(f"/api/tweets/{tweet_id}").json()
+    assert sorted(tweet["attachments"]) == ["/media_files/1.jpg", "/media_files/2.jpg"]
+
+    # Уже прикреплённое и несуществующее медиа - твит не создаётся
+    for bad_ids in ([first["media_id"]], [999]):
+        response = client.post(
+            "/api/tweets/",
+            json={"tweet_data": "stolen", "tweet_media_ids": bad_ids},
+            headers={"api-key": "testkey"},
+        )
+        assert response.status_code == 400
+        assert response.json()["error_type"] == "BAD MEDIA"
+
+    timeline = client.get("/api/tweets/", headers={"api-key": "testkey"}).json()
+    assert [tweet["content"] for tweet in timeline["tweets"]] == ["with media"]
@@ -0,0 +1,52 @@
+"""
+test_projection_queries.py
+
+Тест чтения твитов и профилей проекциями колонок с JSON-массивами.
+"""
+
+import pytest
+from project.database import Media, Tweet, User, followers
+from project.pagination import DEFAULT_PAGE_LIMIT
+from sqlalchemy import insert
+
+
+@pytest.mark.asyncio
+async def test_projection_queries(client, session, test_user):
+    """Тест - вложения и первые страницы подписчиков читаются одной строкой"""
+    fans = [User(name=f"Fan {number}") for number in range(DEFAULT_PAGE_LIMIT + 1)]
+    session.add_all(fans)
+    tweet = Tweet(content="two pictures", user_id=test_user.id)
+    bare = Tweet(content="no pictures", user_id=test_user.id)
+    session.add_all([tweet, bare])
+    await session.flush()
+    session.add_all(
+        [
+            Media(name="/media_files/b.png", tweet_id=tweet.id),
+            Media(name="/media_files/a.png", tweet_id=tweet.id, derivatives_ready=True),
+        ]
+    )
+    await session.execute(
+        insert(followers),
+        [
+            {"following_user_id": fan.id, "followed_user_id": test_user.id}
+            for fan in fans
+        ],
+    )
+    await session.commit()
+
+    body = client.get(f"/api/tweets/{tweet.id}").json()
+    assert body["author"] == {"id": test_user.id, "name": "Test User"}
+    assert body["attachments"] == ["/media_files/b.png", "/media_files/a_feed.webp"]
+    assert body["attachment_urls"][1]["thumb"] == "/media_files/a_thumb.webp"
+    assert client.get(f"/api/tweets/{bare.id}").json()["attachments"] == []
+
+    profile = client.get(f"/api/users/{test_user.id}").json()["user"]
+    assert [user["id"] for user in profile["followers"]] == [
+        fan.id for fan in fans[:DEFAULT_PAGE_LIMIT]
+    ]
+    assert profile["following"] == []
+    next_page = client.get(
+        f"/api/users/{test_user.id}/followers",
+        params={"cursor": profile["followers_next_cursor"]},
+    ).json()
+    assert [user["id"] for user in next_page["users"]] == [fans[-1].id]
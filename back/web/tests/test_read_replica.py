@@ -0,0 +1,90 @@
+"""
+test_read_replica.py
+
+Тест - маршрутизация чтения на реплики, read-your-writes и откат на основную БД.
+"""
+
+import time
+
+import pytest
+from fastapi import HTTPException
+from project import database
+from project.settings import settings
+from project.users import user_services
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import Response
+
+
+def _sessionmaker(url):
+    return sessionmaker(
+        create_async_engine(url), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_replica_routing(monkeypatch, tmp_path):
+    """Тест выбора сессии чтения: реплика, основная после записи, откат"""
+    replica = _sessionmaker(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    broken = _sessionmaker(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'x.db'}")
+    monkeypatch.setattr(database, "replica_sessions", [replica])
+    database.recent_writers.clear()
+
+    session = await database.open_read_session("reader")
+    assert session.bind is replica.kw["bind"]
+    await session.close()
+
+    # После записи чтения этого api-key идут в основную БД
+    database.mark_write("writer")
+    session = await database.open_read_session("writer")
+    assert session.bind is database.engine
+    await session.close()
+
+    # Окно из cookie действует в любом процессе, но не дольше настройки
+    deadline = time.time() + settings.read_your_writes_seconds / 2
+    session = await database.open_read_session("other", f"{deadline:.3f}")
+    assert session.bind is database.engine
+    await session.close()
+    for cookie in (f"{time.time() - 1:.3f}", f"{time.time() + 3600:.3f}", "nan", "x"):
+        session = await database.open_read_session("other", cookie)
+        assert session.bind is replica.kw["bind"]
+        await session.close()
+
+    # Недоступная реплика - откат на основную БД
+    monkeypatch.setattr(database, "replica_sessions", [broken])
+    session = await database.open_read_session("reader")
+    assert session.bind is database.engine
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_write_sets_window_cookie():
+    """Тест - запись ставит cookie окончания окна read-your-writes"""
+    response = Response()
+    database.mark_write("writer", response)
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{database.READ_YOUR_WRITES_COOKIE}=")
+    deadline = float(cookie.split(";")[0].split("=")[1])
+    assert database.in_write_window(None, str(deadline))
+
+
+@pytest.mark.asyncio
+async def test_current_reader_on_replica(session, test_user, monkeypatch, tmp_path):
+    """Тест - аутентификация чтения идёт через реплику, отстающая - в основную БД"""
+    lagging = _sessionmaker(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    async with lagging.kw["bind"].begin() as connection:
+        await connection.run_sync(database.Base.metadata.create_all)
+    monkeypatch.setattr(user_services, "replica_sessions", [lagging])
+    primary = sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(user_services, "async_session", primary)
+
+    principal = await user_services.get_current_reader("testkey", session)
+    assert principal.name == test_user.name
+
+    # Пользователь ещё не дошёл до реплики - проверка в основной БД
+    user_services.auth_cache.clear()
+    async with lagging() as replica_session:
+        principal = await user_services.get_current_reader("testkey", replica_session)
+        assert principal.name == test_user.name
+        with pytest.raises(HTTPException):
+            await user_services.get_current_reader("no-such-key", replica_session)
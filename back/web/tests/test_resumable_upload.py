@@ -0,0 +1,87 @@
+"""
+test_resumable_upload.py
+
+Тест возобновляемой загрузки медиафайла частями.
+"""
+
+import pytest
+from project.database import User
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload(
+    client, session, test_user, tmp_path, monkeypatch, make_png
+):
+    """Тест - загрузка частями с продолжением после обрыва и завершением"""
+    session.add(User(name="Other", api_key="other-key"))
+    await session.commit()
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    image = make_png(60, 60)
+    size = len(image)
+    headers = {"api-key": "testkey"}
+
+    upload = client.post(
+        "/api/medias/uploads",
+        json={"size": size, "content_type": "image/png"},
+        headers=headers,
+    ).json()
+    url = f"/api/medias/uploads/{upload['upload_id']}"
+    assert upload["offset"] == 0
+
+    # Первая половина
+    half = size // 2
+    response = client.put(
+        url,
+        content=image[:half],
+        headers={**headers, "Content-Range": f"bytes 0-{half - 1}/{size}"},
+    )
+    assert response.json()["offset"] == half
+
+    # Повтор с неверного смещения и раннее завершение отклоняются
+    response = client.put(
+        url,
+        content=image[:10],
+        headers={**headers, "Content-Range": f"bytes 0-9/{size}"},
+    )
+    assert (response.status_code, response.json()["error_type"]) == (409, "BAD OFFSET")
+    response = client.post(f"{url}/finalize", headers=headers)
+    assert response.json()["error_type"] == "UPLOAD INCOMPLETE"
+
+    # Клиент узнаёт смещение и продолжает
+    offset = client.get(url, headers=headers).json()["offset"]
+    response = client.put(
+        url,
+        content=image[offset:],
+        headers={**headers, "Content-Range": f"bytes {offset}-{size - 1}/{size}"},
+    )
+    assert response.json()["offset"] == size
+
+    # Чужая сессия не видна
+    response = client.get(url, headers={"api-key": "other-key"})
+    assert (response.status_code, response.json()["error_type"]) == (404, "NO UPLOAD")
+
+    response = client.post(f"{url}/finalize", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["media_id"]
+    assert [path.read_bytes() for path in tmp_path.rglob("*.png")] == [image]
+    assert client.get(url, headers=headers).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload_without_part(client, test_user, tmp_path, monkeypatch):
+    """Тест - сессия без частичного файла не найдена (404, а не 500)"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    headers = {"api-key": "testkey"}
+    upload = client.post(
+        "/api/medias/uploads",
+        json={"size": 10, "content_type": "image/png"},
+        headers=headers,
+    ).json()
+    [part_path] = tmp_path.rglob(f"{upload['upload_id']}.part")
+    part_path.unlink()
+
+    url = f"/api/medias/uploads/{upload['upload_id']}"
+    response = client.get(url, headers=headers)
+    assert (response.status_code, response.json()["error_type"]) == (404, "NO UPLOAD")
+    assert not list(tmp_path.rglob(f"{upload['upload_id']}.*"))
@@ -0,0 +1,56 @@
+"""
+test_search_tweets.py
+
+Тест полнотекстового поиска твитов.
+"""
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_search_tweets(client, test_user):
+    """Тест поиска: совпадение всех слов, пагинация, изменение и удаление твитов"""
+    contents = [
+        "Кот спит на диване",
+        "Собака и кот играют",
+        "Погода сегодня отличная",
+        'Кот в "кавычках" OR NOT',
+    ]
+    tweet_ids = [
+        client.post(
+            "/api/tweets/", json={"tweet_data": content}, headers={"api-key": "testkey"}
+        ).json()["tweet_id"]
+        for content in contents
+    ]
+
+    response = client.get("/api/tweets/search", params={"q": "кот"})
+    assert response.status_code == 200
+    found = {tweet["id"] for tweet in response.json()["tweets"]}
+    assert found == {tweet_ids[0], tweet_ids[1], tweet_ids[3]}
+
+    # Все слова запроса должны встречаться; синтаксис FTS не ломает запрос
+    response = client.get("/api/tweets/search", params={"q": "кот собака"})
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tweet_ids[1]]
+    response = client.get("/api/tweets/search", params={"q": 'OR "кавычках'})
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tweet_ids[3]]
+
+    # Постраничный обход без пропусков и повторов
+    seen, cursor = [], None
+    while True:
+        params = {"q": "кот", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/tweets/search", params=params).json()
+        seen.extend(tweet["id"] for tweet in page["tweets"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(found)
+
+    # Удалённый твит пропадает из поиска
+    client.delete(f"/api/tweets/{tweet_ids[0]}", headers={"api-key": "testkey"})
+    response = client.get("/api/tweets/search", params={"q": "диване"})
+    assert response.json()["tweets"] == []
+
+    response = client.get("/api/tweets/search", params={"q": "   "})
+    assert response.status_code == 400
@@ -0,0 +1,34 @@
+"""
+test_settings.py
+
+Тест - настройки из переменных окружения и параметры движка БД.
+"""
+
+from project.database import engine_options
+from project.settings import Settings, settings
+
+
+def test_settings_from_env(monkeypatch):
+    """Тест переопределения настроек переменными окружения"""
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_ECHO", "true")
+    loaded = Settings.from_env()
+    assert loaded.db_pool_size == 3
+    assert loaded.db_echo is True
+
+
+def test_engine_options(monkeypatch):
+    """Тест: пул и asyncpg-параметры только для PostgreSQL"""
+    monkeypatch.setattr(settings, "db_statement_timeout_ms", 500)
+    options = engine_options("postgresql+asyncpg://user:pass@db/app")
+    assert options["pool_size"] == settings.db_pool_size
+    assert options["connect_args"]["server_settings"] == {"statement_timeout": "500"}
+    assert "statement_cache_size" not in options["connect_args"]
+    assert "pool_size" not in engine_options("postgresql+asyncpg://db/app", False)
+
+    # За pgbouncer отключаются оба кэша prepared statements
+    monkeypatch.setattr(settings, "db_prepared_statement_cache_size", 0)
+    connect_args = engine_options("postgresql+asyncpg://db/app")["connect_args"]
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["statement_cache_size"] == 0
+    assert engine_options("sqlite+aiosqlite:///:memory:") == {"echo": settings.db_echo}
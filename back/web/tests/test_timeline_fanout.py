@@ -0,0 +1,43 @@
+"""
+test_timeline_fanout.py
+
+Тест - материализованная лента: рассылка при публикации, отзыв при отписке и удалении.
+"""
+
+import pytest
+
+
+def _contents(client, api_key):
+    response = client.get("/api/tweets/", headers={"api-key": api_key})
+    return [tweet["content"] for tweet in response.json()["tweets"]]
+
+
+@pytest.mark.asyncio
+async def test_timeline_fanout(client, test_user):
+    """Тест fan-out: твиты попадают в ленты подписчиков и отзываются из них"""
+    author = client.post(
+        "/api/users/",
+        json={"name": "Author", "password": "pass", "api_key": "author-key"},
+    ).json()
+    old = client.post(
+        "/api/tweets/", json={"tweet_data": "old"}, headers={"api-key": "author-key"}
+    ).json()
+
+    # Подписка добавляет в ленту недавние твиты автора
+    client.post(f"/api/users/{author['id']}/follow", headers={"api-key": "testkey"})
+    assert _contents(client, "testkey") == ["old"]
+
+    # Новый твит рассылается подписчику фоновой стадией
+    client.post(
+        "/api/tweets/", json={"tweet_data": "new"}, headers={"api-key": "author-key"}
+    )
+    assert _contents(client, "testkey") == ["new", "old"]
+
+    # Удаление твита убирает его из лент
+    client.delete(f"/api/tweets/{old['tweet_id']}", headers={"api-key": "author-key"})
+    assert _contents(client, "testkey") == ["new"]
+
+    # Отписка убирает из ленты все твиты автора
+    client.delete(f"/api/users/{author['id']}/follow", headers={"api-key": "testkey"})
+    assert _contents(client, "testkey") == []
+    assert _contents(client, "author-key") == ["new"]
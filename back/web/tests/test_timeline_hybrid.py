@@ -0,0 +1,56 @@
+"""
+test_timeline_hybrid.py
+
+Тест - гибридный fan-out: твиты авторов выше порога подписчиков
+подмешиваются при чтении.
+"""
+
+import pytest
+from project.metrics import metrics
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_timeline_hybrid(client, test_user, monkeypatch):
+    """Тест гибридного fan-out с порогом знаменитости"""
+    monkeypatch.setattr(settings, "fanout_celebrity_threshold", 0)
+    star = client.post(
+        "/api/users/",
+        json={"name": "Star", "password": "pass", "api_key": "star-key"},
+    ).json()
+    client.post(f"/api/users/{star['id']}/follow", headers={"api-key": "testkey"})
+
+    before = metrics.snapshot()
+    client.post(
+        "/api/tweets/", json={"tweet_data": "star"}, headers={"api-key": "star-key"}
+    )
+    client.post(
+        "/api/tweets/", json={"tweet_data": "mine"}, headers={"api-key": "testkey"}
+    )
+    response = client.get("/api/tweets/", headers={"api-key": "testkey"})
+    after = metrics.snapshot()
+
+    assert [tweet["content"] for tweet in response.json()["tweets"]] == [
+        "mine",
+        "star",
+    ]
+    assert after["fanout_pull_total"] - before.get("fanout_pull_total", 0) == 1
+    assert (
+        after["timeline_read_merged_total"]
+        - before.get("timeline_read_merged_total", 0)
+        == 1
+    )
+    assert client.get("/api/metrics").status_code == 200
+
+    # Автор опустился ниже порога: твит, не разосланный при публикации,
+    # остаётся в ленте, а новые твиты рассылаются
+    monkeypatch.setattr(settings, "fanout_celebrity_threshold", 10)
+    client.post(
+        "/api/tweets/", json={"tweet_data": "pushed"}, headers={"api-key": "star-key"}
+    )
+    response = client.get("/api/tweets/", headers={"api-key": "testkey"})
+    assert [tweet["content"] for tweet in response.json()["tweets"]] == [
+        "pushed",
+        "mine",
+        "star",
+    ]
@@ -0,0 +1,42 @@
+"""
+test_tweet_likes.py
+
+Тест - ограниченная выборка лайкнувших в твите и постраничный список лайков.
+"""
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_tweet_likes(client, test_user):
+    """Тест счётчика, выборки лайкнувших, флага liked_by_me и списка лайков"""
+    tweet = client.post(
+        "/api/tweets/", json={"tweet_data": "viral"}, headers={"api-key": "testkey"}
+    ).json()
+    tweet_id = tweet["tweet_id"]
+    for index in range(5):
+        client.post(
+            "/api/users/",
+            json={"name": f"Fan{index}", "password": "pass", "api_key": f"fan{index}"},
+        )
+        client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": f"fan{index}"})
+
+    data = client.get(f"/api/tweets/{tweet_id}", headers={"api-key": "fan0"}).json()
+    assert data["likes_count"] == 5
+    assert [like["name"] for like in data["likes"]] == ["Fan4", "Fan3", "Fan2"]
+    assert data["liked_by_me"] is True
+    assert client.get(f"/api/tweets/{tweet_id}").json()["liked_by_me"] is False
+
+    timeline = client.get("/api/tweets/", headers={"api-key": "testkey"}).json()
+    assert timeline["tweets"][0]["liked_by_me"] is False
+    assert len(timeline["tweets"][0]["likes"]) == 3
+
+    page = client.get(f"/api/tweets/{tweet_id}/likes?limit=3").json()
+    assert [like["name"] for like in page["likes"]] == ["Fan4", "Fan3", "Fan2"]
+    page = client.get(
+        f"/api/tweets/{tweet_id}/likes?limit=3&cursor={page['next_cursor']}"
+    ).json()
+    assert [like["name"] for like in page["likes"]] == ["Fan1", "Fan0"]
+    assert page["next_cursor"] is None
+
+    assert client.get("/api/tweets/999/likes").status_code == 404
@@ -0,0 +1,66 @@
+"""
+test_upload_streaming.py
+
+Тест потоковой загрузки медиафайла: ограничение размера и атомарная запись.
+"""
+
+import hashlib
+
+import pytest
+from project.media import routes
+from project.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_upload_streaming(client, test_user, tmp_path, monkeypatch, make_png):
+    """Тест - файл в пределах лимита сохраняется, больший отклоняется с 413"""
+    image = make_png(40, 40)
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_max_upload_bytes", len(image))
+    monkeypatch.setattr(settings, "media_upload_chunk_bytes", 64)
+
+    files = {"file": ("../photo.png", image, "image/png")}
+    response = client.post("/api/medias", headers={"api-key": "testkey"}, files=files)
+    assert response.status_code == 200
+    digest = hashlib.sha256(image).hexdigest()
+    saved = tmp_path / digest[:2] / digest[2:4] / f"{digest}.png"
+    assert saved.read_bytes() == image
+
+    files = {"file": ("big.png", image + b"\0", "image/png")}
+    response = client.post("/api/medias", headers={"api-key": "testkey"}, files=files)
+    assert response.status_code == 413
+    assert response.json()["error_type"] == "FILE TOO LARGE"
+    assert [path.name for path in tmp_path.rglob("*.png")] == [saved.name]
+    # Временные файлы незавершённых загрузок не остаются
+    assert list((tmp_path / ".tmp").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_body_limit(client, test_user, tmp_path, monkeypatch):
+    """Тест - тело больше лимита отклоняется с 413 до разбора формы"""
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "media_max_upload_bytes", 100)
+    body = (
+        b'--limit\r\nContent-Disposition: form-data; name="file"; filename="a.png"'
+        b"\r\nContent-Type: image/png\r\n\r\n"
+        + b"\0" * (routes.MULTIPART_OVERHEAD_BYTES + 1024)
+        + b"\r\n--limit--\r\n"
+    )
+    headers = {
+        "api-key": "testkey",
+        "content-type": "multipart/form-data; boundary=limit",
+    }
+
+    # По Content-Length
+    response = client.post("/api/medias/", headers=headers, content=body)
+    assert response.status_code == 413
+    assert response.json()["error_type"] == "FILE TOO LARGE"
+
+    # Без Content-Length (chunked) - по принятым байтам
+    def chunks():
+        for start in range(0, len(body), 1024):
+            yield body[start : start + 1024]
+
+    response = client.post("/api/medias/", headers=headers, content=chunks())
+    assert response.status_code == 413
+    assert response.json()["error_type"] == "FILE TOO LARGE"